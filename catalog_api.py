@@ -0,0 +1,193 @@
+"""
+Extração direta pela API JSON do catálogo
+
+Em vez de buscar (e às vezes renderizar) uma página por produto, os SKUs de
+entrada são agrupados em lotes e cada lote vira uma única chamada ao endpoint
+de produtos da loja. O JSON é normalizado para os mesmos campos que a
+extração do HTML encontra (nome, descrição, preço e imagens); SKUs que a API
+não devolver, ou devolver incompletos, voltam para a busca do HTML.
+
+O formato da resposta não é documentado pela loja, então ler_item aceita as
+variações mais comuns: itens planos como o data-sku-obj das páginas
+({"sku", "name", "price", "best": {"price"}, "images"}) e o formato da busca
+de catálogo VTEX ({"productName", "items": [{"itemId", "images",
+"sellers": [{"commertialOffer": {"Price"}}]}]}).
+
+Campos lidos (o primeiro preenchido de cada lista):
+- lista de produtos: a própria resposta ou "produtos", "products", "items", "data";
+- SKU: "sku", "skuId", "id", "codigo" (VTEX: "itemId" de cada item);
+- nome: "name", "nome", "productName", "nameComplete";
+- descrição: "description", "descricao", "metaTagDescription" (HTML vira texto);
+- preço: "price", "preco" ou "best" (número, texto com vírgula ou objeto com
+  "price"/"Price"/"valor"/"preco"); VTEX: "Price" do commertialOffer de cada seller;
+- imagens: "images", "imagens" (strings ou objetos com "imageUrl", "url", "zoom", "src").
+
+A gravação em data/fixtures/api/produtos.json é sintética (ver
+scripts/catalog_stub_server.py): nenhum desses formatos foi conferido contra
+uma resposta real da loja.
+"""
+
+import re
+import threading
+from html import unescape
+
+_RE_TAG = re.compile(r"<[^>]+>")
+
+def _primeiro(dados, *chaves):
+    for chave in chaves:
+        valor = dados.get(chave)
+        if valor not in (None, "", [], {}):
+            return valor
+    return None
+
+def _preco(valor):
+    if isinstance(valor, dict):
+        valor = _primeiro(valor, "price", "Price", "valor", "preco")
+    if valor in (None, ""):
+        return None
+    try:
+        preco = float(str(valor).replace(",", "."))
+    except ValueError:
+        return None
+    return preco if preco > 0 else None
+
+def _imagens(valor):
+    urls = []
+    for imagem in valor or []:
+        if isinstance(imagem, dict):
+            imagem = _primeiro(imagem, "imageUrl", "url", "zoom", "src")
+        if isinstance(imagem, str) and imagem:
+            urls.append(imagem)
+    return list(dict.fromkeys(urls))
+
+def texto_html(valor):
+    """Texto de uma descrição que pode vir com marcação HTML"""
+    if not valor:
+        return ""
+    return " ".join(unescape(_RE_TAG.sub(" ", str(valor))).split())
+
+def ler_item(item):
+    """
+    Normaliza um produto da API para {"sku", "nome", "descricao", "preco", "imagens"}
+
+    No formato VTEX um produto pode ter vários SKUs; retorna um dicionário por
+    SKU. preco é float (ou None) e imagens é a lista de URLs sem repetição.
+    """
+    nome = _primeiro(item, "name", "nome", "productName", "nameComplete")
+    descricao = texto_html(_primeiro(item, "description", "descricao", "metaTagDescription"))
+
+    if isinstance(item.get("items"), list):
+        normalizados = []
+        for sku in item["items"]:
+            ofertas = [v.get("commertialOffer") or {} for v in sku.get("sellers") or []]
+            preco = next((p for p in map(_preco, ofertas) if p), None)
+            normalizados.append({
+                "sku": str(_primeiro(sku, "itemId", "sku", "id") or ""),
+                "nome": _primeiro(sku, "nameComplete", "name") if not nome else nome,
+                "descricao": descricao,
+                "preco": preco,
+                "imagens": _imagens(sku.get("images")),
+            })
+        return normalizados
+
+    return [{
+        "sku": str(_primeiro(item, "sku", "skuId", "id", "codigo") or ""),
+        "nome": nome,
+        "descricao": descricao,
+        "preco": _preco(_primeiro(item, "price", "preco", "best")),
+        "imagens": _imagens(_primeiro(item, "images", "imagens")),
+    }]
+
+def ler_resposta(dados):
+    """Produtos normalizados de uma resposta (lista ou {"produtos"|"products"|"items": [...]})"""
+    if isinstance(dados, dict):
+        dados = _primeiro(dados, "produtos", "products", "items", "data") or []
+    normalizados = {}
+    for item in dados if isinstance(dados, list) else []:
+        if isinstance(item, dict):
+            for produto in ler_item(item):
+                if produto["sku"]:
+                    normalizados[produto["sku"]] = produto
+    return normalizados
+
+class _Lote:
+    def __init__(self, skus):
+        self.skus = skus
+        self.lock = threading.Lock()
+        self.buscado = False
+        self.produtos = {}
+        self.erro = None
+
+class ClienteCatalogo:
+    """
+    Busca os produtos por SKU em lotes
+
+    url_modelo é o endpoint com {skus} no lugar da lista separada por vírgula;
+    buscar_json(url) faz a requisição (com limitador e retentativas) e devolve
+    o JSON. preparar(skus) divide os SKUs em lotes de tamanho_lote; o primeiro
+    worker que pedir um SKU busca o lote inteiro e os demais reaproveitam.
+    """
+
+    def __init__(self, url_modelo, buscar_json, tamanho_lote=50):
+        self.url_modelo = url_modelo
+        self.buscar_json = buscar_json
+        self.tamanho_lote = max(1, int(tamanho_lote))
+        self._lotes = {}
+        self._lock = threading.Lock()
+
+        # Estatísticas
+        self.lotes = 0
+        self.falhas = 0
+        self.encontrados = 0
+        self.ausentes = 0
+
+    def preparar(self, skus):
+        skus = [s for s in dict.fromkeys(skus) if s]
+        with self._lock:
+            for i in range(0, len(skus), self.tamanho_lote):
+                lote = _Lote(skus[i:i + self.tamanho_lote])
+                for sku in lote.skus:
+                    self._lotes.setdefault(sku, lote)
+
+    def _buscar(self, lote):
+        url = self.url_modelo.format(skus=",".join(lote.skus))
+        try:
+            lote.produtos = ler_resposta(self.buscar_json(url))
+        except Exception as e:
+            lote.erro = e
+            with self._lock:
+                self.falhas += 1
+        with self._lock:
+            self.lotes += 1
+        lote.buscado = True
+
+    def obter(self, sku):
+        """
+        Produto normalizado do SKU, ou None se a API não o devolveu
+
+        Levanta a exceção da chamada se o lote do SKU falhou.
+        """
+        with self._lock:
+            lote = self._lotes.get(sku)
+            if lote is None:
+                lote = self._lotes[sku] = _Lote([sku])
+        with lote.lock:
+            if not lote.buscado:
+                self._buscar(lote)
+        with self._lock:
+            # Cada SKU é pedido uma vez: libera a memória do lote aos poucos
+            self._lotes.pop(sku, None)
+            produto = lote.produtos.pop(sku, None)
+            if lote.erro is None:
+                if produto:
+                    self.encontrados += 1
+                else:
+                    self.ausentes += 1
+        if lote.erro is not None:
+            raise lote.erro
+        return produto
+
+    def resumo(self):
+        with self._lock:
+            return {"lotes": self.lotes, "falhas": self.falhas,
+                    "encontrados": self.encontrados, "ausentes": self.ausentes}
@@ -0,0 +1,221 @@
+"""
+Detecção de mudanças e exportação delta
+
+Guarda em SQLite a última linha exportada de cada _IDSKU com um hash do
+conteúdo. Cada linha extraída é comparada com essa referência e classificada
+como nova, alterada ou inalterada; os SKUs da referência que não apareceram
+na execução são os removidos. Campos que mudam a cada execução sem que o
+produto mude (a data de lançamento, os nomes das imagens locais) ficam fora
+do hash. Um SKU já conhecido mantém a data de lançamento da primeira vez em
+que apareceu.
+
+O delta tem as colunas da planilha VTEX, com as linhas novas e alteradas e os
+removidos desativados, e pode ser importado no lugar do catálogo inteiro. As
+mudanças campo a campo (ex.: _Preço anterior e novo) vão para um CSV à parte.
+A referência só é atualizada em confirmar(), no fim de uma execução que
+terminou; se a execução cair, as mudanças voltam no próximo delta.
+"""
+
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import Counter
+from datetime import datetime
+
+from stream_writer import ExportadorStream
+
+NOVO = "novo"
+ALTERADO = "alterado"
+INALTERADO = "inalterado"
+REMOVIDO = "removido"
+
+CAMPOS_VOLATEIS = ("_DataLancamentoProduto", "_ImagensSalvas")
+COLUNAS_MUDANCAS = ["_IDSKU", "tipo", "campo", "anterior", "novo"]
+# Como um SKU removido entra no delta: a última linha conhecida, desativada
+DESATIVAR = {"_AtivarSKUSePossível": "NÃO", "_SKUAtivo": "NÃO", "_ProdutoAtivo": "NÃO", "_MostrarNoSite": "NÃO"}
+
+def normalizar(produto):
+    """Valores como ficam no CSV (None vira vazio), para linhas da extração e lidas de CSV compararem igual"""
+    return {campo: "" if valor is None else str(valor) for campo, valor in produto.items()}
+
+def hash_linha(produto):
+    """sha256 dos campos da linha, sem os voláteis"""
+    campos = {c: v for c, v in normalizar(produto).items() if c not in CAMPOS_VOLATEIS}
+    return hashlib.sha256(json.dumps(campos, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def diferencas(anterior, atual):
+    """[(campo, valor anterior, valor novo)] dos campos que mudaram, sem os voláteis"""
+    anterior, atual = normalizar(anterior), normalizar(atual)
+    campos = list(atual) + [c for c in anterior if c not in atual]
+    return [(c, anterior.get(c, ""), atual.get(c, "")) for c in campos
+            if c not in CAMPOS_VOLATEIS and anterior.get(c, "") != atual.get(c, "")]
+
+class SnapshotProdutos:
+    """Última linha exportada de cada SKU (referência) e as linhas vistas na execução atual"""
+
+    def __init__(self, caminho, lote_commit=500):
+        self.caminho = caminho
+        self.lote_commit = lote_commit
+        self._lock = threading.Lock()
+        self._pendentes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        self._db = sqlite3.connect(caminho, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS produtos (
+                sku TEXT PRIMARY KEY,
+                hash TEXT NOT NULL,
+                produto TEXT NOT NULL,
+                lancamento TEXT,
+                atualizado_em TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS execucao (
+                sku TEXT PRIMARY KEY,
+                hash TEXT NOT NULL,
+                produto TEXT NOT NULL,
+                lancamento TEXT
+            );
+        """)
+        # Sobras de uma execução que não chegou a confirmar
+        self._db.execute("DELETE FROM execucao")
+        self._db.commit()
+
+    def total(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM produtos").fetchone()[0]
+
+    def comparar(self, produto):
+        """
+        Classifica a linha contra a referência e a registra como vista nesta execução
+
+        Retorna (tipo, [(campo, anterior, novo)]). Para SKUs já conhecidos, a
+        _DataLancamentoProduto da linha volta a ser a da referência.
+        """
+        sku = str(produto.get("_IDSKU", ""))
+        atual = hash_linha(produto)
+        with self._lock:
+            referencia = self._db.execute(
+                "SELECT hash, produto, lancamento FROM produtos WHERE sku = ?", (sku,)).fetchone()
+            if referencia is None:
+                tipo, mudancas = NOVO, []
+                lancamento = produto.get("_DataLancamentoProduto")
+            else:
+                hash_anterior, anterior, lancamento = referencia
+                if lancamento:
+                    produto["_DataLancamentoProduto"] = lancamento
+                if hash_anterior == atual:
+                    tipo, mudancas = INALTERADO, []
+                else:
+                    tipo, mudancas = ALTERADO, diferencas(json.loads(anterior), produto)
+            self._db.execute(
+                "INSERT OR REPLACE INTO execucao (sku, hash, produto, lancamento) VALUES (?, ?, ?, ?)",
+                (sku, atual, json.dumps(normalizar(produto), ensure_ascii=False), lancamento))
+            self._pendentes += 1
+            if self._pendentes >= self.lote_commit:
+                self._db.commit()
+                self._pendentes = 0
+        return tipo, mudancas
+
+    def manter(self, skus):
+        """SKUs sem linha nesta execução (ex.: falharam) que continuam na referência como estão"""
+        with self._lock:
+            self._db.execute(
+                """INSERT OR IGNORE INTO execucao (sku, hash, produto, lancamento)
+                   SELECT sku, hash, produto, lancamento FROM produtos WHERE sku IN (SELECT value FROM json_each(?))""",
+                (json.dumps([str(sku) for sku in skus]),))
+
+    def removidos(self):
+        """(sku, última linha) dos SKUs da referência que não foram vistos nesta execução"""
+        with self._lock:
+            return [(sku, json.loads(produto)) for sku, produto in self._db.execute(
+                "SELECT sku, produto FROM produtos WHERE sku NOT IN (SELECT sku FROM execucao) ORDER BY sku")]
+
+    def confirmar(self, remover=True):
+        """As linhas desta execução viram a referência; com remover, os SKUs não vistos saem dela"""
+        agora = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self._db.execute(
+                """INSERT INTO produtos (sku, hash, produto, lancamento, atualizado_em)
+                   SELECT sku, hash, produto, lancamento, ? FROM execucao WHERE true
+                   ON CONFLICT(sku) DO UPDATE SET
+                       atualizado_em = CASE WHEN produtos.hash = excluded.hash THEN produtos.atualizado_em
+                                            ELSE excluded.atualizado_em END,
+                       hash = excluded.hash, produto = excluded.produto,
+                       lancamento = COALESCE(produtos.lancamento, excluded.lancamento)""",
+                (agora,))
+            if remover:
+                self._db.execute("DELETE FROM produtos WHERE sku NOT IN (SELECT sku FROM execucao)")
+            self._db.execute("DELETE FROM execucao")
+            self._db.commit()
+            self._pendentes = 0
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+class ExportadorDelta:
+    """
+    Grava o delta (linhas VTEX novas, alteradas e removidas) e as mudanças campo a campo
+
+    Sem nenhuma mudança, o delta sai só com o cabeçalho, para a importação
+    não pegar o arquivo de uma execução anterior.
+    """
+
+    def __init__(self, snapshot, caminho_delta, caminho_mudancas, tamanho_lote=100, intervalo_flush=30.0):
+        self.snapshot = snapshot
+        self.caminho_delta = caminho_delta
+        self.caminho_mudancas = caminho_mudancas
+        self.contagem = Counter()
+        self.colunas = None
+        self._delta = ExportadorStream(caminho_delta, tamanho_lote=tamanho_lote, intervalo_flush=intervalo_flush)
+        self._arquivo = open(caminho_mudancas, "w", encoding="utf-8-sig", newline="")
+        self._mudancas = csv.writer(self._arquivo, lineterminator="\n")
+        self._mudancas.writerow(COLUNAS_MUDANCAS)
+
+    def escrever(self, produto):
+        """Compara a linha com a referência (chamar antes de gravá-la na planilha completa)"""
+        if self.colunas is None:
+            self.colunas = list(produto)
+        tipo, mudancas = self.snapshot.comparar(produto)
+        self.contagem[tipo] += 1
+        if tipo == INALTERADO:
+            return tipo
+        self._delta.escrever(produto)
+        sku = produto.get("_IDSKU", "")
+        if tipo == NOVO:
+            self._mudancas.writerow([sku, NOVO, "", "", ""])
+        for campo, anterior, novo in mudancas:
+            self._mudancas.writerow([sku, ALTERADO, campo, anterior, novo])
+        return tipo
+
+    def close(self, confirmar=True, remover=True):
+        """
+        Fecha os arquivos; com remover, os SKUs não vistos entram como removidos
+
+        confirmar=False (execução interrompida) deixa a referência como estava.
+        """
+        if remover:
+            for sku, anterior in self.snapshot.removidos():
+                if self.colunas is None:
+                    self.colunas = list(anterior)
+                self._delta.escrever({**{c: anterior.get(c, "") for c in self.colunas}, **DESATIVAR})
+                self._mudancas.writerow([sku, REMOVIDO, "", "", ""])
+                self.contagem[REMOVIDO] += 1
+        if self._delta.total == 0:
+            with open(self.caminho_delta, "w", encoding="utf-8-sig", newline="") as f:
+                if self.colunas:
+                    csv.writer(f, lineterminator="\n").writerow(self.colunas)
+        self._delta.close()
+        self._arquivo.close()
+        if confirmar:
+            self.snapshot.confirmar(remover)
+
+    def resumo(self):
+        """Linha do resumo: contagem por tipo"""
+        c = self.contagem
+        return (f"{c[NOVO]} novos, {c[ALTERADO]} alterados, {c[REMOVIDO]} removidos, "
+                f"{c[INALTERADO]} inalterados")
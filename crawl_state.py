@@ -0,0 +1,114 @@
+"""
+Estado persistente do crawl
+
+Guarda em SQLite o status de cada URL, quando foi buscada pela última vez, o
+hash do conteúdo da página e a linha extraída. Permite retomar uma execução
+interrompida (--resume) e reprocessar só as URLs desatualizadas (--since).
+"""
+
+import json
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+STATUS_OK = "ok"
+STATUS_ERRO = "erro"
+
+def parse_since(valor):
+    """
+    Converte --since em datetime de corte
+
+    Aceita durações relativas ("30m", "12h", "7d") ou uma data ISO
+    ("2025-09-01" / "2025-09-01T06:00").
+    """
+    match = re.fullmatch(r"\s*(\d+)\s*([mhd])\s*", valor)
+    if match:
+        quantidade, unidade = int(match.group(1)), match.group(2)
+        delta = {"m": timedelta(minutes=quantidade), "h": timedelta(hours=quantidade),
+                 "d": timedelta(days=quantidade)}[unidade]
+        return datetime.now() - delta
+    try:
+        return datetime.fromisoformat(valor.strip())
+    except ValueError:
+        raise ValueError(f"Valor inválido para --since: {valor!r} (use 12h, 7d ou uma data ISO)")
+
+class CrawlState:
+    """Status, data da última busca, hash e linha extraída de cada URL"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(caminho, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                sku TEXT,
+                status TEXT NOT NULL,
+                ultima_busca TEXT NOT NULL,
+                hash_conteudo TEXT,
+                produto TEXT,
+                erro TEXT,
+                tentativas INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._db.commit()
+
+    def registrar_sucesso(self, url, produto, hash_conteudo=None):
+        with self._lock:
+            self._db.execute(
+                """INSERT INTO urls (url, sku, status, ultima_busca, hash_conteudo, produto, erro, tentativas)
+                   VALUES (?, ?, ?, ?, ?, ?, NULL, 1)
+                   ON CONFLICT(url) DO UPDATE SET
+                       sku = excluded.sku, status = excluded.status, ultima_busca = excluded.ultima_busca,
+                       hash_conteudo = excluded.hash_conteudo, produto = excluded.produto,
+                       erro = NULL, tentativas = urls.tentativas + 1""",
+                (url, produto.get("_IDSKU"), STATUS_OK, datetime.now().isoformat(timespec="seconds"),
+                 hash_conteudo, json.dumps(produto, ensure_ascii=False)),
+            )
+            self._db.commit()
+
+    def registrar_falha(self, url, erro):
+        # Mantém a última linha boa (se houver) para não perder o produto no --resume
+        with self._lock:
+            self._db.execute(
+                """INSERT INTO urls (url, status, ultima_busca, erro, tentativas)
+                   VALUES (?, ?, ?, ?, 1)
+                   ON CONFLICT(url) DO UPDATE SET
+                       status = excluded.status, ultima_busca = excluded.ultima_busca,
+                       erro = excluded.erro, tentativas = urls.tentativas + 1""",
+                (url, STATUS_ERRO, datetime.now().isoformat(timespec="seconds"), str(erro)),
+            )
+            self._db.commit()
+
+    def concluidas(self, desde=None):
+        """URLs com status ok, opcionalmente só as buscadas a partir de `desde`"""
+        with self._lock:
+            if desde is None:
+                linhas = self._db.execute("SELECT url FROM urls WHERE status = ?", (STATUS_OK,))
+            else:
+                linhas = self._db.execute(
+                    "SELECT url FROM urls WHERE status = ? AND ultima_busca >= ?",
+                    (STATUS_OK, desde.isoformat(timespec="seconds")),
+                )
+            return {url for (url,) in linhas}
+
+    def hash_conteudo(self, url):
+        with self._lock:
+            linha = self._db.execute("SELECT hash_conteudo FROM urls WHERE url = ?", (url,)).fetchone()
+        return linha[0] if linha else None
+
+    def iterar_produtos(self, urls):
+        """Gera (url, produto) com as linhas salvas das URLs informadas, uma por vez"""
+        for url in urls:
+            with self._lock:
+                linha = self._db.execute(
+                    "SELECT produto FROM urls WHERE url = ? AND produto IS NOT NULL", (url,)
+                ).fetchone()
+            if linha:
+                yield url, json.loads(linha[0])
+
+    def close(self):
+        with self._lock:
+            self._db.close()
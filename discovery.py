@@ -0,0 +1,226 @@
+"""
+Descoberta de URLs de produto por sitemaps e páginas de categoria
+
+Percorre os sitemaps (índices, urlsets e .xml.gz) e as páginas de listagem
+das categorias e produz um fluxo de URLs /p/{sku}/{slug} sem repetição, à
+medida que são encontradas: o scraper começa a extrair antes de a descoberta
+terminar. As páginas de listagem seguidas são as que ficam abaixo de uma
+categoria inicial (subcategorias e paginação) ou que casam com `seguir`.
+
+O conjunto de URLs já vistas fica em SQLite entre execuções, com a primeira e
+a última vez em que cada URL apareceu: dá para processar só os produtos novos
+e saber quais sumiram do site.
+"""
+
+import csv
+import gzip
+import logging
+import re
+import sqlite3
+import threading
+import xml.etree.ElementTree as ET
+from collections import deque
+from datetime import datetime
+from html import unescape
+from urllib.parse import urljoin, urlparse, urlunparse
+
+log = logging.getLogger(__name__)
+
+RE_PRODUTO = re.compile(r"^/p/([^/]+)/([^/]+)/?$")
+RE_HREF = re.compile(r"""href\s*=\s*["']([^"'#]+)""", re.IGNORECASE)
+# Listagens comuns em lojas VTEX e afins; categorias iniciais são seguidas de qualquer forma
+SEGUIR_PADRAO = r"/c/|/categoria|/departamento|[?&](page|pagina|pg|PageNumber)="
+
+def url_produto(url):
+    """URL canônica do produto (sem query nem fragmento), ou None se não for /p/{sku}/{slug}"""
+    partes = urlparse(url)
+    if partes.scheme not in ("http", "https") or not RE_PRODUTO.match(partes.path):
+        return None
+    return urlunparse((partes.scheme, partes.netloc.lower(), partes.path.rstrip("/"), "", "", ""))
+
+def ler_urls(caminho, filtro="leomadeiras.com.br"):
+    """URLs da coluna 'url' de um CSV, sem repetição, lidas linha a linha"""
+    vistas = set()
+    with open(caminho, encoding="utf-8-sig", newline="") as f:
+        leitor = csv.DictReader(f)
+        if "url" not in (leitor.fieldnames or []):
+            raise ValueError("A planilha precisa ter uma coluna chamada 'url'.")
+        for linha in leitor:
+            url = (linha["url"] or "").strip()
+            if url and filtro in url and url not in vistas:
+                vistas.add(url)
+                yield url
+
+class ConjuntoVistos:
+    """URLs de produto já descobertas, com a primeira e a última vez em que apareceram"""
+
+    def __init__(self, caminho, lote_commit=200):
+        self.caminho = caminho
+        self.lote_commit = lote_commit
+        self._lock = threading.Lock()
+        self._pendentes = 0
+        self._db = sqlite3.connect(caminho, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS vistos (
+                url TEXT PRIMARY KEY,
+                sku TEXT,
+                origem TEXT,
+                primeira_vez TEXT NOT NULL,
+                ultima_vez TEXT NOT NULL
+            )
+        """)
+        self._db.commit()
+
+    def registrar(self, url, sku=None, origem=None):
+        """Marca a URL como vista agora; retorna True se ela nunca tinha sido vista"""
+        agora = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            novo = self._db.execute("SELECT 1 FROM vistos WHERE url = ?", (url,)).fetchone() is None
+            self._db.execute(
+                """INSERT INTO vistos (url, sku, origem, primeira_vez, ultima_vez) VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT(url) DO UPDATE SET ultima_vez = excluded.ultima_vez""",
+                (url, sku, origem, agora, agora),
+            )
+            self._pendentes += 1
+            if self._pendentes >= self.lote_commit:
+                self._db.commit()
+                self._pendentes = 0
+        return novo
+
+    def ausentes_desde(self, corte):
+        """URLs vistas antes, mas não desde `corte` (datetime): produtos que sumiram do site"""
+        with self._lock:
+            linhas = self._db.execute(
+                "SELECT url FROM vistos WHERE ultima_vez < ? ORDER BY url", (corte.isoformat(timespec="seconds"),)
+            ).fetchall()
+        return [url for (url,) in linhas]
+
+    def total(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM vistos").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+class Descobridor:
+    """
+    Fluxo de URLs de produto a partir de sitemaps e categorias
+
+    buscar(url) retorna o corpo da resposta em bytes (o scraper passa a busca
+    com limitador e retentativas). Com vistos, cada URL é registrada no
+    conjunto persistente; somente_novos=True só entrega as nunca vistas.
+    """
+
+    def __init__(self, buscar, sitemaps=(), categorias=(), vistos=None, somente_novos=False,
+                 seguir=SEGUIR_PADRAO, max_paginas=500):
+        self.buscar = buscar
+        self.sitemaps = list(dict.fromkeys(sitemaps))
+        self.categorias = list(dict.fromkeys(categorias))
+        self.vistos = vistos
+        self.somente_novos = somente_novos
+        self.seguir = re.compile(seguir) if seguir else None
+        self.max_paginas = max_paginas
+        self.hosts = {urlparse(u).netloc.lower() for u in self.sitemaps + self.categorias}
+        self.prefixos = [(urlparse(u).netloc.lower(), urlparse(u).path.rstrip("/") + "/")
+                         for u in self.categorias if urlparse(u).path.strip("/")]
+
+        # Estatísticas
+        self.sitemaps_lidos = 0
+        self.paginas_lidas = 0
+        self.encontradas = 0
+        self.novas = 0
+        self.erros = 0
+        self.puladas = 0  # páginas de listagem não lidas por causa de max_paginas
+        self.completa = False
+
+    def _listagem(self, url):
+        """A URL é uma página de listagem que deve ser seguida?"""
+        partes = urlparse(url)
+        host = partes.netloc.lower()
+        if host not in self.hosts or url_produto(url):
+            return False
+        if any(host == h and (partes.path + "/").startswith(p) for h, p in self.prefixos):
+            return True
+        return bool(self.seguir and self.seguir.search(url))
+
+    def _ler_sitemap(self, dados):
+        """(é índice?, lista de <loc>) de um sitemap, comprimido ou não"""
+        if dados[:2] == b"\x1f\x8b":
+            dados = gzip.decompress(dados)
+        raiz = ET.fromstring(dados)
+        locs = [e.text.strip() for e in raiz.iter() if e.tag.rsplit("}", 1)[-1] == "loc" and e.text]
+        return raiz.tag.rsplit("}", 1)[-1] == "sitemapindex", locs
+
+    def _links(self, url, dados):
+        html = dados.decode("utf-8", "replace")
+        for href in RE_HREF.findall(html):
+            yield urljoin(url, unescape(href.strip()))
+
+    def _entregar(self, url, origem, entregues):
+        canonica = url_produto(url)
+        if not canonica or canonica in entregues:
+            return None
+        entregues.add(canonica)
+        self.encontradas += 1
+        novo = True
+        if self.vistos is not None:
+            novo = self.vistos.registrar(canonica, RE_PRODUTO.match(urlparse(canonica).path).group(1), origem)
+        if novo:
+            self.novas += 1
+        if self.somente_novos and not novo:
+            return None
+        return canonica
+
+    def urls(self):
+        """Gera as URLs de produto conforme são descobertas"""
+        pendentes = deque([("sitemap", u) for u in self.sitemaps] + [("listagem", u) for u in self.categorias])
+        visitadas = set(u for _, u in pendentes)
+        entregues = set()
+
+        while pendentes:
+            tipo, url = pendentes.popleft()
+            if tipo == "listagem" and self.paginas_lidas >= self.max_paginas:
+                self.puladas += 1
+                continue
+            try:
+                dados = self.buscar(url)
+            except Exception as e:
+                self.erros += 1
+                log.warning("⚠️ Descoberta: falha ao buscar %s: %s", url, str(e)[:120])
+                continue
+
+            if tipo == "sitemap":
+                self.sitemaps_lidos += 1
+                try:
+                    eh_indice, links = self._ler_sitemap(dados)
+                except (ET.ParseError, OSError, EOFError) as e:
+                    self.erros += 1
+                    log.warning("⚠️ Descoberta: sitemap inválido %s: %s", url, e)
+                    continue
+            else:
+                self.paginas_lidas += 1
+                eh_indice = False
+                links = self._links(url, dados)
+
+            for link in links:
+                if eh_indice:
+                    proximo = ("sitemap", link)
+                elif self._listagem(link):
+                    proximo = ("listagem", link)
+                else:
+                    produto = self._entregar(link, tipo, entregues)
+                    if produto:
+                        yield produto
+                    continue
+                if link not in visitadas:
+                    visitadas.add(link)
+                    pendentes.append(proximo)
+        # Com páginas de listagem puladas pelo limite, categorias inteiras podem ter ficado de fora
+        self.completa = self.puladas == 0
+
+    def resumo(self):
+        return {"sitemaps": self.sitemaps_lidos, "paginas": self.paginas_lidas, "encontradas": self.encontradas,
+                "novas": self.novas, "erros": self.erros, "puladas": self.puladas, "completa": self.completa}
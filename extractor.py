@@ -0,0 +1,266 @@
+"""
+Motor de extração em passada única
+
+Percorre o documento uma única vez e coleta todos os candidatos usados por
+analisar_html (nome, descrição, preço e imagens), com os seletores compilados
+uma vez no carregamento do módulo. A ordem de prioridade entre os candidatos
+continua sendo aplicada em scraper.analisar_html.
+
+O parser é plugável: "html.parser" (BeautifulSoup, sempre disponível), "lxml"
+e "selectolax" produzem os mesmos Candidatos a partir de árvores diferentes.
+"""
+
+import logging
+import re
+
+from bs4 import BeautifulSoup, Tag
+
+try:
+    import lxml.html
+except Exception:
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except Exception:
+    try:
+        from selectolax.parser import HTMLParser as SelectolaxParser
+    except Exception:
+        SelectolaxParser = None
+
+log = logging.getLogger(__name__)
+
+PARSERS = ("html.parser", "lxml", "selectolax")
+PARSER_PADRAO = "html.parser"
+
+SELETORES_NOME = [".product-name h1", "h1.product-name", "h1", ".product-title"]
+
+SELETORES_DESCRICAO = [
+    ".product-description",
+    ".product-details",
+    ".description",
+    ".produto-descricao",
+    ".descricao-produto",
+    "[data-description]",
+    ".product-info .description",
+    ".product-content .description",
+]
+
+# Elementos candidatos ao fallback de descrição por texto descritivo
+TAGS_TEXTO = {"p", "div", "span"}
+
+# Elementos cujo conteúdo não entra no texto (igual ao get_text do BeautifulSoup)
+TAGS_SEM_TEXTO = {"script", "style", "template"}
+
+_RE_SELETOR = re.compile(
+    r"^(?:\.(?P<ancestral>[\w-]+)\s+)?(?P<tag>[a-z][a-z0-9]*)?(?:\.(?P<classe>[\w-]+))?(?:\[(?P<attr>[\w-]+)\])?$"
+)
+
+class Seletor:
+    """Seletor CSS simples: [.ancestral ]tag.classe[attr]"""
+
+    def __init__(self, texto):
+        match = _RE_SELETOR.match(texto.strip())
+        if not match:
+            raise ValueError(f"Seletor não suportado: {texto}")
+        self.texto = texto
+        self.ancestral = match.group("ancestral")
+        self.tag = match.group("tag")
+        self.classe = match.group("classe")
+        self.attr = match.group("attr")
+
+    def casa(self, nome, classes, attrs, ancestrais):
+        return ((self.tag is None or nome == self.tag) and
+                (self.classe is None or self.classe in classes) and
+                (self.attr is None or self.attr in attrs) and
+                (self.ancestral is None or self.ancestral in ancestrais))
+
+_NOME = [Seletor(s) for s in SELETORES_NOME]
+_DESCRICAO = [Seletor(s) for s in SELETORES_DESCRICAO]
+
+# Classes que importam como ancestrais nos seletores acima
+_CLASSES_ANCESTRAIS = frozenset(s.ancestral for s in _NOME + _DESCRICAO if s.ancestral)
+
+class Candidatos:
+    """
+    Tudo o que a extração precisa, coletado em uma passada pelo documento
+
+    - nome / descricao: primeiro elemento de cada seletor (como select_one)
+    - blocos_texto: elementos p/div/span na ordem do documento
+    - data_price / data_sku_obj: valores dos atributos, na ordem do documento
+    - zoom_images: data-zoom-image dos divs
+    - imagens: (src, em_div_zoom, zoomImg, original) de cada <img>
+    """
+
+    def __init__(self, raiz):
+        self.raiz = raiz
+        self.nome = {}
+        self.descricao = {}
+        self.blocos_texto = []
+        self.data_price = []
+        self.data_sku_obj = []
+        self.zoom_images = []
+        self.imagens = []
+
+    def texto(self, elemento, separador=""):
+        """Texto do elemento, como get_text(separador, strip=True)"""
+        return elemento.get_text(separador, strip=True)
+
+    def texto_documento(self):
+        return self.raiz.get_text(" ", strip=True)
+
+    def elementos(self):
+        """Elementos de nível superior do documento, na ordem"""
+        return [filho for filho in self.raiz.contents if isinstance(filho, Tag)]
+
+    @staticmethod
+    def no(elemento):
+        """(nome, attrs, filhos) de um elemento da árvore"""
+        return elemento.name, elemento.attrs, [f for f in elemento.contents if isinstance(f, Tag)]
+
+def _juntar(partes, separador):
+    return separador.join(p for p in (parte.strip() for parte in partes) if p)
+
+class CandidatosLxml(Candidatos):
+    """Candidatos sobre uma árvore lxml.html"""
+
+    def _partes(self, elemento):
+        # O lxml põe o conteúdo do <template> na árvore: a subárvore inteira fica de fora
+        if elemento.tag in TAGS_SEM_TEXTO:
+            return
+        if elemento.text:
+            yield elemento.text
+        for filho in elemento:
+            # Comentários têm tag não-string: o texto é ignorado, o tail conta
+            if isinstance(filho.tag, str):
+                yield from self._partes(filho)
+            if filho.tail:
+                yield filho.tail
+
+    def texto(self, elemento, separador=""):
+        return _juntar(self._partes(elemento), separador)
+
+    def texto_documento(self):
+        return "" if self.raiz is None else self.texto(self.raiz, " ")
+
+    def elementos(self):
+        return [] if self.raiz is None else [self.raiz]
+
+    @staticmethod
+    def no(elemento):
+        attrs = elemento.attrib
+        return elemento.tag, attrs, [f for f in elemento if isinstance(f.tag, str)]
+
+class CandidatosSelectolax(Candidatos):
+    """Candidatos sobre uma árvore selectolax"""
+
+    def _partes(self, elemento):
+        for filho in elemento.iter(include_text=True):
+            tag = filho.tag
+            if tag == "-text":
+                yield filho.text_content or ""
+            elif not tag.startswith("-") and tag not in TAGS_SEM_TEXTO:
+                yield from self._partes(filho)
+
+    def texto(self, elemento, separador=""):
+        if elemento.tag in TAGS_SEM_TEXTO:
+            return ""
+        return _juntar(self._partes(elemento), separador)
+
+    def texto_documento(self):
+        return "" if self.raiz is None else self.texto(self.raiz, " ")
+
+    def elementos(self):
+        return [] if self.raiz is None else [self.raiz]
+
+    @staticmethod
+    def no(elemento):
+        # Atributos sem valor vêm como None no selectolax e "" no BeautifulSoup
+        attrs = {k: ("" if v is None else v) for k, v in elemento.attributes.items()}
+        filhos = [f for f in elemento.iter(include_text=False) if not f.tag.startswith("-")]
+        return elemento.tag, attrs, filhos
+
+def parsers_disponiveis():
+    disponiveis = ["html.parser"]
+    if lxml is not None:
+        disponiveis.append("lxml")
+    if SelectolaxParser is not None:
+        disponiveis.append("selectolax")
+    return disponiveis
+
+def resolver_parser(parser):
+    """Retorna o parser pedido ou html.parser se ele não estiver instalado"""
+    if parser not in PARSERS:
+        raise ValueError(f"Parser desconhecido: {parser} (opções: {', '.join(PARSERS)})")
+    if parser not in parsers_disponiveis():
+        log.warning("⚠️ Parser %s não disponível, usando %s", parser, PARSER_PADRAO)
+        return PARSER_PADRAO
+    return parser
+
+def _parse(html, parser):
+    if parser == "lxml":
+        try:
+            return CandidatosLxml(lxml.html.document_fromstring(html))
+        except Exception:
+            # Documento vazio ou ilegível: nada a extrair
+            return CandidatosLxml(None)
+    if parser == "selectolax":
+        return CandidatosSelectolax(SelectolaxParser(html).root)
+    return Candidatos(BeautifulSoup(html, "html.parser"))
+
+def _classes(attrs):
+    classes = attrs.get("class")
+    if not classes:
+        return ()
+    return classes if isinstance(classes, (list, tuple)) else classes.split()
+
+def coletar_candidatos(html, parser=PARSER_PADRAO):
+    """Faz o parse do HTML e coleta os candidatos em uma única passada"""
+    c = _parse(html, parser)
+    no = c.no
+    nome_pendente = list(_NOME)
+    descricao_pendente = list(_DESCRICAO)
+
+    vazio = frozenset()
+    pilha = [(filho, vazio, False) for filho in reversed(c.elementos())]
+    while pilha:
+        tag, ancestrais, em_zoom = pilha.pop()
+        nome, attrs, filhos = no(tag)
+        classes = _classes(attrs)
+
+        if nome_pendente:
+            for sel in [s for s in nome_pendente if s.casa(nome, classes, attrs, ancestrais)]:
+                c.nome[sel.texto] = tag
+                nome_pendente.remove(sel)
+        if descricao_pendente:
+            for sel in [s for s in descricao_pendente if s.casa(nome, classes, attrs, ancestrais)]:
+                c.descricao[sel.texto] = tag
+                descricao_pendente.remove(sel)
+
+        if nome in TAGS_TEXTO:
+            c.blocos_texto.append(tag)
+        if "data-price" in attrs:
+            c.data_price.append(attrs["data-price"])
+        if "data-sku-obj" in attrs:
+            c.data_sku_obj.append(attrs["data-sku-obj"])
+
+        if nome == "div":
+            if "data-zoom-image" in attrs:
+                c.zoom_images.append(attrs["data-zoom-image"])
+            # div.zoom, div[class*='zoom'], div[class*='image']
+            classe_str = " ".join(classes)
+            filhos_em_zoom = em_zoom or "zoom" in classe_str or "image" in classe_str
+        else:
+            filhos_em_zoom = em_zoom
+            if nome == "img":
+                src = attrs.get("src") or attrs.get("data-src")
+                c.imagens.append((src, em_zoom, "zoomImg" in classes, "original" in classes))
+
+        # Conteúdo de <template> é inerte (e cada parser o guarda de um jeito): não entra nos candidatos
+        if nome in TAGS_SEM_TEXTO:
+            continue
+        relevantes = _CLASSES_ANCESTRAIS.intersection(classes)
+        filhos_ancestrais = ancestrais | relevantes if relevantes else ancestrais
+        pilha.extend((filho, filhos_ancestrais, filhos_em_zoom) for filho in reversed(filhos))
+
+    return c
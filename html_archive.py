@@ -0,0 +1,112 @@
+"""
+Arquivo de snapshots do HTML buscado
+
+Cada página usada na extração é guardada comprimida em
+{sku}/{data da busca}_{hash[:12]}.html.gz, com um índice SQLite por URL.
+Páginas que não mudaram desde o último snapshot não são gravadas de novo. O
+arquivo permite reextrair o catálogo inteiro sem rede (--from-archive) e serve
+de corpus de fixtures para benchmarks.
+"""
+
+import gzip
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+def ler_snapshot(caminho):
+    """HTML de um snapshot .html.gz"""
+    with gzip.open(caminho, "rt", encoding="utf-8") as f:
+        return f.read()
+
+class ArquivoHTML:
+    """Snapshots de HTML por SKU e data de busca + índice URL -> snapshots"""
+
+    def __init__(self, raiz, nivel_compressao=6):
+        self.raiz = raiz
+        self.nivel_compressao = nivel_compressao
+        os.makedirs(raiz, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(raiz, "index.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                sku TEXT NOT NULL,
+                buscado_em TEXT NOT NULL,
+                tier TEXT,
+                hash TEXT NOT NULL,
+                arquivo TEXT NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS snapshots_url ON snapshots (url, id)")
+        self._db.commit()
+
+        # Estatísticas
+        self.gravados = 0
+        self.inalterados = 0
+
+    def _ultimo(self, url):
+        return self._db.execute(
+            "SELECT hash, arquivo FROM snapshots WHERE url = ? ORDER BY id DESC LIMIT 1", (url,)
+        ).fetchone()
+
+    def guardar(self, url, sku, html, tier=None, digest=None):
+        """
+        Grava o snapshot da página
+
+        Retorna o caminho do arquivo, ou None se o HTML é igual ao último
+        snapshot da URL (nada é gravado).
+        """
+        digest = digest or hashlib.sha256(html.encode("utf-8")).hexdigest()
+        with self._lock:
+            ultimo = self._ultimo(url)
+        if ultimo and ultimo[0] == digest and os.path.exists(os.path.join(self.raiz, ultimo[1])):
+            self.inalterados += 1
+            return None
+
+        agora = datetime.now()
+        pasta_sku = re.sub(r"[^\w.-]", "_", sku or "sem_sku")
+        relativo = os.path.join(pasta_sku, f"{agora.strftime('%Y%m%dT%H%M%S')}_{digest[:12]}.html.gz")
+        caminho = os.path.join(self.raiz, relativo)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = caminho + ".part"
+        with gzip.open(temporario, "wt", encoding="utf-8", compresslevel=self.nivel_compressao) as f:
+            f.write(html)
+        os.replace(temporario, caminho)
+
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO snapshots (url, sku, buscado_em, tier, hash, arquivo) VALUES (?, ?, ?, ?, ?, ?)",
+                (url, sku, agora.isoformat(timespec="seconds"), tier, digest, relativo),
+            )
+            self._db.commit()
+            self.gravados += 1
+        return caminho
+
+    def ultimos(self, urls=None):
+        """
+        Lista (url, sku, buscado_em, caminho) do snapshot mais recente de cada URL
+
+        Com urls, só as URLs informadas (na ordem delas); sem, todas as URLs do
+        arquivo na ordem em que foram arquivadas pela primeira vez.
+        """
+        with self._lock:
+            linhas = self._db.execute("""
+                SELECT url, sku, buscado_em, arquivo FROM snapshots
+                WHERE id IN (SELECT MAX(id) FROM snapshots GROUP BY url)
+                ORDER BY (SELECT MIN(id) FROM snapshots s WHERE s.url = snapshots.url)
+            """).fetchall()
+        por_url = {url: (url, sku, buscado_em, os.path.join(self.raiz, arquivo))
+                   for url, sku, buscado_em, arquivo in linhas}
+        if urls is None:
+            return list(por_url.values())
+        return [por_url[url] for url in urls if url in por_url]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,228 @@
+"""
+Download paralelo de imagens de produto
+
+O extrator enfileira as URLs de imagem e segue para o próximo produto; um pool
+de workers com sessão HTTP própria baixa as imagens em paralelo, respeitando
+um limite de conexões por host e repetindo falhas temporárias conforme a
+política de retentativas (retry_policy).
+
+Com um ImageStore, as imagens são deduplicadas por conteúdo e as execuções
+seguintes fazem requisições condicionais, sem reescrever imagens inalteradas.
+Com um LimitadorHosts, o limite por host passa a ser o controle adaptativo
+compartilhado com o resto do scraper. Com um IndiceImagens, cada imagem salva
+é registrada (SKU, posição, hash, tamanho e URL) para gerar o manifesto sem
+listar a pasta.
+"""
+
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from retry_policy import CONEXAO, HTTP_5XX, TIMEOUT, ExecutorRetentativas
+
+log = logging.getLogger(__name__)
+
+class DownloadImagens:
+    """Fila de downloads de imagens atendida por um pool de workers"""
+
+    def __init__(self, pasta, workers=8, por_host=4, tentativas=3, backoff=0.5,
+                 timeout=15, headers=None, store=None, limitador=None, politica=None, indice=None):
+        self.pasta = pasta
+        self.workers = max(1, int(workers))
+        self.por_host = max(1, int(por_host))
+        self.tentativas = max(1, int(tentativas))
+        self.timeout = timeout
+        self.store = store
+        self.limitador = limitador
+        self.indice = indice
+        # tentativas limita qualquer classe; backoff vale só sem uma política compartilhada
+        self.politica = politica or ExecutorRetentativas(
+            {classe: {"backoff": backoff} for classe in (TIMEOUT, CONEXAO, HTTP_5XX)})
+
+        self.session = requests.Session()
+        if headers:
+            self.session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.workers, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._fila = queue.Queue()
+        self._threads = []
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+        # Estatísticas
+        self.baixadas = 0
+        self.falhas = 0
+        self.retentativas = 0
+        self.bytes = 0
+        self.nao_modificadas = 0
+        self.deduplicadas = 0
+        self.erros = {}  # fname -> FalhaClassificada da última falha definitiva
+
+    def start(self):
+        os.makedirs(self.pasta, exist_ok=True)
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"image-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def _limite_host(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.BoundedSemaphore(self.por_host)
+            return self._hosts[host]
+
+    @contextmanager
+    def _vaga(self, url):
+        """Vaga no host: do limitador compartilhado ou do semáforo por host"""
+        if self.limitador is not None:
+            with self.limitador.requisicao(url) as req:
+                yield req
+        else:
+            with self._limite_host(url):
+                yield None
+
+    def enfileirar(self, sku, urls):
+        """
+        Agenda o download das imagens do SKU como {sku}_{i}.jpg
+
+        Retorna a lista de Futures; cada uma resolve para o nome do arquivo
+        salvo ou None se o download falhou, e future.medicao traz os segundos,
+        os bytes transferidos e as retentativas do download. Com o índice, o total de imagens
+        do SKU é atualizado (posições acima dele passam a ser órfãs).
+        """
+        if self.indice is not None:
+            self.indice.definir_total(sku, len(urls))
+        return [self.agendar(url, f"{sku}_{i}.jpg", sku, i) for i, url in enumerate(urls, 1)]
+
+    def agendar(self, url, fname, sku=None, posicao=None):
+        """
+        Agenda o download de uma imagem para output/fname e retorna a Future
+
+        Com sku e posicao, a imagem salva é registrada no índice.
+        """
+        future = Future()
+        self._fila.put((url, fname, sku, posicao, future))
+        return future
+
+    def aguardar(self, futures):
+        """Espera os downloads e retorna os nomes dos arquivos salvos, em ordem"""
+        return [nome for nome in (f.result() for f in futures) if nome]
+
+    def _worker(self):
+        while True:
+            item = self._fila.get()
+            if item is None:
+                break
+            url, fname, sku, posicao, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            medicao = future.medicao = {"segundos": 0.0, "bytes": 0, "retentativas": 0}
+            inicio = time.perf_counter()
+            try:
+                hash_hex, tamanho, medicao["bytes"] = self._baixar(url, fname, medicao)
+                if self.indice is not None and sku is not None:
+                    self.indice.registrar(sku, posicao, fname, hash_hex, tamanho, url)
+                medicao["segundos"] = time.perf_counter() - inicio
+                future.set_result(fname)
+            except Exception as e:
+                log.warning("⚠️ Erro ao baixar %s: %s", url, e, extra={"campos": {"sku": sku, "imagem": fname}})
+                with self._lock:
+                    self.falhas += 1
+                    self.erros[fname] = e
+                medicao["segundos"] = time.perf_counter() - inicio
+                future.set_result(None)
+
+    def _baixar(self, url, fname, medicao):
+        """
+        Baixa a imagem com retentativas
+
+        Retorna (sha-256, tamanho do arquivo, bytes transferidos); os bytes
+        transferidos são 0 quando o servidor responde 304.
+        """
+        def contar_retentativa(classe, erro):
+            medicao["retentativas"] += 1
+            with self._lock:
+                self.retentativas += 1
+
+        headers = self.store.cabecalhos_condicionais(url) if self.store else {}
+        return self.politica.executar(self._tentar, url, fname, headers, etapa="imagem",
+                                      tentativas_max=self.tentativas, ao_retentar=contar_retentativa)
+
+    def _tentar(self, url, fname, headers):
+        """Uma tentativa de download; erros HTTP sobem como requests.HTTPError"""
+        destino = os.path.join(self.pasta, fname)
+        temporario = destino + ".part"
+        try:
+            with self._vaga(url) as req:
+                with self.session.get(url, stream=True, timeout=self.timeout, headers=headers) as resp:
+                    if req is not None:
+                        req.resposta(resp.status_code, resp.headers.get("Retry-After"))
+                    if resp.status_code == 304 and headers:
+                        # Imagem inalterada: só garantir o link do SKU para o blob
+                        hash_hex = self.store.consultar(url)[0]
+                        self.store.vincular(hash_hex, destino)
+                        with self._lock:
+                            self.nao_modificadas += 1
+                        return hash_hex, os.path.getsize(destino), 0
+                    resp.raise_for_status()
+
+                    total = 0
+                    digest = self.store.novo_hash() if self.store else hashlib.sha256()
+                    with open(temporario, "wb") as f:
+                        for chunk in resp.iter_content(16384):
+                            if chunk:
+                                f.write(chunk)
+                                total += len(chunk)
+                                digest.update(chunk)
+
+            hash_hex = digest.hexdigest()
+            if self.store:
+                novo = self.store.guardar(temporario, hash_hex)
+                self.store.registrar(url, hash_hex, resp.headers.get("ETag"),
+                                     resp.headers.get("Last-Modified"), total)
+                self.store.vincular(hash_hex, destino)
+            else:
+                novo = True
+                os.replace(temporario, destino)
+            with self._lock:
+                self.baixadas += 1
+                self.bytes += total
+                if not novo:
+                    self.deduplicadas += 1
+            return hash_hex, total, total
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+    def falha(self, fname):
+        """Falha definitiva do download de fname, se houve"""
+        with self._lock:
+            return self.erros.get(fname)
+
+    def close(self):
+        """Termina os downloads pendentes e encerra os workers"""
+        for _ in self._threads:
+            self._fila.put(None)
+        for t in self._threads:
+            t.join()
+        self._threads = []
+        self.session.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,310 @@
+"""
+Índice persistente das imagens baixadas
+
+O downloader registra cada imagem salva ({sku}_{i}.jpg) em SQLite com o SKU,
+a posição, o hash, o tamanho e a URL de origem, e o extrator registra quantas
+imagens cada produto tem. O manifesto imagens_leo_madeiras.csv é gerado a
+partir do índice, sem listar a pasta de imagens: cada alteração recebe um
+número de versão, e o manifesto só é reescrito quando algo que aparece nele
+mudou (produtos totalmente novos são acrescentados ao final do arquivo).
+
+Com o total de imagens de cada SKU, o índice também aponta as órfãs (arquivos
+de posições que o produto não tem mais) e as lacunas (posições que nunca
+foram baixadas).
+"""
+
+import csv
+import hashlib
+import itertools
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+RE_ARQUIVO = re.compile(r"^(.+)_(\d+)\.(jpe?g|png|webp|gif)$", re.IGNORECASE)
+COLUNAS_MANIFESTO = ["IDSKU", "IsMain", "Label", "Name", "url"]
+POSICOES = ["primeira", "segunda", "terceira", "quarta", "quinta", "sexta", "sétima", "oitava", "nona", "décima"]
+
+def rotulo(i):
+    """Label/Name da imagem pela ordem dentro do SKU (0 é a principal)"""
+    return POSICOES[i] if i < len(POSICOES) else f"posição_{i + 1}"
+
+def _json_lista(valores):
+    """Lista como JSON, para passar ao SQLite via json_each sem limite de parâmetros"""
+    return json.dumps(list(valores))
+
+def hash_arquivo(caminho):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+class IndiceImagens:
+    """SKU, posição, arquivo, hash, tamanho e URL de cada imagem baixada"""
+
+    def __init__(self, caminho, lote_commit=200):
+        self.caminho = caminho
+        self.lote_commit = lote_commit
+        self._lock = threading.Lock()
+        self._pendentes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        self._db = sqlite3.connect(caminho, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS imagens (
+                sku TEXT NOT NULL,
+                posicao INTEGER NOT NULL,
+                arquivo TEXT NOT NULL UNIQUE,
+                hash TEXT,
+                tamanho INTEGER,
+                url TEXT,
+                processada TEXT,
+                versao_processada INTEGER,
+                criada INTEGER NOT NULL,
+                versao INTEGER NOT NULL,
+                atualizado_em TEXT NOT NULL,
+                PRIMARY KEY (sku, posicao)
+            );
+            CREATE TABLE IF NOT EXISTS skus (
+                sku TEXT PRIMARY KEY,
+                total INTEGER NOT NULL,
+                versao INTEGER NOT NULL,
+                atualizado_em TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS manifestos (
+                caminho TEXT PRIMARY KEY,
+                versao INTEGER NOT NULL,
+                url_base TEXT NOT NULL,
+                processadas INTEGER NOT NULL,
+                gerado_em TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS imagens_versao ON imagens (versao);
+            CREATE INDEX IF NOT EXISTS skus_versao ON skus (versao);
+        """)
+        self._db.commit()
+        # Versão monotônica: toda mudança visível no manifesto recebe a próxima
+        self._versao = self._db.execute(
+            """SELECT MAX(v) FROM (SELECT MAX(versao) AS v FROM imagens UNION ALL
+                                  SELECT MAX(versao_processada) FROM imagens UNION ALL SELECT MAX(versao) FROM skus)"""
+        ).fetchone()[0] or 0
+
+    def _escrever(self, sql, parametros):
+        """Executa uma escrita com commit em lotes (chamar com o lock)"""
+        self._db.execute(sql, parametros)
+        self._pendentes += 1
+        if self._pendentes >= self.lote_commit:
+            self._db.commit()
+            self._pendentes = 0
+
+    def registrar(self, sku, posicao, arquivo, hash_conteudo=None, tamanho=None, url=None):
+        """Registra uma imagem salva; a versão só muda se o arquivo da posição mudou"""
+        agora = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self._versao += 1
+            self._escrever(
+                """INSERT INTO imagens (sku, posicao, arquivo, hash, tamanho, url, criada, versao, atualizado_em)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(sku, posicao) DO UPDATE SET
+                       versao = CASE WHEN imagens.arquivo = excluded.arquivo THEN imagens.versao
+                                     ELSE excluded.versao END,
+                       processada = CASE WHEN imagens.arquivo = excluded.arquivo THEN imagens.processada END,
+                       arquivo = excluded.arquivo, hash = excluded.hash, tamanho = excluded.tamanho,
+                       url = excluded.url, atualizado_em = excluded.atualizado_em""",
+                (str(sku), int(posicao), arquivo, hash_conteudo, tamanho, url, self._versao, self._versao, agora),
+            )
+
+    def definir_total(self, sku, total):
+        """Quantas imagens o produto tem agora (posições acima disso viram órfãs)"""
+        agora = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self._versao += 1
+            self._escrever(
+                """INSERT INTO skus (sku, total, versao, atualizado_em) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(sku) DO UPDATE SET
+                       versao = CASE WHEN skus.total = excluded.total THEN skus.versao ELSE excluded.versao END,
+                       total = excluded.total, atualizado_em = excluded.atualizado_em""",
+                (str(sku), int(total), self._versao, agora),
+            )
+
+    def marcar_processada(self, arquivo, saida):
+        """Nome da versão processada (image_processing) de um arquivo original"""
+        with self._lock:
+            self._versao += 1
+            self._escrever(
+                """UPDATE imagens SET processada = ?, versao_processada = ?
+                   WHERE arquivo = ? AND processada IS NOT ?""",
+                (saida, self._versao, arquivo, saida),
+            )
+
+    def total_imagens(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM imagens").fetchone()[0]
+
+    def registros(self):
+        """[(sku, posição, arquivo, hash, tamanho, url, processada)] de todas as imagens, por SKU e posição"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT sku, posicao, arquivo, hash, tamanho, url, processada FROM imagens ORDER BY sku, posicao"
+            ).fetchall()
+
+    def totais(self):
+        """{sku: total de imagens} dos produtos com o total registrado"""
+        with self._lock:
+            return dict(self._db.execute("SELECT sku, total FROM skus"))
+
+    def importar_pasta(self, pasta):
+        """
+        Popula o índice a partir dos arquivos de uma pasta (uma única vez, para
+        imagens baixadas antes do índice existir)
+
+        Retorna (importadas, ignoradas); ignoradas são os nomes fora do padrão
+        {sku}_{i}.ext. A URL de origem e o total de imagens ficam em branco.
+        """
+        importadas, ignoradas = 0, []
+        for entrada in os.scandir(pasta):
+            if not entrada.is_file():
+                continue
+            match = RE_ARQUIVO.match(entrada.name)
+            if not match:
+                if not entrada.name.endswith((".part", ".link")):
+                    ignoradas.append(entrada.name)
+                continue
+            self.registrar(match.group(1), int(match.group(2)), entrada.name,
+                           hash_arquivo(entrada.path), entrada.stat().st_size)
+            importadas += 1
+        self.sincronizar()
+        return importadas, sorted(ignoradas)
+
+    def importar_processadas(self, pasta):
+        """Associa as saídas já existentes do pós-processamento aos originais {sku}_{i}.jpg"""
+        for entrada in os.scandir(pasta):
+            if entrada.is_file() and RE_ARQUIVO.match(entrada.name):
+                self.marcar_processada(os.path.splitext(entrada.name)[0] + ".jpg", entrada.name)
+        self.sincronizar()
+
+    def orfas(self):
+        """[(sku, posição, arquivo)] de posições acima do total atual do produto"""
+        with self._lock:
+            return self._db.execute(
+                """SELECT i.sku, i.posicao, i.arquivo FROM imagens i JOIN skus s ON s.sku = i.sku
+                   WHERE i.posicao > s.total ORDER BY i.sku, i.posicao"""
+            ).fetchall()
+
+    def lacunas(self, processadas=False):
+        """
+        [(sku, [posições])] sem imagem entre 1 e o total do produto
+
+        Sem o total (imagens importadas de uma pasta), vale a maior posição
+        registrada. Com processadas=True, posições sem a versão processada
+        também contam como lacuna.
+        """
+        filtro = " AND i.processada IS NOT NULL" if processadas else ""
+        conta = "i.processada IS NOT NULL" if processadas else "1"
+        with self._lock:
+            incompletos = self._db.execute(f"""
+                SELECT s.sku, s.total FROM skus s
+                LEFT JOIN imagens i ON i.sku = s.sku AND i.posicao <= s.total{filtro}
+                GROUP BY s.sku HAVING COUNT(i.posicao) < s.total
+                UNION ALL
+                SELECT i.sku, MAX(i.posicao) FROM imagens i
+                WHERE i.sku NOT IN (SELECT sku FROM skus)
+                GROUP BY i.sku HAVING SUM({conta}) < MAX(i.posicao)
+                ORDER BY 1
+            """).fetchall()
+            resultado = []
+            for sku, total in incompletos:
+                presentes = {p for (p,) in self._db.execute(
+                    f"SELECT i.posicao FROM imagens i WHERE i.sku = ?{filtro}", (sku,))}
+                resultado.append((sku, [p for p in range(1, total + 1) if p not in presentes]))
+        return resultado
+
+    def arquivos_ausentes(self, pasta, processadas=False):
+        """Arquivos do índice que não existem mais na pasta (confere um por um, sem listar a pasta)"""
+        coluna = "processada" if processadas else "arquivo"
+        with self._lock:
+            nomes = [n for (n,) in self._db.execute(f"SELECT {coluna} FROM imagens WHERE {coluna} IS NOT NULL")]
+        return [nome for nome in nomes if not os.path.exists(os.path.join(pasta, nome))]
+
+    def _linhas_manifesto(self, processadas, skus=None):
+        """(sku, nome do arquivo) das imagens válidas, por SKU e posição"""
+        coluna = "i.processada" if processadas else "i.arquivo"
+        sql = f"""SELECT i.sku, {coluna} FROM imagens i LEFT JOIN skus s ON s.sku = i.sku
+                  WHERE (s.total IS NULL OR i.posicao <= s.total) AND {coluna} IS NOT NULL"""
+        if skus is not None:
+            sql += " AND i.sku IN (SELECT value FROM json_each(?))"
+        sql += " ORDER BY i.sku, i.posicao"
+        parametros = (_json_lista(skus),) if skus is not None else ()
+        return self._db.execute(sql, parametros).fetchall()
+
+    def gerar_manifesto(self, caminho, url_base, processadas=False):
+        """
+        Gera ou atualiza o CSV de imagens (IDSKU, IsMain, Label, Name, url)
+
+        Nada é escrito se nenhuma linha mudou desde a última geração. Se só
+        entraram SKUs novos, as linhas deles são acrescentadas ao final; senão
+        o arquivo é regravado a partir do índice. Retorna um dicionário com o
+        modo ("inalterado", "acrescimo" ou "completo"), as linhas escritas e os
+        SKUs afetados.
+        """
+        caminho = os.path.abspath(caminho)
+        with self._lock:
+            self._db.commit()
+            self._pendentes = 0
+            anterior = self._db.execute(
+                "SELECT versao, url_base, processadas FROM manifestos WHERE caminho = ?", (caminho,)
+            ).fetchone()
+            versao_atual = self._versao
+
+            modo, skus = "completo", None
+            if anterior and tuple(anterior[1:]) == (url_base, int(processadas)) and os.path.exists(caminho):
+                ultima = anterior[0]
+                # O nome processado só conta para o manifesto das processadas
+                mudou = "versao > ?1 OR versao_processada > ?1" if processadas else "versao > ?1"
+                skus = [s for (s,) in self._db.execute(
+                    f"SELECT sku FROM imagens WHERE {mudou} UNION SELECT sku FROM skus WHERE versao > ?1",
+                    (ultima,))]
+                if not skus:
+                    modo = "inalterado"
+                elif self._db.execute(
+                        "SELECT 1 FROM imagens WHERE criada <= ? AND sku IN (SELECT value FROM json_each(?)) LIMIT 1",
+                        (ultima, _json_lista(skus))).fetchone() is None:
+                    modo = "acrescimo"
+                else:
+                    skus = None
+
+            linhas = 0
+            if modo != "inalterado":
+                registros = self._linhas_manifesto(processadas, skus if modo == "acrescimo" else None)
+                linhas = len(registros)
+                temporario = caminho + ".part"
+                destino = caminho if modo == "acrescimo" else temporario
+                os.makedirs(os.path.dirname(caminho), exist_ok=True)
+                with open(destino, "a" if modo == "acrescimo" else "w", newline="", encoding="utf-8") as f:
+                    escritor = csv.writer(f)
+                    if modo == "completo":
+                        escritor.writerow(COLUNAS_MANIFESTO)
+                    for sku, grupo in itertools.groupby(registros, key=lambda r: r[0]):
+                        for i, (_, nome) in enumerate(grupo):
+                            escritor.writerow([sku, i == 0, rotulo(i), rotulo(i), url_base + nome])
+                if modo == "completo":
+                    os.replace(temporario, caminho)
+                self._db.execute(
+                    """INSERT OR REPLACE INTO manifestos (caminho, versao, url_base, processadas, gerado_em)
+                       VALUES (?, ?, ?, ?, ?)""",
+                    (caminho, versao_atual, url_base, int(processadas), datetime.now().isoformat(timespec="seconds")),
+                )
+                self._db.commit()
+        return {"modo": modo, "linhas": linhas, "skus": len(skus) if skus is not None else None}
+
+    def sincronizar(self):
+        with self._lock:
+            self._db.commit()
+            self._pendentes = 0
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
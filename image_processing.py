@@ -0,0 +1,297 @@
+"""
+Pós-processamento das imagens baixadas
+
+As imagens são salvas como {sku}_{i}.jpg qualquer que seja o formato servido
+pelo cws.digital (há PNG e WebP entre elas). Este estágio detecta o formato
+real pelos bytes mágicos, reencoda no formato e qualidade alvo, gera as
+miniaturas e remove os metadados (EXIF, XMP, comentários; o perfil ICC é
+mantido para não mudar as cores), em um pool de processos.
+
+Os originais nunca são alterados: em imagens_produtos/ eles são hard links
+para os blobs do cache (image_store), então toda saída vai para outra pasta,
+gravada em um arquivo temporário e trocada com os.replace. Arquivos com o
+mesmo conteúdo (o mesmo inode) são processados uma vez e ligados por hard
+link às demais saídas.
+"""
+
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow é opcional: sem ele o estágio fica desativado
+    Image = ImageOps = None
+
+log = logging.getLogger(__name__)
+
+# Formato alvo -> (formato do Pillow, extensão)
+FORMATOS_SAIDA = {"webp": ("WEBP", ".webp"), "jpeg": ("JPEG", ".jpg"), "png": ("PNG", ".png")}
+EXTENSOES = {"jpeg": (".jpg", ".jpeg"), "png": (".png",), "webp": (".webp",), "gif": (".gif",),
+             "bmp": (".bmp",), "tiff": (".tif", ".tiff"), "avif": (".avif",)}
+
+class ErroImagem(Exception):
+    """O arquivo não é uma imagem que o Pillow consiga ler"""
+
+def detectar_formato(cabecalho):
+    """Formato real da imagem a partir dos primeiros bytes, ou None se não for imagem conhecida"""
+    if cabecalho.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if cabecalho.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if cabecalho[:4] == b"RIFF" and cabecalho[8:12] == b"WEBP":
+        return "webp"
+    if cabecalho[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if cabecalho[4:8] == b"ftyp" and cabecalho[8:12] in (b"avif", b"avis"):
+        return "avif"
+    if cabecalho[:4] in (b"II*\x00", b"MM\x00*"):
+        return "tiff"
+    if cabecalho[:2] == b"BM":
+        return "bmp"
+    return None
+
+def formato_arquivo(caminho):
+    with open(caminho, "rb") as f:
+        return detectar_formato(f.read(16))
+
+def _converter(img, formato):
+    """Modo de cor aceito pelo formato alvo; transparência vira fundo branco no JPEG"""
+    transparente = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+    if formato == "jpeg" or not transparente:
+        if transparente:
+            img = img.convert("RGBA")
+            fundo = Image.new("RGB", img.size, (255, 255, 255))
+            fundo.paste(img, mask=img.getchannel("A"))
+            return fundo
+        return img if img.mode == "RGB" else img.convert("RGB")
+    return img if img.mode == "RGBA" else img.convert("RGBA")
+
+def _salvar(img, destino, formato, qualidade, icc):
+    """Grava em destino.part e troca com os.replace (nunca escreve através de um hard link)"""
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    formato_pil = FORMATOS_SAIDA[formato][0]
+    opcoes = {"icc_profile": icc} if icc else {}
+    if formato == "jpeg":
+        opcoes.update(quality=qualidade, optimize=True, progressive=True)
+    elif formato == "webp":
+        opcoes.update(quality=qualidade, method=4)
+    else:
+        opcoes.update(optimize=True)
+    temporario = destino + ".part"
+    try:
+        img.save(temporario, formato_pil, **opcoes)
+        os.replace(temporario, destino)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    return os.path.getsize(destino)
+
+def processar_imagem(origem, destino, formato="webp", qualidade=82, miniaturas=()):
+    """
+    Reencoda origem em destino e gera as miniaturas (executado no pool)
+
+    miniaturas é uma lista de (lado máximo, caminho). Retorna um dicionário
+    com o formato detectado e os tamanhos em bytes.
+    """
+    formato_origem = formato_arquivo(origem)
+    if formato_origem is None:
+        raise ErroImagem(f"{os.path.basename(origem)} não é uma imagem reconhecida")
+    try:
+        with Image.open(origem) as original:
+            icc = original.info.get("icc_profile")
+            # Aplica a orientação do EXIF antes de descartá-lo
+            img = ImageOps.exif_transpose(original)
+            img = _converter(img, formato)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise ErroImagem(f"{os.path.basename(origem)}: {e}") from e
+    img.info.clear()
+
+    bytes_saida = _salvar(img, destino, formato, qualidade, icc)
+    bytes_miniaturas = 0
+    for lado, caminho in miniaturas:
+        miniatura = img.copy()
+        miniatura.thumbnail((lado, lado), Image.LANCZOS)
+        bytes_miniaturas += _salvar(miniatura, caminho, formato, qualidade, icc)
+    return {
+        "formato_origem": formato_origem,
+        "largura": img.width,
+        "altura": img.height,
+        "bytes_origem": os.path.getsize(origem),
+        "bytes_saida": bytes_saida,
+        "bytes_miniaturas": bytes_miniaturas,
+    }
+
+def _vincular(origem, destino):
+    """Hard link de destino para origem (cópia se o sistema de arquivos não suportar)"""
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    if os.path.exists(destino) and os.path.samefile(origem, destino):
+        return
+    temporario = destino + ".link"
+    if os.path.exists(temporario):
+        os.remove(temporario)
+    try:
+        os.link(origem, temporario)
+    except OSError:
+        shutil.copyfile(origem, temporario)
+    os.replace(temporario, destino)
+
+class ProcessadorImagens:
+    """
+    Fila de pós-processamento atendida por um pool de processos
+
+    As saídas vão para pasta/{nome}{ext} e as miniaturas para
+    pasta/miniaturas/{lado}/{nome}{ext}. Saídas mais novas que o original são
+    reaproveitadas (a menos que forcar=True).
+    """
+
+    def __init__(self, pasta, formato="webp", qualidade=82, miniaturas=(300,), workers=None, forcar=False):
+        if Image is None:
+            raise RuntimeError("Pillow não está instalado (pip install Pillow)")
+        if formato not in FORMATOS_SAIDA:
+            raise ValueError(f"Formato de saída inválido: {formato!r} (use {', '.join(FORMATOS_SAIDA)})")
+        self.pasta = pasta
+        self.formato = formato
+        self.extensao = FORMATOS_SAIDA[formato][1]
+        self.qualidade = int(qualidade)
+        self.miniaturas = sorted({int(lado) for lado in miniaturas if int(lado) > 0}, reverse=True)
+        self.forcar = forcar
+        self.workers = workers or os.cpu_count() or 1
+        # spawn, como o pool de parse: o processo pai tem threads de download e render
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        self._por_conteudo = {}
+        self._lock = threading.Lock()
+
+        # Estatísticas
+        self.processadas = 0
+        self.reaproveitadas = 0
+        self.duplicadas = 0
+        self.falhas = 0
+        self.extensao_errada = 0
+        self.bytes_origem = 0
+        self.bytes_saida = 0
+        self.bytes_miniaturas = 0
+        self.formatos = Counter()
+
+    def nome_saida(self, nome):
+        return os.path.splitext(os.path.basename(nome))[0] + self.extensao
+
+    def caminhos(self, origem):
+        """(saída, [(lado, miniatura), ...]) de um arquivo original"""
+        nome = self.nome_saida(origem)
+        return (os.path.join(self.pasta, nome),
+                [(lado, os.path.join(self.pasta, "miniaturas", str(lado), nome)) for lado in self.miniaturas])
+
+    def _atualizada(self, origem, destino, miniaturas):
+        if self.forcar:
+            return False
+        mtime = os.path.getmtime(origem)
+        return all(os.path.exists(c) and os.path.getmtime(c) >= mtime for c in [destino] + [c for _, c in miniaturas])
+
+    def agendar(self, origem):
+        """
+        Agenda o processamento de um arquivo original
+
+        Retorna uma Future que resolve para o nome do arquivo de saída, ou None
+        se a imagem não pôde ser processada.
+        """
+        destino, miniaturas = self.caminhos(origem)
+        resultado = Future()
+        try:
+            info = os.stat(origem)
+            if self._atualizada(origem, destino, miniaturas):
+                with self._lock:
+                    self.reaproveitadas += 1
+                resultado.set_result(os.path.basename(destino))
+                return resultado
+        except OSError as e:
+            self._falhar(origem, e, resultado)
+            return resultado
+
+        # Hard links para o mesmo blob: processa uma vez e liga as outras saídas
+        chave = (info.st_dev, info.st_ino, info.st_mtime_ns)
+        with self._lock:
+            primeira = self._por_conteudo.get(chave)
+            if primeira is None:
+                self._por_conteudo[chave] = (destino, miniaturas, resultado)
+        if primeira is not None:
+            destino_base, miniaturas_base, future_base = primeira
+            future_base.add_done_callback(
+                lambda f: self._ligar(f, origem, destino_base, miniaturas_base, destino, miniaturas, resultado))
+            return resultado
+
+        try:
+            tarefa = self._pool.submit(processar_imagem, origem, destino, self.formato, self.qualidade, miniaturas)
+        except RuntimeError as e:  # pool já encerrado
+            self._falhar(origem, e, resultado)
+            return resultado
+        tarefa.add_done_callback(lambda f: self._concluir(f, origem, destino, resultado))
+        return resultado
+
+    def _concluir(self, tarefa, origem, destino, resultado):
+        try:
+            dados = tarefa.result()
+        except Exception as e:
+            self._falhar(origem, e, resultado)
+            return
+        with self._lock:
+            self.processadas += 1
+            self.bytes_origem += dados["bytes_origem"]
+            self.bytes_saida += dados["bytes_saida"]
+            self.bytes_miniaturas += dados["bytes_miniaturas"]
+            self.formatos[dados["formato_origem"]] += 1
+            if os.path.splitext(origem)[1].lower() not in EXTENSOES.get(dados["formato_origem"], ()):
+                self.extensao_errada += 1
+        resultado.set_result(os.path.basename(destino))
+
+    def _ligar(self, base, origem, destino_base, miniaturas_base, destino, miniaturas, resultado):
+        if base.result() is None:
+            resultado.set_result(None)
+            return
+        try:
+            _vincular(destino_base, destino)
+            for (_, caminho_base), (_, caminho) in zip(miniaturas_base, miniaturas):
+                _vincular(caminho_base, caminho)
+        except OSError as e:
+            self._falhar(origem, e, resultado)
+            return
+        with self._lock:
+            self.duplicadas += 1
+        resultado.set_result(os.path.basename(destino))
+
+    def _falhar(self, origem, erro, resultado):
+        log.warning("⚠️ Erro ao processar imagem %s: %s", os.path.basename(origem), erro)
+        with self._lock:
+            self.falhas += 1
+        resultado.set_result(None)
+
+    def processar(self, origens):
+        """Processa os arquivos e retorna os nomes de saída, na ordem (None nos que falharam)"""
+        return [f.result() for f in [self.agendar(origem) for origem in origens]]
+
+    def resumo(self):
+        with self._lock:
+            return {
+                "processadas": self.processadas,
+                "reaproveitadas": self.reaproveitadas,
+                "duplicadas": self.duplicadas,
+                "falhas": self.falhas,
+                "extensao_errada": self.extensao_errada,
+                "formatos": dict(self.formatos),
+                "bytes_origem": self.bytes_origem,
+                "bytes_saida": self.bytes_saida,
+                "bytes_miniaturas": self.bytes_miniaturas,
+            }
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,114 @@
+"""
+Armazenamento de imagens endereçado por conteúdo
+
+Cada imagem é guardada uma única vez em blobs/{hash[:2]}/{hash}, e os nomes
+por SKU ({sku}_{i}.jpg) são hard links para o blob. Um índice SQLite guarda,
+para cada URL de origem, o hash e os cabeçalhos ETag/Last-Modified usados nas
+requisições condicionais das próximas execuções.
+"""
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+from datetime import datetime
+
+class ImageStore:
+    """Blobs de imagem por hash + índice URL -> hash"""
+
+    def __init__(self, raiz):
+        self.raiz = raiz
+        self.pasta_blobs = os.path.join(raiz, "blobs")
+        os.makedirs(self.pasta_blobs, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(raiz, "index.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS imagens (
+                url TEXT PRIMARY KEY,
+                hash TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                tamanho INTEGER,
+                atualizado_em TEXT
+            )
+        """)
+        self._db.commit()
+
+    @staticmethod
+    def novo_hash():
+        return hashlib.sha256()
+
+    def caminho_blob(self, digest):
+        return os.path.join(self.pasta_blobs, digest[:2], digest)
+
+    def consultar(self, url):
+        """Retorna (hash, etag, last_modified) da URL ou None se ela nunca foi baixada"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT hash, etag, last_modified FROM imagens WHERE url = ?", (url,)
+            ).fetchone()
+
+    def cabecalhos_condicionais(self, url):
+        """Cabeçalhos If-None-Match/If-Modified-Since para a URL, se o blob ainda existir"""
+        registro = self.consultar(url)
+        if not registro or not os.path.exists(self.caminho_blob(registro[0])):
+            return {}
+
+        headers = {}
+        if registro[1]:
+            headers["If-None-Match"] = registro[1]
+        if registro[2]:
+            headers["If-Modified-Since"] = registro[2]
+        return headers
+
+    def guardar(self, arquivo, digest):
+        """
+        Move o arquivo baixado para o blob do hash
+
+        Retorna False se o blob já existia (conteúdo duplicado); nesse caso o
+        arquivo é descartado.
+        """
+        blob = self.caminho_blob(digest)
+        if os.path.exists(blob):
+            os.remove(arquivo)
+            return False
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        os.replace(arquivo, blob)
+        return True
+
+    def registrar(self, url, digest, etag=None, last_modified=None, tamanho=None):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO imagens (url, hash, etag, last_modified, tamanho, atualizado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, digest, etag, last_modified, tamanho, datetime.now().isoformat(timespec="seconds")),
+            )
+            self._db.commit()
+
+    def vincular(self, digest, destino):
+        """
+        Faz destino apontar para o blob do hash
+
+        Retorna False quando o destino já era o mesmo arquivo (nada foi escrito).
+        """
+        blob = self.caminho_blob(digest)
+        if os.path.exists(destino) and os.path.samefile(blob, destino):
+            return False
+
+        temporario = destino + ".link"
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        try:
+            os.link(blob, temporario)
+        except OSError:
+            # Sistemas de arquivo sem hard link (ou outro volume): copiar
+            shutil.copyfile(blob, temporario)
+        os.replace(temporario, destino)
+        return True
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,101 @@
+"""
+Política de interceptação de requisições dos renders do Playwright
+
+O JavaScript da loja é necessário para preencher data-zoom-image e
+data-sku-obj, mas analytics, tag managers, widgets de chat e folhas de estilo
+não são. Cada requisição da página é decidida por:
+
+1. denylist de domínios (analytics, anúncios, chat) -> bloqueia;
+2. tipo de recurso bloqueado (imagem, fonte, mídia, CSS) -> bloqueia;
+3. allowlist (domínios da loja e o próprio host da página) -> permite;
+4. demais domínios (terceiros) -> bloqueia, se bloquear_terceiros.
+
+Os contadores por execução mostram quantas requisições foram bloqueadas (por
+motivo, tipo e domínio) e quantos bytes as requisições permitidas trouxeram.
+"""
+
+from collections import Counter
+from urllib.parse import urlparse
+
+# Recursos que nunca afetam o DOM usado na extração
+TIPOS_BLOQUEADOS = {"image", "media", "font", "stylesheet"}
+
+# Domínios da loja (e do CDN) cujos scripts preenchem preço e imagens, mais os
+# CDNs públicos de bibliotecas (jQuery etc.) de que esses scripts dependem
+DOMINIOS_PERMITIDOS = [
+    "leomadeiras.com.br", "cws.digital",
+    "code.jquery.com", "ajax.googleapis.com", "cdnjs.cloudflare.com", "cdn.jsdelivr.net", "unpkg.com",
+]
+
+DOMINIOS_BLOQUEADOS = [
+    # Analytics e tag managers
+    "google-analytics.com", "googletagmanager.com", "analytics.google.com", "clarity.ms",
+    "hotjar.com", "hotjar.io", "segment.io", "segment.com", "mixpanel.com", "newrelic.com",
+    "nr-data.net", "sentry.io",
+    # Anúncios e pixels
+    "doubleclick.net", "googleadservices.com", "googlesyndication.com", "facebook.net",
+    "facebook.com", "tiktok.com", "bing.com", "criteo.com", "criteo.net", "pinterest.com",
+    "linkedin.com", "ads-twitter.com", "taboola.com", "outbrain.com",
+    # Chat, CRM e widgets
+    "zendesk.com", "zdassets.com", "jivosite.com", "tawk.to", "rdstation.com.br",
+    "rdstation.com", "hubspot.com", "intercom.io", "onesignal.com", "youtube.com",
+]
+
+def _casa_dominio(host, dominios):
+    return any(host == d or host.endswith("." + d) for d in dominios)
+
+class PoliticaInterceptacao:
+    """Decide, para cada requisição do render, se ela segue ou é abortada"""
+
+    def __init__(self, tipos_bloqueados=None, permitidos=None, bloqueados=None, bloquear_terceiros=True):
+        self.tipos_bloqueados = set(TIPOS_BLOQUEADOS if tipos_bloqueados is None else tipos_bloqueados)
+        self.permitidos = list(DOMINIOS_PERMITIDOS if permitidos is None else permitidos)
+        self.bloqueados = list(DOMINIOS_BLOQUEADOS if bloqueados is None else bloqueados)
+        self.bloquear_terceiros = bloquear_terceiros
+
+        # Estatísticas (atualizadas só no event loop do pool)
+        self.permitidas = 0
+        self.bytes_permitidos = 0
+        self.bloqueadas_por_motivo = Counter()
+        self.bloqueadas_por_tipo = Counter()
+        self.bloqueadas_por_dominio = Counter()
+
+    def decidir(self, url, tipo, url_pagina=None):
+        """Retorna None para permitir ou o motivo do bloqueio ("dominio", "tipo", "terceiro")"""
+        host = (urlparse(url).hostname or "").lower()
+        if url.startswith(("data:", "blob:")):
+            return None
+        if _casa_dominio(host, self.bloqueados):
+            return "dominio"
+        if tipo in self.tipos_bloqueados:
+            return "tipo"
+        if not self.bloquear_terceiros or _casa_dominio(host, self.permitidos):
+            return None
+        # Primeira parte: o próprio host da página (ex.: servidor local de fixtures)
+        host_pagina = (urlparse(url_pagina).hostname or "").lower() if url_pagina else ""
+        if host_pagina and host == host_pagina:
+            return None
+        return "terceiro"
+
+    def registrar(self, url, tipo, motivo):
+        if motivo is None:
+            self.permitidas += 1
+            return
+        self.bloqueadas_por_motivo[motivo] += 1
+        self.bloqueadas_por_tipo[tipo] += 1
+        self.bloqueadas_por_dominio[urlparse(url).hostname or "?"] += 1
+
+    def registrar_resposta(self, tamanho):
+        if tamanho:
+            self.bytes_permitidos += tamanho
+
+    def resumo(self):
+        bloqueadas = sum(self.bloqueadas_por_motivo.values())
+        return {
+            "permitidas": self.permitidas,
+            "bloqueadas": bloqueadas,
+            "bytes_permitidos": self.bytes_permitidos,
+            "por_motivo": dict(self.bloqueadas_por_motivo),
+            "por_tipo": dict(self.bloqueadas_por_tipo),
+            "dominios": self.bloqueadas_por_dominio.most_common(5),
+        }
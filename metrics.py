@@ -0,0 +1,215 @@
+"""
+Instrumentação por etapa da execução do scraper
+
+Cada URL acumula um registro com o tempo de cada etapa (api, http, render,
+parse e suas partes, imagens, processamento), os bytes transferidos, as
+retentativas e a estratégia que encontrou nome, descrição, preço e imagens.
+Ao concluir, o registro vira uma linha do log JSON-lines da execução e os
+tempos entram nas amostras de cada etapa, de onde sai o resumo com p50, p95 e
+p99 e, opcionalmente, um arquivo texto no formato do Prometheus (para o
+textfile collector do node_exporter).
+
+Etapas sem URL (ex.: a descoberta e cada download de imagem) só entram nas
+amostras. As amostras ficam em array('d'), 8 bytes por medida.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+QUANTIS = (0.5, 0.95, 0.99)
+
+def percentil(ordenados, p):
+    """Percentil pelo método nearest-rank de uma sequência já ordenada"""
+    if not ordenados:
+        return 0.0
+    return ordenados[max(0, math.ceil(p * len(ordenados)) - 1)]
+
+def _rotulos(**rotulos):
+    """Rótulos do Prometheus, com aspas e barras escapadas"""
+    partes = []
+    for chave, valor in rotulos.items():
+        valor = str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        partes.append(f'{chave}="{valor}"')
+    return "{" + ",".join(partes) + "}"
+
+class MetricasExecucao:
+    """
+    Registros por URL, amostras por etapa e contadores de uma execução
+
+    caminho é o log JSON-lines (None: só em memória); prometheus é o arquivo
+    texto gravado em close().
+    """
+
+    def __init__(self, caminho=None, prometheus=None):
+        self.caminho = caminho
+        self.prometheus = prometheus
+        self.inicio = time.time()
+        self._lock = threading.Lock()
+        self._abertos = {}
+        self._amostras = {}
+        self._status = Counter()
+        self._bytes = Counter()
+        self._retentativas = Counter()
+        self._estrategias = {}
+        self._arquivo = None
+        if caminho:
+            os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+            self._arquivo = open(caminho, "w", encoding="utf-8")
+
+    def _registro(self, url):
+        """Registro aberto da URL (chamar com o lock); o primeiro acesso marca o início"""
+        registro = self._abertos.get(url)
+        if registro is None:
+            registro = self._abertos[url] = {"url": url, "inicio": time.perf_counter(), "tempos": {},
+                                             "bytes": {}, "retentativas": {}}
+        return registro
+
+    def _amostrar(self, etapa, segundos):
+        amostras = self._amostras.get(etapa)
+        if amostras is None:
+            amostras = self._amostras[etapa] = array("d")
+        amostras.append(segundos)
+
+    def registrar_tempo(self, url, etapa, segundos):
+        """Soma o tempo à etapa da URL (ou só às amostras, se url for None)"""
+        with self._lock:
+            if url is None:
+                self._amostrar(etapa, segundos)
+            else:
+                tempos = self._registro(url)["tempos"]
+                tempos[etapa] = tempos.get(etapa, 0.0) + segundos
+
+    @contextmanager
+    def medir(self, url, etapa):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar_tempo(url, etapa, time.perf_counter() - inicio)
+
+    def contar_retentativa(self, url, etapa, n=1):
+        with self._lock:
+            if url is None:
+                self._retentativas[etapa] += n
+            else:
+                retentativas = self._registro(url)["retentativas"]
+                retentativas[etapa] = retentativas.get(etapa, 0) + n
+
+    def somar_bytes(self, url, tipo, n):
+        with self._lock:
+            if url is None:
+                self._bytes[tipo] += n
+            else:
+                registro = self._registro(url)["bytes"]
+                registro[tipo] = registro.get(tipo, 0) + n
+
+    def anotar_estrategia(self, url, campo, estrategia):
+        """Estratégia que encontrou o campo, quando ela é conhecida antes da conclusão"""
+        with self._lock:
+            self._registro(url).setdefault("estrategias", {})[campo] = estrategia
+
+    def concluir(self, url, status, estrategias=None, **campos):
+        """
+        Fecha o registro da URL e grava a linha no log
+
+        status é "ok" ou a classe da falha; estrategias é {campo: estratégia}
+        (ex.: {"preco": "data-price"}); os demais campos vão para a linha como
+        estão.
+        """
+        with self._lock:
+            registro = self._abertos.pop(url, None) or {"url": url, "inicio": None, "tempos": {},
+                                                          "bytes": {}, "retentativas": {}}
+            inicio = registro.pop("inicio")
+            registro["tempos"]["total"] = time.perf_counter() - inicio if inicio is not None else 0.0
+            registro["status"] = status
+            if estrategias:
+                registro.setdefault("estrategias", {}).update(estrategias)
+            registro.update(campos)
+
+            self._status[status] += 1
+            for etapa, segundos in registro["tempos"].items():
+                self._amostrar(etapa, segundos)
+            self._bytes.update(registro["bytes"])
+            self._retentativas.update(registro["retentativas"])
+            for campo, estrategia in registro.get("estrategias", {}).items():
+                self._estrategias.setdefault(campo, Counter())[estrategia or "nenhuma"] += 1
+
+            if self._arquivo is not None:
+                registro["quando"] = datetime.now().isoformat(timespec="seconds")
+                registro["tempos"] = {k: round(v, 6) for k, v in registro["tempos"].items()}
+                self._arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+    def resumo(self):
+        """Percentis por etapa, URLs por status, bytes, retentativas e estratégias"""
+        with self._lock:
+            etapas = {}
+            for etapa, amostras in sorted(self._amostras.items()):
+                ordenadas = sorted(amostras)
+                etapas[etapa] = {
+                    "n": len(ordenadas),
+                    "soma": sum(ordenadas),
+                    "media": sum(ordenadas) / len(ordenadas) if ordenadas else 0.0,
+                    **{f"p{round(q * 100)}": percentil(ordenadas, q) for q in QUANTIS},
+                    "max": ordenadas[-1] if ordenadas else 0.0,
+                }
+            return {
+                "duracao": time.time() - self.inicio,
+                "urls": dict(self._status),
+                "etapas": etapas,
+                "bytes": dict(self._bytes),
+                "retentativas": dict(self._retentativas),
+                "estrategias": {campo: dict(c.most_common()) for campo, c in self._estrategias.items()},
+            }
+
+    def texto_prometheus(self, resumo=None):
+        """Métricas no formato texto de exposição do Prometheus"""
+        r = resumo or self.resumo()
+        linhas = [
+            "# HELP scraper_etapa_segundos Duração de cada etapa por URL (ou por imagem).",
+            "# TYPE scraper_etapa_segundos summary",
+        ]
+        for etapa, e in r["etapas"].items():
+            for q in QUANTIS:
+                linhas.append(f"scraper_etapa_segundos{_rotulos(etapa=etapa, quantile=q)} "
+                              f"{e[f'p{round(q * 100)}']:.6f}")
+            linhas.append(f"scraper_etapa_segundos_sum{_rotulos(etapa=etapa)} {e['soma']:.6f}")
+            linhas.append(f"scraper_etapa_segundos_count{_rotulos(etapa=etapa)} {e['n']}")
+        linhas += ["# HELP scraper_urls_total URLs concluídas por status.", "# TYPE scraper_urls_total counter"]
+        linhas += [f"scraper_urls_total{_rotulos(status=s)} {n}" for s, n in sorted(r["urls"].items())]
+        linhas += ["# HELP scraper_bytes_total Bytes transferidos por tipo.", "# TYPE scraper_bytes_total counter"]
+        linhas += [f"scraper_bytes_total{_rotulos(tipo=t)} {n}" for t, n in sorted(r["bytes"].items())]
+        linhas += ["# HELP scraper_retentativas_total Retentativas por etapa.",
+                   "# TYPE scraper_retentativas_total counter"]
+        linhas += [f"scraper_retentativas_total{_rotulos(etapa=e)} {n}" for e, n in sorted(r["retentativas"].items())]
+        linhas += ["# HELP scraper_estrategia_total Estratégia que encontrou cada campo.",
+                   "# TYPE scraper_estrategia_total counter"]
+        for campo, contagem in sorted(r["estrategias"].items()):
+            linhas += [f"scraper_estrategia_total{_rotulos(campo=campo, estrategia=s)} {n}"
+                       for s, n in contagem.items()]
+        linhas += ["# HELP scraper_duracao_segundos Duração da execução.", "# TYPE scraper_duracao_segundos gauge",
+                   f"scraper_duracao_segundos {r['duracao']:.3f}"]
+        return "\n".join(linhas) + "\n"
+
+    def close(self):
+        """Grava o resumo no fim do log e o arquivo do Prometheus; retorna o resumo"""
+        r = self.resumo()
+        with self._lock:
+            if self._arquivo is not None:
+                self._arquivo.write(json.dumps({"resumo": r}, ensure_ascii=False) + "\n")
+                self._arquivo.close()
+                self._arquivo = None
+        if self.prometheus:
+            os.makedirs(os.path.dirname(os.path.abspath(self.prometheus)), exist_ok=True)
+            # Troca atômica: o collector nunca lê um arquivo pela metade
+            temporario = self.prometheus + ".part"
+            with open(temporario, "w", encoding="utf-8") as f:
+                f.write(self.texto_prometheus(r))
+            os.replace(temporario, self.prometheus)
+        return r
@@ -0,0 +1,243 @@
+"""
+Limite de taxa e concorrência adaptativa por host
+
+Todo o tráfego (HTML estático, navegação do Playwright e imagens) passa por um
+controle por host com:
+
+- token bucket: no máximo `taxa` requisições por segundo (com rajada curta);
+- concorrência AIMD: o limite de requisições simultâneas sobe +1 a cada
+  "janela" de respostas saudáveis e cai pela metade em 429/503/5xx, timeouts
+  ou latência acima do alvo; a taxa do bucket cai junto e se recupera aos poucos;
+- Retry-After: pausa o host inteiro pelo tempo pedido pelo servidor.
+
+Assim dá para usar muitos workers e deixar o controle achar a maior taxa
+sustentável, em vez de ajustar --workers na mão.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+# Respostas que indicam sobrecarga do servidor
+STATUS_LIMITE = {429, 503}
+
+class ErroHTTP(Exception):
+    """Resposta HTTP de erro vinda de um cliente que não levanta exceções próprias"""
+
+    def __init__(self, status, retry_after=None, mensagem=None):
+        super().__init__(mensagem or f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+def parse_retry_after(valor):
+    """Segundos de espera de um cabeçalho Retry-After (número ou data HTTP)"""
+    if not valor:
+        return None
+    valor = str(valor).strip()
+    if valor.isdigit():
+        return float(valor)
+    try:
+        data = parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return None
+    if data.tzinfo is None:
+        data = data.replace(tzinfo=timezone.utc)
+    return max(0.0, (data - datetime.now(timezone.utc)).total_seconds())
+
+class ControleHost:
+    """Token bucket + limite de concorrência AIMD de um host"""
+
+    def __init__(self, host, taxa=5.0, rajada=None, concorrencia=2, concorrencia_min=1,
+                 concorrencia_max=16, latencia_alvo=5.0, retry_after_max=120.0, adaptativo=True):
+        self.host = host
+        self.taxa_max = float(taxa)
+        self.taxa_min = max(0.1, self.taxa_max / 20)
+        self.taxa = self.taxa_max
+        self.capacidade = float(rajada or max(1.0, self.taxa_max))
+        self.concorrencia_min = max(1, int(concorrencia_min))
+        self.concorrencia_max = max(self.concorrencia_min, int(concorrencia_max))
+        self.limite = float(min(max(concorrencia, self.concorrencia_min), self.concorrencia_max))
+        self.latencia_alvo = latencia_alvo
+        self.retry_after_max = retry_after_max
+        self.adaptativo = adaptativo
+
+        self._cond = threading.Condition()
+        self._tokens = self.capacidade
+        self._reposto_em = time.monotonic()
+        self._pausa_ate = 0.0
+        self._ultima_reducao = 0.0
+        self.em_uso = 0
+
+        # Estatísticas
+        self.requisicoes = 0
+        self.limitadas = 0
+        self.erros = 0
+        self.reducoes = 0
+        self.espera_total = 0.0
+        self.latencia_total = 0.0
+
+    def _repor(self, agora):
+        self._tokens = min(self.capacidade, self._tokens + (agora - self._reposto_em) * self.taxa)
+        self._reposto_em = agora
+
+    def adquirir(self):
+        """Bloqueia até haver vaga de concorrência e token disponível"""
+        inicio = time.monotonic()
+        with self._cond:
+            while True:
+                agora = time.monotonic()
+                self._repor(agora)
+                if agora < self._pausa_ate:
+                    espera = self._pausa_ate - agora
+                elif self.em_uso >= int(self.limite):
+                    espera = None
+                elif self._tokens < 1:
+                    espera = (1 - self._tokens) / self.taxa
+                else:
+                    break
+                self._cond.wait(espera)
+            self._tokens -= 1
+            self.em_uso += 1
+            self.requisicoes += 1
+            self.espera_total += time.monotonic() - inicio
+
+    def liberar(self, status=None, latencia=None, erro=False, retry_after=None):
+        """Devolve a vaga e ajusta o controle com o resultado da requisição"""
+        with self._cond:
+            self.em_uso -= 1
+            if latencia is not None:
+                self.latencia_total += latencia
+
+            sobrecarga = status in STATUS_LIMITE or (status is not None and status >= 500)
+            if status in STATUS_LIMITE:
+                self.limitadas += 1
+            if erro or sobrecarga:
+                self.erros += 1
+            if retry_after:
+                agora = time.monotonic()
+                self._pausa_ate = max(self._pausa_ate, agora + min(retry_after, self.retry_after_max))
+
+            if self.adaptativo:
+                if erro or sobrecarga or retry_after:
+                    self._reduzir()
+                elif latencia is not None and latencia > self.latencia_alvo:
+                    self._reduzir(fator=0.75)
+                else:
+                    self._aumentar()
+            self._cond.notify_all()
+
+    def _aumentar(self):
+        # Aditivo: ~+1 de concorrência por janela de `limite` respostas saudáveis
+        self.limite = min(self.concorrencia_max, self.limite + 1 / self.limite)
+        self.taxa = min(self.taxa_max, self.taxa + self.taxa_max * 0.02)
+
+    def _reduzir(self, fator=0.5):
+        # Multiplicativo, no máximo uma vez por segundo: uma rajada de falhas
+        # das requisições que já estavam em andamento conta como um único sinal
+        agora = time.monotonic()
+        if agora - self._ultima_reducao < 1.0:
+            return
+        self._ultima_reducao = agora
+        self.reducoes += 1
+        self.limite = max(self.concorrencia_min, self.limite * fator)
+        self.taxa = max(self.taxa_min, self.taxa * fator)
+
+    def resumo(self):
+        with self._cond:
+            return {
+                "host": self.host,
+                "requisicoes": self.requisicoes,
+                "limitadas": self.limitadas,
+                "erros": self.erros,
+                "reducoes": self.reducoes,
+                "concorrencia": int(self.limite),
+                "taxa": round(self.taxa, 2),
+                "espera_media": self.espera_total / self.requisicoes if self.requisicoes else 0.0,
+                "latencia_media": self.latencia_total / self.requisicoes if self.requisicoes else 0.0,
+            }
+
+class _Requisicao:
+    """Resultado de uma requisição em andamento, informado pelo chamador"""
+
+    def __init__(self):
+        self.status = None
+        self.retry_after = None
+        self.latencia = None
+
+    def resposta(self, status, retry_after=None):
+        self.status = status
+        self.retry_after = parse_retry_after(retry_after) if isinstance(retry_after, str) else retry_after
+
+    def medir(self, latencia):
+        """Latência do host a usar no lugar da duração do bloco (ex.: render sem a espera de prontidão)"""
+        self.latencia = latencia
+
+class LimitadorHosts:
+    """
+    Um ControleHost por host
+
+    config_hosts mapeia sufixos de host ("leomadeiras.com.br", "cws.digital")
+    para os parâmetros do ControleHost; hosts sem configuração usam padrao.
+    Com ativo=False, requisicao() não limita nada.
+    """
+
+    def __init__(self, config_hosts=None, padrao=None, ativo=True):
+        self.config_hosts = dict(config_hosts or {})
+        self.padrao = dict(padrao or {})
+        self.ativo = ativo
+        self._controles = {}
+        self._lock = threading.Lock()
+
+    def _config(self, host):
+        for sufixo, config in self.config_hosts.items():
+            if host == sufixo or host.endswith("." + sufixo):
+                return config
+        return self.padrao
+
+    def controle(self, url):
+        host = urlparse(url).hostname or url
+        with self._lock:
+            if host not in self._controles:
+                self._controles[host] = ControleHost(host, **self._config(host))
+            return self._controles[host]
+
+    @contextmanager
+    def requisicao(self, url):
+        """
+        Reserva uma vaga no host da URL durante o bloco
+
+        Informe o status com req.resposta(status, retry_after) e, se o bloco
+        faz mais que esperar o host, a latência com req.medir(s); exceções com
+        `status` (ErroHTTP), `response` (requests.HTTPError) ou de rede contam
+        como erro do host.
+        """
+        req = _Requisicao()
+        if not self.ativo:
+            yield req
+            return
+        controle = self.controle(url)
+        controle.adquirir()
+        inicio = time.monotonic()
+        erro = False
+        try:
+            yield req
+        except Exception as e:
+            resposta = getattr(e, "response", None)
+            if getattr(e, "status", None) is not None:
+                req.resposta(e.status, getattr(e, "retry_after", None))
+            elif resposta is not None:
+                req.resposta(resposta.status_code, resposta.headers.get("Retry-After"))
+            else:
+                erro = True
+            raise
+        finally:
+            latencia = req.latencia if req.latencia is not None else time.monotonic() - inicio
+            controle.liberar(req.status, latencia, erro, req.retry_after)
+
+    def resumo(self):
+        with self._lock:
+            controles = list(self._controles.values())
+        return [c.resumo() for c in controles]
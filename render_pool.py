@@ -0,0 +1,324 @@
+"""
+Pool assíncrono de páginas Playwright para renderização concorrente
+
+Mantém páginas aquecidas distribuídas em um ou mais Chromium, entrega cada
+página a um render por vez e recicla o contexto depois de N usos para manter
+a memória sob controle. Com uma PoliticaInterceptacao, cada requisição da
+página passa pela política (scripts de terceiros, analytics e CSS abortados);
+sem ela, só imagens e fontes são bloqueadas.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+
+from rate_limiter import STATUS_LIMITE, ErroHTTP, parse_retry_after
+
+try:
+    from playwright.async_api import async_playwright
+except Exception:
+    async_playwright = None
+
+log = logging.getLogger(__name__)
+
+LAUNCH_ARGS = ['--no-sandbox', '--disable-dev-shm-usage', '--disable-gpu']
+
+CONTEXT_OPTIONS = {
+    "viewport": {'width': 1280, 'height': 720},
+    "user_agent": 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
+}
+
+# Sem política de interceptação: NÃO bloquear JavaScript - precisamos dele para carregar as imagens
+BLOQUEIO_PADRAO = "**/*.{png,jpg,jpeg,gif,svg,woff,woff2,ttf,eot}"
+
+# A página está pronta quando cada grupo tem pelo menos um elemento no DOM:
+# o preço (data-price ou o JSON data-sku-obj) e as imagens de zoom
+SELETORES_PRONTIDAO = [
+    ["[data-price]", "[data-sku-obj]"],
+    ["div[data-zoom-image]", "img.zoomImg"],
+]
+
+_JS_PRONTIDAO = """(grupos) => grupos.every(
+    (seletores) => seletores.some((sel) => document.querySelector(sel) !== null)
+)"""
+
+# Posto na fila de páginas livres quando não resta nenhuma: acorda quem espera
+_SEM_PAGINAS = None
+# Amostra dos tempos de prontidão usada nos percentis (a média e o máximo contam todos)
+AMOSTRA_PRONTIDAO = 1000
+
+async def _abortar(route):
+    await route.abort()
+
+class _Slot:
+    """Contexto + página em uso pelo pool"""
+
+    def __init__(self, browser_idx, context, page):
+        self.browser_idx = browser_idx
+        self.context = context
+        self.page = page
+        self.usos = 0
+        self.url = None  # URL do render em andamento
+
+class RenderPool:
+    """Pool de páginas Playwright compartilhado por renders concorrentes"""
+
+    def __init__(self, browsers=1, paginas_por_browser=4, max_usos=50, timeout_ms=15000,
+                 prontidao_timeout_ms=5000, seletores_prontidao=None, politica=None):
+        self.n_browsers = max(1, int(browsers))
+        self.paginas_por_browser = max(1, int(paginas_por_browser))
+        self.max_usos = max(1, int(max_usos))
+        self.timeout_ms = timeout_ms
+        self.prontidao_timeout_ms = prontidao_timeout_ms
+        self.seletores_prontidao = seletores_prontidao or SELETORES_PRONTIDAO
+        self.politica = politica
+
+        self._playwright = None
+        self._browsers = []
+        self._livres = None
+        self._capacidade = 0
+        self._fechado = False
+
+        # Estatísticas
+        self.renders = 0
+        self.reciclagens = 0
+        self.prontidao_paginas = 0
+        self.prontidao_soma = 0.0
+        self.prontidao_max = 0.0
+        self.tempos_prontidao = deque(maxlen=AMOSTRA_PRONTIDAO)  # segundos até a página ficar pronta, os mais recentes
+        self.prontidao_timeouts = 0
+
+    @property
+    def tamanho(self):
+        return self._capacidade
+
+    async def start(self):
+        if async_playwright is None:
+            raise RuntimeError("Playwright não está disponível")
+
+        self._playwright = await async_playwright().start()
+        self._livres = asyncio.Queue()
+        for idx in range(self.n_browsers):
+            self._browsers.append(await self._lancar_browser())
+            for _ in range(self.paginas_por_browser):
+                await self._livres.put(await self._novo_slot(idx))
+                self._capacidade += 1
+        return self
+
+    async def _lancar_browser(self):
+        return await self._playwright.chromium.launch(headless=True, args=LAUNCH_ARGS)
+
+    async def _novo_slot(self, browser_idx):
+        browser = self._browsers[browser_idx]
+        if not browser.is_connected():
+            # Browser caiu: relançar antes de criar novas páginas nele
+            browser = self._browsers[browser_idx] = await self._lancar_browser()
+
+        context = await browser.new_context(**CONTEXT_OPTIONS)
+        page = await context.new_page()
+        page.set_default_timeout(self.timeout_ms)
+        page.set_default_navigation_timeout(self.timeout_ms)
+        slot = _Slot(browser_idx, context, page)
+        if self.politica is None:
+            await page.route(BLOQUEIO_PADRAO, _abortar)
+        else:
+            await page.route("**/*", lambda route: self._interceptar(route, slot))
+            page.on("response", self._contar_resposta)
+        return slot
+
+    async def _interceptar(self, route, slot):
+        request = route.request
+        tipo = request.resource_type
+        try:
+            documento_principal = tipo == "document" and request.frame.parent_frame is None
+        except Exception:
+            documento_principal = False
+        motivo = None if documento_principal else self.politica.decidir(request.url, tipo, slot.url)
+        self.politica.registrar(request.url, tipo, motivo)
+        if motivo is None:
+            await route.continue_()
+        else:
+            await route.abort("blockedbyclient")
+
+    def _contar_resposta(self, response):
+        tamanho = response.headers.get("content-length")
+        if tamanho and tamanho.isdigit():
+            self.politica.registrar_resposta(int(tamanho))
+
+    async def _descartar(self, slot):
+        try:
+            await slot.context.close()
+        except Exception:
+            pass
+
+    async def _repor(self, slot):
+        """Substitui um slot usado demais ou com erro por um contexto novo"""
+        await self._descartar(slot)
+        if self._fechado:
+            self._capacidade -= 1
+            return
+
+        for tentativa in range(2):
+            try:
+                novo = await self._novo_slot(slot.browser_idx)
+                self.reciclagens += 1
+                self._livres.put_nowait(novo)
+                return
+            except Exception as e:
+                erro = e
+        self._capacidade -= 1
+        log.warning("⚠️ Página removida do pool (%d restantes): %s", self._capacidade, erro)
+        if self._capacidade <= 0:
+            self._livres.put_nowait(_SEM_PAGINAS)
+
+    async def _aguardar_prontidao(self, page, inicio):
+        """Espera até os elementos usados na extração existirem, com limite de tempo"""
+        try:
+            await page.wait_for_function(
+                _JS_PRONTIDAO, arg=self.seletores_prontidao,
+                timeout=self.prontidao_timeout_ms, polling=50
+            )
+        except Exception:
+            # Timeout não é erro: a extração ainda tem os fallbacks de texto
+            self.prontidao_timeouts += 1
+        tempo = time.perf_counter() - inicio
+        self.prontidao_paginas += 1
+        self.prontidao_soma += tempo
+        self.prontidao_max = max(self.prontidao_max, tempo)
+        self.tempos_prontidao.append(tempo)
+
+    async def _navegar(self, page, url, ao_navegar=None):
+        inicio = time.perf_counter()
+        resposta = await page.goto(url, wait_until="domcontentloaded")
+        if ao_navegar is not None:
+            ao_navegar(time.perf_counter() - inicio)
+        if resposta is not None and resposta.status in STATUS_LIMITE:
+            # Página de "muitas requisições": não vale esperar a prontidão
+            raise ErroHTTP(resposta.status, parse_retry_after(resposta.headers.get("retry-after")))
+
+        # Aguardar o JavaScript preencher preço e imagens em vez de um sleep fixo
+        await self._aguardar_prontidao(page, inicio)
+
+        return await page.content()
+
+    def resumo_prontidao(self):
+        """Estatísticas do tempo até a página ficar pronta (em segundos; percentis das últimas páginas)"""
+        if not self.prontidao_paginas:
+            return {}
+        tempos = sorted(self.tempos_prontidao)
+        return {
+            "paginas": self.prontidao_paginas,
+            "timeouts": self.prontidao_timeouts,
+            "media": self.prontidao_soma / self.prontidao_paginas,
+            "p50": tempos[len(tempos) // 2],
+            "p95": tempos[min(len(tempos) - 1, int(len(tempos) * 0.95))],
+            "max": self.prontidao_max,
+        }
+
+    async def render(self, url, ao_navegar=None):
+        """
+        Renderiza a URL em uma página livre do pool e retorna o HTML
+
+        ao_navegar, se informado, recebe os segundos até o domcontentloaded
+        (sem a espera de prontidão), chamado no event loop do pool.
+        """
+        if self._fechado:
+            raise RuntimeError("Pool de renderização já foi fechado")
+        if self._capacidade <= 0:
+            raise RuntimeError("Pool de renderização sem páginas disponíveis")
+
+        slot = await self._livres.get()
+        if slot is _SEM_PAGINAS:
+            # A última página saiu do pool enquanto este render esperava: repassa o aviso ao próximo
+            self._livres.put_nowait(_SEM_PAGINAS)
+            raise RuntimeError("Pool de renderização sem páginas disponíveis" if not self._fechado
+                               else "Pool de renderização já foi fechado")
+        slot.url = url
+        ok = False
+        try:
+            html = await self._navegar(slot.page, url, ao_navegar)
+            slot.usos += 1
+            self.renders += 1
+            ok = True
+            return html
+        finally:
+            if ok and slot.usos < self.max_usos and not self._fechado:
+                self._livres.put_nowait(slot)
+            else:
+                await self._repor(slot)
+
+    async def close(self):
+        """Fecha todas as páginas, browsers e o Playwright"""
+        if self._fechado:
+            return
+        self._fechado = True
+
+        if self._livres is not None:
+            while not self._livres.empty():
+                slot = self._livres.get_nowait()
+                if slot is not _SEM_PAGINAS:
+                    await self._descartar(slot)
+            # Renders ainda esperando uma página falham em vez de esperar para sempre
+            self._livres.put_nowait(_SEM_PAGINAS)
+        for browser in self._browsers:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+        self._browsers = []
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+class RenderPoolSync:
+    """
+    Executa um RenderPool em um event loop próprio
+
+    Permite que workers baseados em threads chamem render() de forma bloqueante
+    enquanto todas as páginas compartilham os mesmos browsers.
+    """
+
+    def __init__(self, **kwargs):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="render-pool", daemon=True)
+        self._thread.start()
+        self.pool = RenderPool(**kwargs)
+        try:
+            self._executar(self.pool.start())
+        except Exception:
+            self._executar(self.pool.close())
+            self._parar_loop()
+            raise
+
+    def _executar(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def _parar_loop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def render(self, url, ao_navegar=None):
+        return self._executar(self.pool.render(url, ao_navegar))
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+        try:
+            self._executar(self.pool.close())
+        finally:
+            self._parar_loop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
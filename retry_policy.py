@@ -0,0 +1,227 @@
+"""
+Política de retentativas compartilhada por busca, renderização e download
+
+Toda falha é classificada (timeout, conexão, HTTP 4xx, HTTP 5xx, crash do
+render, falha de parse) e cada classe tem sua política: número de tentativas
+e backoff exponencial com jitter. Um orçamento global limita as retentativas a
+uma fração das requisições, para que uma queda do site não vire uma tempestade
+de retentativas. O que falhar mesmo assim vai para um CSV de dead-letter que
+pode ser passado de volta em --input.
+"""
+
+import asyncio
+import csv
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+from rate_limiter import parse_retry_after
+
+log = logging.getLogger(__name__)
+
+TIMEOUT = "timeout"
+CONEXAO = "conexao"
+HTTP_4XX = "http_4xx"
+HTTP_5XX = "http_5xx"
+RENDER = "render"
+PARSE = "parse"
+OUTRO = "outro"
+
+CLASSES = (TIMEOUT, CONEXAO, HTTP_4XX, HTTP_5XX, RENDER, PARSE, OUTRO)
+
+# tentativas: total de execuções (1 = não repete); backoff/backoff_max em segundos
+POLITICAS_PADRAO = {
+    TIMEOUT: {"tentativas": 3, "backoff": 1.0, "backoff_max": 30.0},
+    CONEXAO: {"tentativas": 4, "backoff": 0.5, "backoff_max": 30.0},
+    # 4xx é definitivo, exceto os status que pedem para tentar de novo
+    HTTP_4XX: {"tentativas": 1, "backoff": 1.0, "backoff_max": 60.0,
+               "status_retentaveis": {408, 425, 429}, "tentativas_retentaveis": 4},
+    HTTP_5XX: {"tentativas": 4, "backoff": 1.0, "backoff_max": 60.0},
+    RENDER: {"tentativas": 2, "backoff": 2.0, "backoff_max": 30.0},
+    PARSE: {"tentativas": 1, "backoff": 0.0, "backoff_max": 0.0},
+    OUTRO: {"tentativas": 1, "backoff": 0.0, "backoff_max": 0.0},
+}
+
+class ErroRender(Exception):
+    """O Playwright falhou ao renderizar a página (crash, página fechada etc.)"""
+
+class ErroExtracao(Exception):
+    """A página foi buscada mas não foi possível extrair o produto"""
+
+class FalhaClassificada(Exception):
+    """Falha definitiva depois de aplicada a política da classe"""
+
+    def __init__(self, classe, erro, etapa=None, tentativas=1):
+        self.classe = classe
+        self.erro = erro
+        self.etapa = etapa
+        self.tentativas = tentativas
+        self.status = status_http(erro)
+        super().__init__(f"[{classe}] {str(erro) or erro.__class__.__name__}")
+
+def status_http(erro):
+    """Status HTTP carregado pela exceção (ErroHTTP ou requests.HTTPError), se houver"""
+    status = getattr(erro, "status", None)
+    if status is None and getattr(erro, "response", None) is not None:
+        status = erro.response.status_code
+    return status
+
+def retry_after(erro):
+    valor = getattr(erro, "retry_after", None)
+    if valor is None and getattr(erro, "response", None) is not None:
+        valor = parse_retry_after(erro.response.headers.get("Retry-After"))
+    return valor
+
+def classificar(erro):
+    """Classe da falha a partir da exceção"""
+    if isinstance(erro, FalhaClassificada):
+        return erro.classe
+    if isinstance(erro, ErroExtracao):
+        return PARSE
+    if isinstance(erro, ErroRender):
+        return RENDER
+    if isinstance(erro, (requests.Timeout, asyncio.TimeoutError, TimeoutError)):
+        return TIMEOUT
+    # Exceções do Playwright não herdam das do Python: classificar pelo nome
+    nome = erro.__class__.__name__
+    modulo = erro.__class__.__module__ or ""
+    if modulo.startswith("playwright"):
+        return TIMEOUT if "Timeout" in nome else RENDER
+    status = status_http(erro)
+    if status is not None:
+        return HTTP_5XX if status >= 500 else HTTP_4XX
+    if isinstance(erro, (requests.ConnectionError, ConnectionError)):
+        return CONEXAO
+    return OUTRO
+
+class ExecutorRetentativas:
+    """
+    Executa funções aplicando a política da classe de cada falha
+
+    O orçamento permite no máximo `orcamento` retentativas por execução (mais
+    uma folga fixa de `orcamento_minimo`); esgotado, as falhas passam a ser
+    definitivas na primeira tentativa.
+    """
+
+    def __init__(self, politicas=None, orcamento=0.2, orcamento_minimo=10):
+        self.politicas = {classe: dict(p) for classe, p in POLITICAS_PADRAO.items()}
+        for classe, politica in (politicas or {}).items():
+            self.politicas.setdefault(classe, {}).update(politica)
+        self.orcamento = orcamento
+        self.orcamento_minimo = orcamento_minimo
+        self._lock = threading.Lock()
+
+        # Estatísticas
+        self.execucoes = 0
+        self.retentativas = {classe: 0 for classe in CLASSES}
+        self.definitivas = {classe: 0 for classe in CLASSES}
+        self.orcamento_esgotado = 0
+
+    def _tentativas(self, politica, erro):
+        if status_http(erro) in politica.get("status_retentaveis", ()):
+            return politica.get("tentativas_retentaveis", politica["tentativas"])
+        return politica["tentativas"]
+
+    def _consumir_orcamento(self):
+        with self._lock:
+            total = sum(self.retentativas.values())
+            if total >= self.orcamento_minimo + self.orcamento * self.execucoes:
+                self.orcamento_esgotado += 1
+                return False
+            return True
+
+    def espera(self, politica, tentativa, erro=None):
+        """Backoff exponencial com jitter (metade a todo o intervalo), nunca menor que o Retry-After"""
+        teto = min(politica["backoff_max"], politica["backoff"] * (2 ** tentativa))
+        espera = random.uniform(teto / 2, teto) if teto else 0.0
+        pedido = retry_after(erro) if erro is not None else None
+        return max(espera, min(pedido, politica["backoff_max"])) if pedido else espera
+
+    def executar(self, funcao, *args, etapa=None, tentativas_max=None, ao_retentar=None, **kwargs):
+        """
+        Chama funcao(*args, **kwargs) até dar certo ou a política desistir
+
+        Levanta FalhaClassificada com a classe e o número de tentativas.
+        tentativas_max limita as tentativas de qualquer classe.
+        """
+        with self._lock:
+            self.execucoes += 1
+        tentativa = 0
+        while True:
+            try:
+                return funcao(*args, **kwargs)
+            except FalhaClassificada:
+                raise
+            except Exception as e:
+                classe = classificar(e)
+                politica = self.politicas[classe]
+                limite = self._tentativas(politica, e)
+                if tentativas_max is not None:
+                    limite = min(limite, tentativas_max)
+                tentativa += 1
+                if tentativa >= limite or not self._consumir_orcamento():
+                    with self._lock:
+                        self.definitivas[classe] += 1
+                    raise FalhaClassificada(classe, e, etapa, tentativa) from e
+
+                with self._lock:
+                    self.retentativas[classe] += 1
+                if ao_retentar:
+                    ao_retentar(classe, e)
+                espera = self.espera(politica, tentativa - 1, e)
+                log.info("🔁 %s: %s (%s), tentativa %d/%d em %.1fs", etapa or 'requisição', classe,
+                         str(e)[:80] or e.__class__.__name__, tentativa + 1, limite, espera,
+                         extra={"campos": {"etapa": etapa, "classe": classe, "tentativa": tentativa + 1}})
+                time.sleep(espera)
+
+    def resumo(self):
+        with self._lock:
+            return {
+                "execucoes": self.execucoes,
+                "retentativas": {c: n for c, n in self.retentativas.items() if n},
+                "definitivas": {c: n for c, n in self.definitivas.items() if n},
+                "orcamento_esgotado": self.orcamento_esgotado,
+            }
+
+class DeadLetter:
+    """
+    CSV com as URLs que falharam de vez na execução
+
+    Tem a coluna `url`, então pode ser usado direto em --input para
+    reprocessar só o que falhou. O arquivo é recriado a cada execução.
+    """
+
+    COLUNAS = ["url", "etapa", "classe", "erro", "tentativas", "quando"]
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.total = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        self._arquivo = open(caminho, "w", encoding="utf-8-sig", newline="")
+        self._csv = csv.DictWriter(self._arquivo, fieldnames=self.COLUNAS, lineterminator="\n")
+        self._csv.writeheader()
+        self._arquivo.flush()
+
+    def registrar(self, url, erro, etapa=None):
+        classe = classificar(erro)
+        with self._lock:
+            self._csv.writerow({
+                "url": url,
+                "etapa": getattr(erro, "etapa", None) or etapa or "",
+                "classe": classe,
+                "erro": str(getattr(erro, "erro", erro))[:500],
+                "tentativas": getattr(erro, "tentativas", 1),
+                "quando": datetime.now().isoformat(timespec="seconds"),
+            })
+            self._arquivo.flush()
+            self.total += 1
+
+    def close(self):
+        with self._lock:
+            self._arquivo.close()
@@ -1,22 +1,53 @@
-import os, re, json, time
-import pandas as pd
+import os, re, json, time, argparse, threading, queue, hashlib, itertools, multiprocessing, logging
+from contextlib import nullcontext
 import requests
-from bs4 import BeautifulSoup
+from html import unescape
 from urllib.parse import urljoin
 from datetime import datetime
 from pathlib import Path
-from tqdm import tqdm
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
-try:
-    from playwright.sync_api import sync_playwright
-except Exception:
-    sync_playwright = None
+from render_pool import RenderPoolSync, async_playwright
+from intercept_policy import PoliticaInterceptacao, TIPOS_BLOQUEADOS, DOMINIOS_PERMITIDOS, DOMINIOS_BLOQUEADOS
+from image_downloader import DownloadImagens
+from image_store import ImageStore
+from image_index import IndiceImagens
+from image_processing import ProcessadorImagens, FORMATOS_SAIDA, Image as _pillow
+from crawl_state import CrawlState, parse_since
+from change_detection import SnapshotProdutos, ExportadorDelta
+from work_queue import (FilaTrabalho, ConsumidorFila, shard_de, parse_shard, id_worker_padrao,
+                        gravar_marcador, remover_marcador)
+from stream_writer import ExportadorStream
+from html_archive import ArquivoHTML, ler_snapshot
+from catalog_api import ClienteCatalogo
+from discovery import Descobridor, ConjuntoVistos, ler_urls, SEGUIR_PADRAO
+from rate_limiter import LimitadorHosts
+from metrics import MetricasExecucao
+import structured_log
+from structured_log import contexto, criar_progresso, configurar_processo, parametros_processo, NIVEIS, FORMATOS
+from retry_policy import (ExecutorRetentativas, DeadLetter, ErroRender, ErroExtracao,
+                          FalhaClassificada, classificar, HTTP_4XX, OUTRO, PARSE)
+from extractor import coletar_candidatos, resolver_parser, PARSERS, SELETORES_NOME, SELETORES_DESCRICAO
+
+# Nome fixo: executado como script o módulo se chama __main__
+log = logging.getLogger("scraper")
 
 # === Configurações ===
 current_dir = os.path.dirname(os.path.abspath(__file__))
 input_csv = os.path.join(current_dir, "data", "csv", "produtos_link.csv")
 output_csv = os.path.join(current_dir, "data", "exports", "produtos_leo_madeiras.csv")
 output_folder = os.path.join(current_dir, "data", "exports", "imagens_produtos")
+image_cache_folder = os.path.join(current_dir, "data", "cache", "imagens")
+processed_folder = os.path.join(current_dir, "data", "exports", "imagens_processadas")
+state_db = os.path.join(current_dir, "data", "state", "crawl_state.sqlite")
+archive_folder = os.path.join(current_dir, "data", "archive", "html")
+dead_letter_csv = os.path.join(current_dir, "data", "state", "dead_letter.csv")
+seen_db = os.path.join(current_dir, "data", "state", "discovery.sqlite")
+image_index_db = os.path.join(current_dir, "data", "state", "image_index.sqlite")
+snapshot_db = os.path.join(current_dir, "data", "state", "snapshot.sqlite")
+metrics_folder = os.path.join(current_dir, "data", "metrics")
+shards_folder = os.path.join(current_dir, "data", "shards")
 
 # Criar pastas necessárias
 os.makedirs(output_folder, exist_ok=True)
@@ -34,18 +65,138 @@ session.headers.update({
 })
 
 # Configurações de performance para conexões HTTP
+# 429/503 não são repetidos aqui: o limitador por host precisa ver a resposta
 from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 session.mount('http://', HTTPAdapter(
     pool_connections=10,
     pool_maxsize=20,
-    max_retries=1
+    max_retries=Retry(total=1, respect_retry_after_header=False)
 ))
 session.mount('https://', HTTPAdapter(
     pool_connections=10,
     pool_maxsize=20,
-    max_retries=1
+    max_retries=Retry(total=1, respect_retry_after_header=False)
 ))
 
+# === Limite de Taxa por Host ===
+# Teto de requisições/s e faixa de concorrência do controle adaptativo (AIMD)
+rate_config = {
+    "leomadeiras.com.br": {"taxa": 4.0, "concorrencia": 2, "concorrencia_max": 16},
+    "cws.digital": {"taxa": 20.0, "concorrencia": 4, "concorrencia_max": 32},
+}
+rate_padrao = {"taxa": 10.0, "concorrencia": 4, "concorrencia_max": 16}
+usar_limitador = True
+_limitador = None
+_limitador_lock = threading.Lock()
+
+def get_limitador():
+    """Retorna o limitador por host compartilhado por HTTP, Playwright e imagens"""
+    global _limitador
+    with _limitador_lock:
+        if _limitador is None:
+            _limitador = LimitadorHosts(rate_config, rate_padrao, ativo=usar_limitador)
+        return _limitador
+
+def resumo_limitador():
+    """Mostra, por host, o ponto onde o controle adaptativo estabilizou"""
+    if _limitador is None:
+        return
+    for r in _limitador.resumo():
+        print(f"🚦 {r['host']}: {r['requisicoes']} req, concorrência {r['concorrencia']}, "
+              f"{r['taxa']:.1f} req/s, {r['limitadas']} limitadas (429/503), {r['erros']} erros, "
+              f"espera média {r['espera_media']:.2f}s, latência média {r['latencia_media']:.2f}s")
+
+def http_get(url, timeout=10, **kwargs):
+    """GET pela sessão compartilhada, passando pelo limitador do host"""
+    with get_limitador().requisicao(url) as req:
+        r = session.get(url, timeout=timeout, **kwargs)
+        req.resposta(r.status_code, r.headers.get("Retry-After"))
+    return r
+
+# === Retentativas ===
+# Uma política por classe de falha (retry_policy.POLITICAS_PADRAO), compartilhada
+# por busca, renderização e download de imagens
+retry_config = {
+    "orcamento": 0.2,   # retentativas permitidas por execução (fração)
+    "politicas": {},    # sobrescritas por classe, ex.: {"timeout": {"tentativas": 5}}
+}
+_retentativas = None
+_retentativas_lock = threading.Lock()
+
+def get_retentativas():
+    global _retentativas
+    with _retentativas_lock:
+        if _retentativas is None:
+            _retentativas = ExecutorRetentativas(retry_config["politicas"], retry_config["orcamento"])
+        return _retentativas
+
+def resumo_retentativas():
+    if _retentativas is None:
+        return
+    r = _retentativas.resumo()
+    if r["retentativas"] or r["definitivas"]:
+        formatar = lambda d: ", ".join(f"{c} {n}" for c, n in d.items()) or "nenhuma"
+        print(f"🔁 Retentativas: {formatar(r['retentativas'])} | falhas definitivas: {formatar(r['definitivas'])}"
+              + (f" | orçamento esgotado {r['orcamento_esgotado']}x" if r["orcamento_esgotado"] else ""))
+
+# === Instrumentação ===
+# Tempos por etapa e URL, bytes, retentativas e estratégias (ativada por --metrics/--prometheus)
+_metricas = None
+
+def medir(url, etapa):
+    """Mede o bloco como etapa da URL (url None: só a amostra da etapa); não faz nada sem instrumentação"""
+    return _metricas.medir(url, etapa) if _metricas is not None else nullcontext()
+
+def contar_retentativas(url, etapa):
+    """Callback ao_retentar que conta as retentativas da etapa na URL (None sem instrumentação)"""
+    if _metricas is None:
+        return None
+    return lambda classe, erro: _metricas.contar_retentativa(url, etapa)
+
+def somar_bytes(url, tipo, n):
+    if _metricas is not None:
+        _metricas.somar_bytes(url, tipo, n)
+
+def concluir_metricas(url, info=None, erro=None, produto=None):
+    """Fecha o registro da URL com o status e as estratégias de extração"""
+    if _metricas is None:
+        return
+    if erro is not None:
+        _metricas.concluir(url, classificar(erro), etapa=getattr(erro, "etapa", None),
+                           erro=_mensagem_erro(getattr(erro, "erro", erro))[:200])
+        return
+    estrategias = {campo: info.get(campo) for campo in ("nome", "descricao", "preco")}
+    if info.get("tier") == "api":
+        estrategias["imagens"] = "api"
+    _metricas.concluir(url, "ok", estrategias,
+                       sku=produto["_IDSKU"] if produto else None, tier=info.get("tier"),
+                       imagens=len(info.get("imagens", [])), falhas_imagens=len(info.get("falhas_imagens", [])))
+
+def fechar_metricas():
+    """Grava o resumo (e o arquivo do Prometheus) e mostra os percentis por etapa"""
+    global _metricas
+    metricas, _metricas = _metricas, None
+    if metricas is None:
+        return
+    r = metricas.close()
+    if r["etapas"]:
+        print(f"\n⏱️ Tempo por etapa (s):")
+        print(f"   {'etapa':<24} {'n':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'máx':>8} {'soma':>9}")
+        for etapa, e in r["etapas"].items():
+            print(f"   {etapa:<24} {e['n']:>7} {e['p50']:>8.3f} {e['p95']:>8.3f} {e['p99']:>8.3f} "
+                  f"{e['max']:>8.3f} {e['soma']:>9.1f}")
+    for campo, contagem in r["estrategias"].items():
+        print(f"🧭 {campo}: " + ", ".join(f"{estrategia} {n}" for estrategia, n in contagem.items()))
+    if r["bytes"]:
+        print("📦 Bytes: " + ", ".join(f"{tipo} {n / 1e6:.1f} MB" for tipo, n in r["bytes"].items()))
+    if r["retentativas"]:
+        print("🔁 Retentativas por etapa: " + ", ".join(f"{etapa} {n}" for etapa, n in r["retentativas"].items()))
+    if metricas.caminho:
+        print(f"📈 Log de métricas: {metricas.caminho}")
+    if metricas.prometheus:
+        print(f"📈 Métricas do Prometheus: {metricas.prometheus}")
+
 # === Mapeamentos VTEX ===
 maps = {
     "departamento": {
@@ -68,9 +219,21 @@ maps = {
     }
 }
 
+# === Regex pré-compiladas ===
+_RE_ESPACOS = re.compile(r"\s+")
+_RE_PRECOS = [
+    re.compile(r"R\$\s*([\d\.\s]+,\d{2})"),
+    re.compile(r"([\d\.\s]+,\d{2})"),
+    re.compile(r"([\d]+\.\d{2})"),
+]
+_RE_NAO_NUMERICO = re.compile(r'[^\d,.]')
+_RE_TEXTO_DESCRITIVO = re.compile("aplicações|benefícios|características|especificações|detalhes|informações")
+_RE_EXTENSAO_IMAGEM = re.compile(r"\.(?:jpg|jpeg|png|webp)")
+_RE_IMAGEM_EXCLUIDA = re.compile("/multimidia/|/fornecedores/|instagram|facebook|linkedln")
+
 # === Funções Utilitárias ===
 def limpar(texto):
-    return re.sub(r"\s+", " ", (texto or "").strip())
+    return _RE_ESPACOS.sub(" ", (texto or "").strip())
 
 def get_marca_id(marca_nome):
     """Retorna ID da marca no formato 2000XXX"""
@@ -93,19 +256,12 @@ def parse_preco(texto):
     if not texto:
         return ""
     
-    # Padrões de preço
-    patterns = [
-        r"R\$\s*([\d\.\s]+,\d{2})",
-        r"([\d\.\s]+,\d{2})",
-        r"([\d]+\.\d{2})"
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, texto)
+    for pattern in _RE_PRECOS:
+        match = pattern.search(texto)
         if match:
             price_str = match.group(1).strip()
             try:
-                price_clean = re.sub(r'[^\d,.]', '', price_str)
+                price_clean = _RE_NAO_NUMERICO.sub('', price_str)
                 if ',' in price_clean and '.' in price_clean:
                     price_clean = price_clean.replace('.', '').replace(',', '.')
                 elif ',' in price_clean:
@@ -116,113 +272,233 @@ def parse_preco(texto):
                 continue
     return ""
 
-# Variáveis globais para reutilizar browser
-_playwright_instance = None
-_browser = None
-_context = None
+# Pool de páginas Playwright compartilhado por todos os workers
+render_config = {
+    "browsers": 1,
+    "paginas_por_browser": 4,
+    "max_usos": 50,
+    "prontidao_timeout_ms": 5000,
+}
+# Interceptação de requisições nos renders (intercept_policy)
+intercept_config = {
+    "ativo": True,
+    "tipos_bloqueados": sorted(TIPOS_BLOQUEADOS),
+    "permitidos": list(DOMINIOS_PERMITIDOS),
+    "bloqueados": list(DOMINIOS_BLOQUEADOS),
+    "bloquear_terceiros": True,
+}
+_render_pool = None
+_render_pool_erro = None
+_render_pool_lock = threading.Lock()
 
-def get_playwright_instance():
-    """Retorna instância reutilizável do Playwright"""
-    global _playwright_instance, _browser, _context
+def get_render_pool():
+    """Retorna o pool de renderização, iniciando-o na primeira chamada"""
+    global _render_pool, _render_pool_erro
     
-    if _playwright_instance is None and sync_playwright is not None:
-        _playwright_instance = sync_playwright().start()
-        _browser = _playwright_instance.chromium.launch(
-            headless=True,
-            args=['--no-sandbox', '--disable-dev-shm-usage', '--disable-gpu']
-        )
-        _context = _browser.new_context(
-            viewport={'width': 1280, 'height': 720},
-            user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-        )
+    with _render_pool_lock:
+        if _render_pool is None and _render_pool_erro is None and async_playwright is not None:
+            try:
+                politica = None
+                if intercept_config["ativo"]:
+                    politica = PoliticaInterceptacao(
+                        intercept_config["tipos_bloqueados"], intercept_config["permitidos"],
+                        intercept_config["bloqueados"], intercept_config["bloquear_terceiros"])
+                _render_pool = RenderPoolSync(politica=politica, **render_config)
+            except Exception as e:
+                # Não tentar relançar o Chromium a cada URL
+                _render_pool_erro = e
+                log.error("⚠️ Erro ao iniciar pool do Playwright: %s", e)
     
-    return _playwright_instance, _browser, _context
+    return _render_pool
 
-def cleanup_playwright():
-    """Limpa recursos do Playwright"""
-    global _playwright_instance, _browser, _context
-    
-    if _context:
-        _context.close()
-    if _browser:
-        _browser.close()
-    if _playwright_instance:
-        _playwright_instance.stop()
+def fechar_render_pool():
+    """Fecha páginas e browsers do pool de renderização"""
+    global _render_pool, _render_pool_erro
     
-    _playwright_instance = None
-    _browser = None
-    _context = None
+    with _render_pool_lock:
+        if _render_pool is not None:
+            resumo = _render_pool.pool.resumo_prontidao()
+            if resumo:
+                print(f"⏱️ Prontidão das páginas: média {resumo['media']:.2f}s, "
+                      f"p95 {resumo['p95']:.2f}s, máx {resumo['max']:.2f}s, "
+                      f"{resumo['timeouts']}/{resumo['paginas']} no limite")
+            if _render_pool.pool.politica is not None:
+                r = _render_pool.pool.politica.resumo()
+                print(f"🛡️ Requisições nos renders: {r['permitidas']} permitidas "
+                      f"({r['bytes_permitidos'] / 1e6:.1f} MB), {r['bloqueadas']} bloqueadas "
+                      f"(motivo: {r['por_motivo']}, tipo: {r['por_tipo']})")
+                if r["dominios"]:
+                    print("   Mais bloqueados: " + ", ".join(f"{d} ({n})" for d, n in r["dominios"]))
+            _render_pool.close()
+        _render_pool = None
+        _render_pool_erro = None
 
 def renderizar_html(url):
-    """Renderiza página via Playwright com otimizações"""
-    if not sync_playwright:
-        print("⚠️ Playwright não disponível, usando HTML estático")
-        r = session.get(url, timeout=10)
-        return r.text
+    """Renderiza página via pool do Playwright"""
+    if not async_playwright:
+        log.warning("⚠️ Playwright não disponível, usando HTML estático")
+        return buscar_html_estatico(url)
     
+    pool = get_render_pool()
+    if pool is None:
+        log.warning("⚠️ Pool de renderização não disponível, usando HTML estático")
+        return buscar_html_estatico(url)
+    
+    with medir(url, "render"):
+        html = get_retentativas().executar(_renderizar, pool, url, etapa="render",
+                                           ao_retentar=contar_retentativas(url, "render"))
+    somar_bytes(url, "render", len(html))
+    return html
+
+def _renderizar(pool, url):
+    """Uma tentativa de render; falhas sem classe própria viram ErroRender"""
     try:
-        _, _, context = get_playwright_instance()
-        if context is None:
-            raise Exception("Context não disponível")
-            
-        page = context.new_page()
-        
-        # Otimizações de performance
-        page.set_default_timeout(15000)  # Aumentado para 15s para páginas complexas
-        page.set_default_navigation_timeout(15000)
-        
-        # NÃO desabilitar JavaScript - precisamos dele para carregar as imagens
-        page.route("**/*.{png,jpg,jpeg,gif,svg,woff,woff2,ttf,eot}", lambda route: route.abort())
-        # page.route("**/*.{css,js}", lambda route: route.abort())  # Comentado para permitir JS
-        
-        page.goto(url, wait_until="domcontentloaded")
-        page.wait_for_load_state("domcontentloaded", timeout=10000)  # Aumentado para 10s
-        
-        # Aguardar um pouco mais para JavaScript carregar as imagens
-        page.wait_for_timeout(2000)
-        
-        html = page.content()
-        page.close()
-        return html
-        
+        # Para o controle adaptativo conta só a navegação: a espera de prontidão
+        # (até prontidao_timeout_ms, normal sem os seletores) não é lentidão do host
+        with get_limitador().requisicao(url) as req:
+            return pool.render(url, ao_navegar=req.medir)
     except Exception as e:
-        print(f"⚠️ Erro com Playwright: {e}")
-        r = session.get(url, timeout=10)
-        return r.text
+        if classificar(e) == OUTRO:
+            raise ErroRender(str(e) or e.__class__.__name__) from e
+        raise
+
+# Downloader de imagens compartilhado, com pool de conexões próprio
+download_config = {
+    "workers": 8,
+    "por_host": 4,
+    "tentativas": 3,
+}
+usar_cache_imagens = True
+_downloader = None
+_downloader_lock = threading.Lock()
+
+def get_downloader():
+    """Retorna o downloader de imagens, iniciando-o na primeira chamada"""
+    global _downloader
+    
+    with _downloader_lock:
+        if _downloader is None:
+            store = ImageStore(image_cache_folder) if usar_cache_imagens else None
+            limitador = get_limitador()
+            _downloader = DownloadImagens(output_folder, headers=session.headers, store=store,
+                                          limitador=limitador if limitador.ativo else None,
+                                          politica=get_retentativas(), indice=IndiceImagens(image_index_db),
+                                          **download_config).start()
+    
+    return _downloader
+
+def fechar_downloader():
+    """Espera os downloads pendentes e encerra os workers de imagem"""
+    global _downloader
+    
+    with _downloader_lock:
+        if _downloader is not None:
+            _downloader.close()
+            if _downloader.store:
+                _downloader.store.close()
+            _downloader.indice.close()
+            if _downloader.baixadas or _downloader.falhas or _downloader.nao_modificadas:
+                print(f"🖼️ Imagens: {_downloader.baixadas} baixadas, {_downloader.nao_modificadas} inalteradas, "
+                      f"{_downloader.deduplicadas} duplicadas, {_downloader.falhas} falhas, "
+                      f"{_downloader.retentativas} retentativas, {_downloader.bytes / 1e6:.1f} MB")
+        _downloader = None
+
+# === Pós-processamento de Imagens ===
+# Formato real, reencode, miniaturas e remoção de metadados (requer Pillow)
+processing_config = {
+    "ativo": False,
+    "formato": "webp",
+    "qualidade": 82,
+    "miniaturas": [300],
+    "workers": 0,          # 0: um processo por núcleo
+}
+_processador = None
+_processador_lock = threading.Lock()
+
+def get_processador():
+    """Retorna o processador de imagens, ou None se desativado ou sem Pillow"""
+    global _processador
+    if not processing_config["ativo"]:
+        return None
+    with _processador_lock:
+        if _processador is None:
+            if _pillow is None:
+                print("⚠️ Pillow não está instalado: imagens não serão processadas (pip install Pillow)")
+                processing_config["ativo"] = False
+                return None
+            _processador = ProcessadorImagens(processed_folder, processing_config["formato"],
+                                              processing_config["qualidade"], processing_config["miniaturas"],
+                                              processing_config["workers"] or None)
+        return _processador
+
+def fechar_processador():
+    global _processador
+    with _processador_lock:
+        processador, _processador = _processador, None
+    if processador is not None:
+        processador.close()
+        r = processador.resumo()
+        economia = 1 - r["bytes_saida"] / r["bytes_origem"] if r["bytes_origem"] else 0.0
+        formatos = ", ".join(f"{f} {n}" for f, n in r["formatos"].items()) or "nenhum"
+        print(f"🎨 Imagens processadas: {r['processadas']} ({formatos}; {r['extensao_errada']} com extensão errada), "
+              f"{r['reaproveitadas']} reaproveitadas, {r['duplicadas']} duplicadas, {r['falhas']} falhas, "
+              f"{r['bytes_origem'] / 1e6:.1f} MB -> {r['bytes_saida'] / 1e6:.1f} MB ({economia:.0%} menor) "
+              f"+ {r['bytes_miniaturas'] / 1e6:.1f} MB de miniaturas")
 
 def baixar_imagem(url_img, fname):
-    """Baixa imagem do produto com otimizações"""
-    try:
-        with session.get(url_img, stream=True, timeout=15) as resp:  # Reduzido de 30s para 15s
-            resp.raise_for_status()
-            with open(os.path.join(output_folder, fname), "wb") as f:
-                for chunk in resp.iter_content(16384):  # Aumentado de 8KB para 16KB
-                    if chunk:
-                        f.write(chunk)
-        return True
-    except Exception as e:
-        print(f"⚠️ Erro ao baixar {url_img}: {e}")
-        return False
+    """Baixa uma imagem do produto e espera o resultado"""
+    return get_downloader().agendar(url_img, fname).result() is not None
 
-# === Função Principal ===
-def extrair_produto(url):
-    """Extrai dados do produto da Leo Madeiras"""
-    print(f"🔍 Processando: {url}")
+def buscar_html_estatico(url):
+    """Busca o HTML servido pelo servidor, sem executar JavaScript"""
+    with medir(url, "http"):
+        return get_retentativas().executar(_buscar_estatico, url, etapa="fetch",
+                                           ao_retentar=contar_retentativas(url, "fetch"))
+
+def _buscar_estatico(url):
+    r = http_get(url)
+    r.raise_for_status()
+    somar_bytes(url, "http", len(r.content))
+    return r.text
+
+# === Extração ===
+# Backend de parse: "html.parser" (padrão), "lxml" ou "selectolax"
+parser_html = "html.parser"
+
+def _marcar(medicao, etapa, inicio):
+    """Anota em medicao["tempos"] o tempo desde inicio e retorna o novo início"""
+    agora = time.perf_counter()
+    medicao["tempos"][etapa] = agora - inicio
+    return agora
+
+def analisar_html(html, url, parser=None, medicao=None):
+    """
+    Extrai os dados do produto a partir do HTML, sem baixar imagens.
     
-    # Renderizar página
-    html = renderizar_html(url)
-    soup = BeautifulSoup(html, "html.parser")
+    Retorna (produto, info), onde info indica quais estratégias encontraram
+    nome, descrição e preço e traz a lista de URLs de imagem encontradas.
+    Com um dicionário medicao, anota nele o tempo de cada parte do parse
+    (medicao["tempos"]) e o bloco que encontrou as imagens (medicao["imagens"]).
+    """
+    if medicao is not None:
+        medicao.setdefault("tempos", {})
+        t = time.perf_counter()
+    c = coletar_candidatos(html, parser or parser_html)
+    info = {"nome": None, "descricao": None, "preco": None, "imagens": []}
+    if medicao is not None:
+        t = _marcar(medicao, "parse.coleta", t)
     
     # === Extrair Nome ===
     nome = ""
-    for sel in [".product-name h1", "h1.product-name", "h1", ".product-title"]:
-        tag = soup.select_one(sel)
-        if tag and tag.get_text(strip=True):
-            nome_temp = limpar(tag.get_text(strip=True))
+    for sel in SELETORES_NOME:
+        tag = c.nome.get(sel)
+        if tag is not None:
+            nome_temp = limpar(c.texto(tag))
             if (nome_temp and 
                 nome_temp.lower() not in ["onde você está?", "onde voce esta?", "navegação"] and
                 len(nome_temp) > 5):
                 nome = nome_temp
+                info["nome"] = sel
                 break
     
     if not nome:
@@ -234,271 +510,191 @@ def extrair_produto(url):
     if not nome:
         nome = "Sem Nome"
     
-    print(f"✅ Nome: {nome}")
+    log.debug("✅ Nome: %s", nome)
+    if medicao is not None:
+        t = _marcar(medicao, "parse.nome", t)
     
     # === Extrair Descrição ===
     descricao = ""
     
     # 1. Tentar extrair da seção de descrição do produto
-    descricao_selectors = [
-        ".product-description",
-        ".product-details",
-        ".description",
-        ".produto-descricao",
-        ".descricao-produto",
-        "[data-description]",
-        ".product-info .description",
-        ".product-content .description"
-    ]
-    
-    for selector in descricao_selectors:
-        desc_tag = soup.select_one(selector)
-        if desc_tag:
-            desc_text = desc_tag.get_text(" ", strip=True)
+    for selector in SELETORES_DESCRICAO:
+        desc_tag = c.descricao.get(selector)
+        if desc_tag is not None:
+            desc_text = c.texto(desc_tag, " ")
             if desc_text and len(desc_text) > 50:  # Descrição deve ter pelo menos 50 caracteres
                 descricao = limpar(desc_text)
-                print(f"✅ Descrição encontrada via selector: {selector}")
+                info["descricao"] = selector
+                log.debug("✅ Descrição encontrada via selector: %s", selector)
                 break
     
-    # 2. Tentar extrair de elementos com texto descritivo
+    # 2. Tentar extrair de elementos com texto descritivo (calculado só se necessário)
     if not descricao:
-        for tag in soup.find_all(["p", "div", "span"]):
-            if tag.get_text(strip=True):
-                text = tag.get_text(strip=True)
-                # Verificar se parece uma descrição de produto
-                if (len(text) > 100 and 
-                    any(keyword in text.lower() for keyword in ["aplicações", "benefícios", "características", "especificações", "detalhes", "informações"])):
-                    descricao = limpar(text)
-                    print(f"✅ Descrição encontrada via texto descritivo")
-                    break
+        for tag in c.blocos_texto:
+            text = c.texto(tag)
+            # Verificar se parece uma descrição de produto
+            if len(text) > 100 and _RE_TEXTO_DESCRITIVO.search(text.lower()):
+                descricao = limpar(text)
+                info["descricao"] = "texto"
+                log.debug("✅ Descrição encontrada via texto descritivo")
+                break
     
     # 3. Fallback: usar nome do produto
     if not descricao:
         descricao = nome
-        print(f"⚠️ Descrição não encontrada, usando nome do produto")
+        log.info("⚠️ Descrição não encontrada, usando nome do produto")
     
-    print(f"📝 Descrição extraída: {descricao[:100]}...")
+    log.debug("📝 Descrição extraída: %.100s...", descricao)
+    if medicao is not None:
+        t = _marcar(medicao, "parse.descricao", t)
     
     # === Extrair Preço ===
     preco = ""
     
     # 1. data-price
-    for element in soup.select("[data-price]"):
-        data_price = element.get("data-price")
+    for data_price in c.data_price:
         if data_price:
             try:
                 preco = f"{float(str(data_price).replace(',', '.')):.2f}"
-                print(f"✅ Preço via data-price: {preco}")
+                info["preco"] = "data-price"
+                log.debug("✅ Preço via data-price: %s", preco)
                 break
             except:
                 pass
     
     # 2. data-sku-obj
     if not preco:
-        for element in soup.select("[data-sku-obj]"):
-            data_sku_obj = element.get("data-sku-obj")
+        for data_sku_obj in c.data_sku_obj:
             if data_sku_obj:
                 try:
-                    import html
                     if isinstance(data_sku_obj, str):
-                        decoded = html.unescape(data_sku_obj)
-                        sku_data = json.loads(decoded)
+                        sku_data = json.loads(unescape(data_sku_obj))
                         
                         if "price" in sku_data:
                             preco = f"{float(str(sku_data['price']).replace(',', '.')):.2f}"
-                            print(f"✅ Preço via data-sku-obj: {preco}")
+                            info["preco"] = "data-sku-obj"
+                            log.debug("✅ Preço via data-sku-obj: %s", preco)
                             break
                         elif "best" in sku_data and "price" in sku_data["best"]:
                             preco = f"{float(str(sku_data['best']['price']).replace(',', '.')):.2f}"
-                            print(f"✅ Preço via data-sku-obj.best: {preco}")
+                            info["preco"] = "data-sku-obj.best"
+                            log.debug("✅ Preço via data-sku-obj.best: %s", preco)
                             break
                 except:
                     continue
     
-    # 3. Fallback: regex no texto
+    # 3. Fallback: regex no texto (só percorre o documento inteiro se necessário)
     if not preco:
-        preco = parse_preco(soup.get_text(" ", strip=True))
+        preco = parse_preco(c.texto_documento())
         if preco:
-            print(f"✅ Preço via regex: {preco}")
+            info["preco"] = "regex"
+            log.debug("✅ Preço via regex: %s", preco)
     
     if not preco:
         preco = "0.00"
-        print("⚠️ Preço não encontrado")
-    
-    # === Extrair SKU ===
-    sku = ""
-    url_parts = url.rstrip("/").split("/")
-    if len(url_parts) >= 2:
-        sku = url_parts[-2]
+        log.warning("⚠️ Preço não encontrado")
+    if medicao is not None:
+        t = _marcar(medicao, "parse.preco", t)
     
-    if not sku:
-        sku = "SKU_" + str(int(time.time()))
-    
-    # === Extrair Marca ===
-    marca = "Leo Madeiras"
-    nome_lower = nome.lower()
-    marcas_conhecidas = ["kress", "bosch", "makita", "dewalt", "milwaukee"]
-    
-    for marca_conhecida in marcas_conhecidas:
-        if marca_conhecida in nome_lower:
-            marca = marca_conhecida.title()
-            break
-    
-    # === Detectar Categoria/Departamento ===
-    nome_lower = nome.lower()
-    
-    if any(palavra in nome_lower for palavra in ["furadeira", "parafusadeira", "martelete", "serra"]):
-        departamento = "Ferramentas Elétricas"
-        categoria = "Furadeira" if "furadeira" in nome_lower else "Parafusadeira"
-    elif any(palavra in nome_lower for palavra in ["mdf", "madeira"]):
-        departamento = "Madeiras"
-        categoria = "MDF" if "mdf" in nome_lower else "Madeiras"
-    else:
-        departamento = "Ferramentas Elétricas"
-        categoria = "Ferramentas Elétricas"
+    sku = sku_da_url(url)
     
     # === Extrair Imagens ===
     imgs = []
     
-    # Buscar especificamente por imagens de produtos nos elementos com zoom
     # Prioridade 1: Imagens dentro de divs com data-zoom-image (mais confiável)
-    for zoom_div in soup.select("div[data-zoom-image]"):
-        zoom_img_url = zoom_div.get("data-zoom-image")
+    for zoom_img_url in c.zoom_images:
         if zoom_img_url and isinstance(zoom_img_url, str) and "cws.digital" in zoom_img_url:
             # Verificar se é uma imagem válida
-            if any(ext in zoom_img_url.lower() for ext in ['.jpg', '.jpeg', '.png', '.webp']):
+            if _RE_EXTENSAO_IMAGEM.search(zoom_img_url.lower()):
                 imgs.append(zoom_img_url)
-                print(f"✅ Imagem encontrada via data-zoom-image: {zoom_img_url}")
-    
-    # Prioridade 2: Imagens dentro de divs com classe "zoom" ou similares
-    for zoom_div in soup.select("div.zoom, div[class*='zoom'], div[class*='image']"):
-        for img in zoom_div.select("img"):
-            src = img.get("src") or img.get("data-src")
-            if src and isinstance(src, str) and "cws.digital" in src:
-                if any(ext in src.lower() for ext in ['.jpg', '.jpeg', '.png', '.webp']):
-                    if src not in imgs:  # Evitar duplicatas
-                        imgs.append(src)
-                        print(f"✅ Imagem encontrada via div zoom: {src}")
-    
-    # Prioridade 3: Imagens com classe "zoomImg" (imagens de zoom dos produtos)
-    for img in soup.select("img.zoomImg"):
-        src = img.get("src") or img.get("data-src")
-        if src and isinstance(src, str) and "cws.digital" in src:
-            if any(ext in src.lower() for ext in ['.jpg', '.jpeg', '.png', '.webp']):
-                if src not in imgs:  # Evitar duplicatas
-                    imgs.append(src)
-                    print(f"✅ Imagem encontrada via classe zoomImg: {src}")
-    
-    # Prioridade 4: Imagens com classe "original" (geralmente são as principais)
-    for img in soup.select("img.original"):
-        src = img.get("src") or img.get("data-src")
-        if src and isinstance(src, str) and "cws.digital" in src:
-            if any(ext in src.lower() for ext in ['.jpg', '.jpeg', '.png', '.webp']):
-                if src not in imgs:  # Evitar duplicatas
-                    imgs.append(src)
-                    print(f"✅ Imagem encontrada via classe original: {src}")
+                log.debug("✅ Imagem encontrada via data-zoom-image: %s", zoom_img_url)
+    via = "data-zoom-image" if imgs else None
+    if medicao is not None:
+        t = _marcar(medicao, "parse.imagens.zoom", t)
     
-    # Prioridade 4: Buscar por imagens específicas de produtos (mais rigoroso)
-    if not imgs:
-        for img in soup.select("img"):
-            src = img.get("src") or img.get("data-src")
-            if not src or "data:image" in src:
-                continue
-                
-            if isinstance(src, str):
-                src_lower = src.lower()
-                
-                # Verificar extensão de imagem
-                if not any(ext in src_lower for ext in ['.jpg', '.jpeg', '.png', '.webp']):
-                    continue
-                
-                # Verificar se é uma imagem de produto (deve conter "/produtos/" e ser do domínio correto)
-                if ("/produtos/" in src_lower and 
-                    "cws.digital" in src_lower and
-                    not any(exclude in src_lower for exclude in ["/multimidia/", "/fornecedores/", "instagram", "facebook", "linkedln"])):
-                    
+    # Prioridades 2 a 4: imagens em divs de zoom, img.zoomImg e img.original
+    for indice, origem in ((1, "div zoom"), (2, "classe zoomImg"), (3, "classe original")):
+        for imagem in c.imagens:
+            src = imagem[0]
+            if imagem[indice] and src and isinstance(src, str) and "cws.digital" in src:
+                if _RE_EXTENSAO_IMAGEM.search(src.lower()):
                     if src not in imgs:  # Evitar duplicatas
                         imgs.append(src)
-                        print(f"✅ Imagem encontrada via padrão produto: {src}")
-                        if len(imgs) >= 5:  # Limite de 5 imagens
-                            break
+                        via = via or origem
+                        log.debug("✅ Imagem encontrada via %s: %s", origem, src)
+    if medicao is not None:
+        t = _marcar(medicao, "parse.imagens.classes", t)
     
-    # Prioridade 5: Buscar por imagens que contenham o SKU específico (último recurso)
-    if not imgs:
-        for img in soup.select("img"):
-            src = img.get("src") or img.get("data-src")
+    # Prioridade 5: qualquer imagem de produto do domínio correto (mais rigoroso)
+    # Prioridade 6: imagens que contenham o SKU específico (último recurso)
+    for padrao in ("produto", "sku"):
+        if imgs:
+            break
+        for src, *_ in c.imagens:
             if not src or "data:image" in src:
                 continue
-                
+            
             if isinstance(src, str):
                 src_lower = src.lower()
                 
                 # Verificar extensão de imagem
-                if not any(ext in src_lower for ext in ['.jpg', '.jpeg', '.png', '.webp']):
+                if not _RE_EXTENSAO_IMAGEM.search(src_lower):
                     continue
                 
-                # Verificar se contém SKU específico
-                if sku in src_lower:
-                    if src not in imgs:  # Evitar duplicatas
-                        imgs.append(src)
-                        print(f"✅ Imagem encontrada via SKU: {src}")
-                        if len(imgs) >= 5:  # Limite de 5 imagens
-                            break
-    
-    # Prioridade 6: Buscar por imagens que seguem o padrão dos produtos que funcionam
-    if not imgs:
-        print(f"🔍 Buscando por imagens com padrão de produto...")
-        
-        # Buscar por qualquer imagem que contenha "/produtos/" e seja do domínio correto
-        for img in soup.select("img"):
-            src = img.get("src") or img.get("data-src")
-            if not src or "data:image" in src:
-                continue
-                
-            if isinstance(src, str):
-                src_lower = src.lower()
-                
-                # Verificar extensão de imagem
-                if not any(ext in src_lower for ext in ['.jpg', '.jpeg', '.png', '.webp']):
-                    continue
+                if padrao == "produto":
+                    # Deve conter "/produtos/" e ser do domínio correto
+                    valida = ("/produtos/" in src_lower and "cws.digital" in src_lower and
+                              not _RE_IMAGEM_EXCLUIDA.search(src_lower))
+                else:
+                    valida = sku in src_lower
                 
-                # Verificar se é uma imagem de produto (deve conter "/produtos/" e ser do domínio correto)
-                if ("/produtos/" in src_lower and 
-                    "cws.digital" in src_lower and
-                    not any(exclude in src_lower for exclude in ["/multimidia/", "/fornecedores/", "instagram", "facebook", "linkedln", "youtube", "pinterest", "tiktok"])):
-                    
-                    if src not in imgs:  # Evitar duplicatas
-                        imgs.append(src)
-                        print(f"✅ Imagem encontrada via padrão produto: {src}")
-                        if len(imgs) >= 5:  # Limite de 5 imagens
-                            break
+                if valida and src not in imgs:  # Evitar duplicatas
+                    imgs.append(src)
+                    via = via or f"padrão {padrao}"
+                    log.debug("✅ Imagem encontrada via %s: %s", "padrão produto" if padrao == "produto" else "SKU", src)
+                    if len(imgs) >= 5:  # Limite de 5 imagens
+                        break
     
     # Remover duplicatas e limitar a 5 imagens
     imgs = list(dict.fromkeys(imgs))[:5]  # dict.fromkeys preserva ordem e remove duplicatas
     
-    print(f"📸 Encontradas {len(imgs)} imagens do produto (SKU: {sku})")
+    info["imagens"] = imgs
+    if medicao is not None:
+        _marcar(medicao, "parse.imagens.fallback", t)
+        medicao["imagens"] = via
     
-    # Baixar imagens
-    saved = []
-    if imgs:
-        print(f"📸 Baixando {len(imgs)} imagens...")
-        with tqdm(total=len(imgs), desc="🖼️ Download imagens", 
-                  bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}]') as img_pbar:
-            
-            for i, img_url in enumerate(imgs, 1):
-                fname = f"{sku}_{i}.jpg"
-                img_pbar.set_description(f"📥 Baixando {fname}")
-                
-                # As URLs já são completas, não precisamos de urljoin
-                if baixar_imagem(img_url, fname):
-                    saved.append(fname)
-                    img_pbar.set_postfix({'Status': '✅ Sucesso'})
-                else:
-                    img_pbar.set_postfix({'Status': '❌ Falha'})
-                
-                img_pbar.update(1)
+    return montar_produto(sku, nome, descricao, preco, imgs, url), info
+
+def sku_da_url(url):
+    """SKU do produto: penúltimo trecho da URL (/p/{sku}/{slug})"""
+    url_parts = url.rstrip("/").split("/")
+    sku = url_parts[-2] if len(url_parts) >= 2 else ""
+    return sku or "SKU_" + str(int(time.time()))
+
+def montar_produto(sku, nome, descricao, preco, imgs, url):
+    """Linha VTEX do produto; marca e categoria são deduzidas do nome"""
+    # === Extrair Marca ===
+    marca = "Leo Madeiras"
+    nome_lower = nome.lower()
+    marcas_conhecidas = ["kress", "bosch", "makita", "dewalt", "milwaukee"]
+    
+    for marca_conhecida in marcas_conhecidas:
+        if marca_conhecida in nome_lower:
+            marca = marca_conhecida.title()
+            break
+    
+    # === Detectar Categoria/Departamento ===
+    nome_lower = nome.lower()
+    
+    if any(palavra in nome_lower for palavra in ["furadeira", "parafusadeira", "martelete", "serra"]):
+        departamento = "Ferramentas Elétricas"
+        categoria = "Furadeira" if "furadeira" in nome_lower else "Parafusadeira"
+    elif any(palavra in nome_lower for palavra in ["mdf", "madeira"]):
+        departamento = "Madeiras"
+        categoria = "MDF" if "mdf" in nome_lower else "Madeiras"
     else:
-        print("⚠️ Nenhuma imagem encontrada para download")
+        departamento = "Ferramentas Elétricas"
+        categoria = "Ferramentas Elétricas"
     
     # === Gerar Produto ===
     produto = {
@@ -541,83 +737,1229 @@ def extrair_produto(url):
         "_PesoCubico": "",
         "_Preço": preco,
         "_BaseUrlImagens": f"images-leo-madeiras-{sku}",
-        "_ImagensSalvas": ";".join(saved),
+        "_ImagensSalvas": "",
         "_ImagensURLs": ";".join(imgs),
     }
     
     return produto
 
-# === Execução Principal ===
-if __name__ == "__main__":
-    # Ler CSV de entrada
+# === Busca em Camadas ===
+# "tiered": HTTP simples primeiro, renderiza só se faltar algum campo
+# "render": sempre renderiza com Playwright
+# "http": nunca renderiza
+# "api": produtos em lote pela API do catálogo; o que faltar segue como "tiered"
+FETCH_MODES = ("tiered", "render", "http", "api")
+fetch_mode = "tiered"
+
+estatisticas_tiers = {"http": 0, "render": 0, "api": 0}
+_tiers_lock = threading.Lock()
+
+def dados_completos(info):
+    """Verifica se a extração encontrou nome, preço e imagens na própria página"""
+    return bool(info["nome"] and info["preco"] and info["imagens"])
+
+def precisa_render(info, tier, modo=None):
+    """No modo tiered (e no fallback do modo api), uma página HTTP incompleta é buscada de novo com Playwright"""
+    return (tier == "http" and (modo or fetch_mode) in ("tiered", "api") and async_playwright is not None
+            and not dados_completos(info))
+
+def buscar_html(url, modo=None, forcar_render=False):
+    """Busca o HTML pela primeira camada do modo configurado; retorna (html, tier)"""
+    modo = modo or fetch_mode
+    if forcar_render or modo == "render":
+        return renderizar_html(url), "render"
+    try:
+        return buscar_html_estatico(url), "http"
+    except FalhaClassificada as e:
+        # 4xx (ex.: produto removido) não muda renderizando
+        if modo == "http" or e.classe == HTTP_4XX:
+            raise
+        log.warning("⚠️ Erro no HTML estático, escalando para renderização: %s", e)
+        return renderizar_html(url), "render"
+
+def registrar_parse(url, medicao, segundos):
+    """Leva os tempos do parse (medidos na thread ou no processo de parse) para a URL"""
+    if _metricas is None:
+        return
+    _metricas.registrar_tempo(url, "parse", segundos)
+    for etapa, tempo in (medicao or {}).get("tempos", {}).items():
+        _metricas.registrar_tempo(url, etapa, tempo)
+    if medicao and "imagens" in medicao:
+        _metricas.anotar_estrategia(url, "imagens", medicao["imagens"])
+
+def analisar_pagina(html, url, parser=None):
+    """analisar_html com as falhas classificadas como parse"""
+    medicao = {} if _metricas is not None else None
+    inicio = time.perf_counter()
     try:
-        df_links = pd.read_csv(input_csv)
-        if "url" not in df_links.columns:
-            raise Exception("❌ A planilha precisa ter uma coluna chamada 'url'.")
+        resultado = analisar_html(html, url, parser, medicao)
     except Exception as e:
-        print(f"❌ Erro ao ler CSV: {e}")
-        exit(1)
+        raise FalhaClassificada(PARSE, e, "parse") from e
+    finally:
+        registrar_parse(url, medicao, time.perf_counter() - inicio)
+    if not resultado[0]:
+        raise FalhaClassificada(PARSE, ErroExtracao("Falha na extração"), "parse")
+    return resultado
+
+# === API do Catálogo ===
+# Endpoint de produtos por SKU; {skus} recebe os SKUs do lote separados por vírgula. Não há
+# padrão: a loja não documenta um endpoint, e o SKU é o código da URL (/p/{sku}/), que pode
+# não ser o skuId da VTEX. --fetch-mode api exige --api-url
+api_config = {
+    "url": None,
+    "lote": 50,
+}
+_catalogo = None
+_catalogo_lock = threading.Lock()
+
+def get_catalogo():
+    global _catalogo
+    with _catalogo_lock:
+        if _catalogo is None:
+            _catalogo = ClienteCatalogo(api_config["url"], buscar_json, api_config["lote"])
+        return _catalogo
+
+def fechar_catalogo():
+    global _catalogo
+    with _catalogo_lock:
+        catalogo, _catalogo = _catalogo, None
+    if catalogo is not None:
+        r = catalogo.resumo()
+        print(f"📦 API do catálogo: {r['lotes']} lotes, {r['encontrados']} produtos, "
+              f"{r['ausentes']} ausentes, {r['falhas']} lotes com falha")
+
+def buscar_json(url):
+    # Uma chamada por lote: entra só nas amostras da etapa, não em uma URL de produto
+    with medir(None, "api.lote"):
+        return get_retentativas().executar(_buscar_json, url, etapa="api",
+                                           ao_retentar=contar_retentativas(None, "api"))
+
+def _buscar_json(url):
+    r = http_get(url, timeout=30, headers={"Accept": "application/json"})
+    r.raise_for_status()
+    somar_bytes(None, "api", len(r.content))
+    return r.json()
+
+def produto_da_api(url):
+    """
+    Produto pela API do catálogo, sem buscar a página.
     
-    # Processar produtos
-    produtos = []
+    Retorna (produto, info) como analisar_html, ou None quando a API não trouxe
+    nome, preço e imagens do SKU (a página é buscada no lugar).
+    """
+    sku = sku_da_url(url)
+    try:
+        with medir(url, "api"):
+            dados = get_catalogo().obter(sku)
+    except Exception as e:
+        log.warning("⚠️ API do catálogo falhou para %s, buscando a página: %.120s", sku, _mensagem_erro(e))
+        return None
+    imgs = [img for img in (dados or {}).get("imagens", [])
+            if _RE_EXTENSAO_IMAGEM.search(img.lower())][:5]
+    if not dados or not dados["nome"] or not dados["preco"] or not imgs:
+        log.info("⚠️ SKU %s incompleto ou ausente na API, buscando a página", sku)
+        return None
     
-    # Filtrar apenas URLs válidas da Leo Madeiras
-    urls_validas = []
-    for _, row in df_links.iterrows():
-        url = str(row["url"]).strip()
-        if url and "leomadeiras.com.br" in url:
-            urls_validas.append(url)
+    nome = limpar(dados["nome"])
+    descricao = limpar(dados["descricao"]) or nome
+    produto = montar_produto(sku, nome, descricao, f"{dados['preco']:.2f}", imgs, url)
+    info = {"nome": "api", "descricao": "api" if dados["descricao"] else None, "preco": "api", "imagens": imgs,
+            "tier": "api", "hash_conteudo": hashlib.sha256(json.dumps(dados, sort_keys=True).encode("utf-8")).hexdigest()}
+    with _tiers_lock:
+        estatisticas_tiers["api"] += 1
+    log.debug("✅ Produto via API: %s | %s | %d imagens", nome, produto["_Preço"], len(imgs))
+    return produto, info
+
+# === Descoberta de URLs ===
+# Pontos de partida usados por --discover quando não há --sitemap/--category
+discovery_config = {
+    "sitemaps": ["https://www.leomadeiras.com.br/sitemap.xml"],
+    "categorias": [],
+    "seguir": SEGUIR_PADRAO,
+    "max_paginas": 500,
+}
+
+def buscar_bytes(url):
+    with medir(None, "discovery"):
+        return get_retentativas().executar(_buscar_bytes, url, etapa="discovery",
+                                           ao_retentar=contar_retentativas(None, "discovery"))
+
+def _buscar_bytes(url):
+    r = http_get(url, timeout=30)
+    r.raise_for_status()
+    somar_bytes(None, "discovery", len(r.content))
+    return r.content
+
+def criar_descobridor(vistos=None, somente_novos=False):
+    """Descobridor com a busca compartilhada (limitador e retentativas) e discovery_config"""
+    return Descobridor(buscar_bytes, discovery_config["sitemaps"], discovery_config["categorias"], vistos,
+                       somente_novos, discovery_config["seguir"], discovery_config["max_paginas"])
+
+# === Arquivo de HTML ===
+# Snapshots comprimidos das páginas buscadas (ativado pela linha de comando)
+arquivar_html = False
+_arquivo_html = None
+_arquivo_html_lock = threading.Lock()
+
+def get_arquivo_html():
+    global _arquivo_html
+    with _arquivo_html_lock:
+        if _arquivo_html is None:
+            _arquivo_html = ArquivoHTML(archive_folder)
+        return _arquivo_html
+
+def fechar_arquivo_html():
+    global _arquivo_html
+    with _arquivo_html_lock:
+        arquivo, _arquivo_html = _arquivo_html, None
+    if arquivo is not None:
+        print(f"🗄️ Snapshots de HTML: {arquivo.gravados} gravados, {arquivo.inalterados} inalterados")
+        arquivo.close()
+
+def arquivar_pagina(url, resultado, html):
+    """Guarda o HTML usado na extração no arquivo de snapshots, se ativado"""
+    if not arquivar_html:
+        return
+    produto, info = resultado
+    try:
+        get_arquivo_html().guardar(url, produto.get("_IDSKU"), html, info.get("tier"), info.get("hash_conteudo"))
+    except Exception as e:
+        log.warning("⚠️ Erro ao arquivar HTML de %s: %s", url, e)
+
+def registrar_tier(resultado, tier, html):
+    """Conta a camada que serviu a página e anota tier/hash em info"""
+    with _tiers_lock:
+        estatisticas_tiers[tier] += 1
+    resultado[1]["tier"] = tier
+    resultado[1]["hash_conteudo"] = hashlib.sha256(html.encode("utf-8")).hexdigest()
+    return resultado
+
+def obter_produto(url, modo=None):
+    """
+    Busca e extrai o produto usando o modo de busca configurado.
     
-    if not urls_validas:
-        print("❌ Nenhuma URL válida da Leo Madeiras encontrada")
-        exit(1)
+    Retorna (produto, info); info["tier"] indica qual camada serviu a página
+    e info["hash_conteudo"] é o SHA-256 do HTML usado na extração (ou do
+    JSON, quando o produto veio da API do catálogo).
+    """
+    if (modo or fetch_mode) == "api":
+        resultado = produto_da_api(url)
+        if resultado:
+            return resultado
+    
+    html, tier = buscar_html(url, modo)
+    resultado = analisar_pagina(html, url)
     
-    print(f"🚀 Iniciando processamento de {len(urls_validas)} produtos...")
+    # Escalar só quando faltar dado (e houver Playwright para escalar)
+    if precisa_render(resultado[1], tier, modo):
+        html, tier = buscar_html(url, modo, forcar_render=True)
+        resultado = analisar_pagina(html, url)
     
-    # Barra de progresso principal
-    with tqdm(total=len(urls_validas), desc="🔄 Scraping produtos", 
-              bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]') as pbar:
+    registrar_tier(resultado, tier, html)
+    arquivar_pagina(url, resultado, html)
+    return resultado
+
+# === Função Principal ===
+def coletar_produto(url):
+    """
+    Extrai o produto e agenda o download das imagens sem esperar por ele.
+    
+    Retorna (produto, info, downloads); use finalizar_imagens para preencher
+    _ImagensSalvas quando os downloads terminarem.
+    """
+    log.info("🔍 Processando: %s", url)
+    
+    produto, info = obter_produto(url)
+    return produto, info, enfileirar_imagens(produto, info)
+
+def enfileirar_imagens(produto, info):
+    """Agenda o download das imagens encontradas; retorna os downloads"""
+    imgs = info["imagens"]
+    
+    if imgs:
+        log.debug("📸 Enfileirando %d imagens...", len(imgs))
+        downloads = get_downloader().enfileirar(produto["_IDSKU"], imgs)
+    else:
+        log.warning("⚠️ Nenhuma imagem encontrada para download")
+        # Registra o total zero no índice: imagens antigas do SKU viram órfãs
+        downloads = get_downloader().enfileirar(produto["_IDSKU"], [])
+    return downloads
+
+def finalizar_imagens(produto, downloads, info=None, url=None):
+    """
+    Espera os downloads do produto e registra as imagens salvas.
+    
+    Com info, info["falhas_imagens"] recebe as falhas definitivas (FalhaClassificada).
+    Com o pós-processamento ativo, _ImagensSalvas lista as imagens processadas
+    (em processed_folder, já com a extensão do formato de saída). Com url e a
+    instrumentação ativa, os downloads e o processamento entram no registro da URL.
+    """
+    if downloads:
+        downloader = get_downloader()
+        salvas = downloader.aguardar(downloads)
+        if _metricas is not None and url is not None:
+            for future in downloads:
+                medicao = getattr(future, "medicao", None)
+                if medicao:
+                    # Cada download entra na amostra "imagem"; a soma vai para a etapa "imagens" da URL
+                    _metricas.registrar_tempo(None, "imagem", medicao["segundos"])
+                    _metricas.registrar_tempo(url, "imagens", medicao["segundos"])
+                    somar_bytes(url, "imagens", medicao["bytes"])
+                    if medicao["retentativas"]:
+                        _metricas.contar_retentativa(url, "imagem", medicao["retentativas"])
+        processador = get_processador()
+        if processador is not None:
+            with medir(url, "processamento"):
+                processadas = processador.processar([os.path.join(output_folder, nome) for nome in salvas])
+            for original, saida in zip(salvas, processadas):
+                if saida:
+                    downloader.indice.marcar_processada(original, saida)
+            salvas = [nome for nome in processadas if nome]
+        produto["_ImagensSalvas"] = ";".join(salvas)
+        if info is not None:
+            # enfileirar nomeia as imagens {sku}_{i}.jpg, na ordem das Futures
+            info["falhas_imagens"] = [
+                downloader.falha(f"{produto['_IDSKU']}_{i}.jpg")
+                or FalhaClassificada(OUTRO, Exception("Imagem não baixada"), "imagem")
+                for i, future in enumerate(downloads, 1) if future.result() is None
+            ]
+    return produto
+
+def extrair_produto(url):
+    """Extrai dados do produto da Leo Madeiras"""
+    produto, _, downloads = coletar_produto(url)
+    return finalizar_imagens(produto, downloads)
+
+# === Processamento Concorrente ===
+# Estágio de parse em processos separados: 0 mantém o parse na thread de busca
+parse_config = {
+    "workers": 0,
+    "fila": 0,     # HTML aguardando parse (0: 2x parse workers)
+}
+
+def _analisar_em_processo(html, url, parser, instrumentar=False):
+    """
+    Executado nos processos do estágio de parse
+    
+    Retorna (produto, info, medicao); com instrumentar, medicao traz os tempos
+    do parse medidos no próprio processo (sem a ida e volta pelo pool).
+    """
+    medicao = {} if instrumentar else None
+    inicio = time.perf_counter()
+    with contexto(url=url, sku=sku_da_url(url)):
+        produto, info = analisar_html(html, url, parser, medicao)
+    if medicao is not None:
+        medicao["duracao"] = time.perf_counter() - inicio
+    return produto, info, medicao
+
+def criar_pool_parse(workers):
+    # spawn: o processo pai já tem threads (render pool, downloads), fork não é seguro
+    # Os processos filhos registram no nível e formato da execução
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=configurar_processo, initargs=parametros_processo())
+
+def _mensagem_erro(e):
+    return str(e) or e.__class__.__name__
+
+def _iniciar_alimentador(urls, colocar, prontos):
+    """
+    Thread que entrega as URLs de entrada (lista ou fluxo) aos workers.
+    
+    Como um fluxo (ex.: a descoberta) não tem tamanho conhecido, ao terminar
+    avisa o total em prontos com (None, total, None, None). No modo api os
+    SKUs são agrupados em lotes da API antes de chegarem aos workers; um
+    None no fluxo (o gerador vai esperar, ex.: ConsumidorFila.urls) entrega
+    o lote parcial na hora.
+    Retorna o Event que interrompe a entrega.
+    """
+    parar = threading.Event()
+    
+    def alimentar():
+        total = 0
+        lote = []
         
-        for url in urls_validas:
-            try:
-                # Atualizar descrição da barra
-                pbar.set_description(f"🔍 Processando: {url.split('/')[-1][:30]}...")
-                
-                resultado = extrair_produto(url)
-                if resultado:
-                    produtos.append(resultado)
-                    pbar.set_postfix({
-                        'SKU': resultado['_IDSKU'],
-                        'Preço': f"R$ {resultado['_Preço']}",
-                        'Marca': resultado['_Marca']
-                    })
+        def entregar():
+            if fetch_mode == "api":
+                get_catalogo().preparar(sku_da_url(url) for _, url in lote)
+            for item in lote:
+                colocar(*item)
+            lote.clear()
+        
+        try:
+            for url in urls:
+                if parar.is_set():
+                    return
+                if url is None:
+                    if lote:
+                        entregar()
+                    continue
+                lote.append((total, url))
+                total += 1
+                if fetch_mode != "api" or len(lote) >= api_config["lote"]:
+                    entregar()
+        except Exception as e:
+            log.error("❌ Erro na entrada de URLs, seguindo com %d URLs: %s", total, _mensagem_erro(e))
+        entregar()
+        prontos.put((None, total, None, None))
+    
+    threading.Thread(target=alimentar, name="scraper-input", daemon=True).start()
+    return parar
+
+def _iniciar_workers_inline(urls, workers, prontos):
+    """Busca e parse na mesma thread (sem estágio de parse separado)"""
+    fila = queue.Queue()
+    parar = _iniciar_alimentador(urls, lambda idx, url: fila.put((idx, url)), prontos)
+    
+    def worker():
+        while True:
+            item = fila.get()
+            if item is None:
+                break
+            idx, url = item
+            
+            with contexto(url=url, sku=sku_da_url(url)):
+                try:
+                    # As imagens continuam baixando enquanto o worker segue para a próxima página
+                    produto, info, downloads = coletar_produto(url)
+                    prontos.put((idx, url, (produto, info, downloads), None))
+                except Exception as e:
+                    prontos.put((idx, url, None, e))
+    
+    threads = [threading.Thread(target=worker, name=f"scraper-worker-{i}", daemon=True)
+               for i in range(workers)]
+    for t in threads:
+        t.start()
+    
+    def encerrar(completo=True):
+        if not completo:
+            # Interrompido: descarta o que ainda não foi buscado
+            parar.set()
+            while True:
+                try:
+                    fila.get_nowait()
+                except queue.Empty:
+                    break
+        for _ in range(workers):
+            fila.put(None)
+        if completo:
+            for t in threads:
+                t.join()
+    return threads, encerrar
+
+def _iniciar_estagios(urls, workers, parse_workers, tamanho_fila, prontos):
+    """
+    Pipeline em estágios: busca (threads) -> parse (processos) -> escrita.
+    
+    As filas entre os estágios são limitadas: quando o parse não dá conta, as
+    threads de busca esperam em vez de acumular HTML em memória. Páginas HTTP
+    incompletas (modo tiered) voltam para a busca com prioridade, para renderizar.
+    """
+    tamanho_fila = tamanho_fila or 2 * parse_workers
+    parser = parser_html
+    pool = criar_pool_parse(parse_workers)
+    
+    # (prioridade, sequência, item): renderizações pendentes passam na frente, sentinelas por último
+    entrada = queue.PriorityQueue()
+    sequencia = itertools.count()
+    parar = _iniciar_alimentador(urls, lambda idx, url: entrada.put((1, next(sequencia), (idx, url, False))),
+                                 prontos)
+    fila_html = queue.Queue(maxsize=tamanho_fila)
+    
+    def buscador():
+        while True:
+            _, _, item = entrada.get()
+            if item is None:
+                break
+            idx, url, forcar_render = item
+            with contexto(url=url, sku=sku_da_url(url)):
+                try:
+                    if not forcar_render:
+                        log.info("🔍 Processando: %s", url)
+                        # Modo api: só o que a API não trouxe passa pelo parse
+                        resultado = produto_da_api(url) if fetch_mode == "api" else None
+                        if resultado:
+                            produto, info = resultado
+                            prontos.put((idx, url, (produto, info, enfileirar_imagens(produto, info)), None))
+                            continue
+                    html, tier = buscar_html(url, forcar_render=forcar_render)
+                    fila_html.put((idx, url, html, tier))
+                except Exception as e:
+                    prontos.put((idx, url, None, e))
+    
+    def analisador():
+        while True:
+            item = fila_html.get()
+            if item is None:
+                break
+            idx, url, html, tier = item
+            with contexto(url=url, sku=sku_da_url(url)):
+                try:
+                    try:
+                        produto, info, medicao = pool.submit(_analisar_em_processo, html, url, parser,
+                                                             _metricas is not None).result()
+                        resultado = (produto, info)
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as e:
+                        raise FalhaClassificada(PARSE, e, "parse") from e
+                    if medicao is not None:
+                        registrar_parse(url, medicao, medicao["duracao"])
+                    if not resultado[0]:
+                        raise FalhaClassificada(PARSE, ErroExtracao("Falha na extração"), "parse")
+                    if precisa_render(resultado[1], tier):
+                        entrada.put((0, next(sequencia), (idx, url, True)))
+                        continue
+                    produto, info = registrar_tier(resultado, tier, html)
+                    arquivar_pagina(url, resultado, html)
+                    prontos.put((idx, url, (produto, info, enfileirar_imagens(produto, info)), None))
+                except Exception as e:
+                    prontos.put((idx, url, None, e))
+    
+    threads = ([threading.Thread(target=buscador, name=f"scraper-fetch-{i}", daemon=True)
+                for i in range(workers)] +
+               [threading.Thread(target=analisador, name=f"scraper-parse-{i}", daemon=True)
+                for i in range(parse_workers)])
+    for t in threads:
+        t.start()
+    
+    def encerrar(completo=True):
+        if not completo:
+            # Interrompido: descarta o que ainda não foi buscado nem analisado
+            parar.set()
+            for fila in (entrada, fila_html):
+                while True:
+                    try:
+                        fila.get_nowait()
+                    except queue.Empty:
+                        break
+        for _ in range(workers):
+            entrada.put((2, next(sequencia), None))
+        if completo:
+            for _ in range(parse_workers):
+                fila_html.put(None)
+            for t in threads:
+                t.join()
+        pool.shutdown(wait=completo, cancel_futures=not completo)
+    return threads, encerrar
+
+def processar_urls(urls, workers=1, mostrar_progresso=True, ao_concluir=None, ao_falhar=None,
+                   guardar_resultados=True, parse_workers=None, tamanho_fila=None, progresso=None):
+    """
+    Processa URLs com um pool limitado de workers.
+    
+    Os workers extraem as páginas e a thread chamadora finaliza cada produto
+    (espera as imagens) assim que ele fica pronto, chamando
+    ao_concluir(url, produto, info) ou ao_falhar(url, erro), onde erro é a
+    exceção (em geral FalhaClassificada, com a classe da falha). Com
+    parse_workers > 0 os workers só buscam o HTML e o parse roda em um pool
+    de processos separado (ver _iniciar_estagios).
+    
+    urls pode ser uma lista ou um fluxo (iterável) como o da descoberta: os
+    workers começam assim que as primeiras URLs chegam.
+    
+    Retorna (produtos, falhas): os produtos na mesma ordem das URLs de entrada
+    e um dicionário {url: mensagem de erro} com as URLs que falharam. Com
+    guardar_resultados=False os produtos não ficam em memória e a lista volta
+    vazia; use ao_concluir para consumi-los.
+    
+    O andamento vai para progresso (ver structured_log.Progresso); sem ele,
+    mostrar_progresso escolhe entre a barra do tqdm e nada.
+    """
+    if progresso is None:
+        progresso = criar_progresso("barra" if mostrar_progresso else "nenhum")
+    total = len(urls) if hasattr(urls, "__len__") else None
+    workers = max(1, min(int(workers), total or 1) if total is not None else int(workers))
+    parse_workers = parse_config["workers"] if parse_workers is None else parse_workers
+    tamanho_fila = parse_config["fila"] if tamanho_fila is None else tamanho_fila
+    resultados = {} if guardar_resultados else None
+    falhas = {}
+    
+    if parse_workers > 0 and total != 0:
+        # Fila de saída limitada: se a escrita atrasar, o parse espera
+        prontos = queue.Queue(maxsize=tamanho_fila or 2 * parse_workers)
+        _, encerrar = _iniciar_estagios(urls, workers, parse_workers, tamanho_fila, prontos)
+    else:
+        prontos = queue.Queue()
+        _, encerrar = _iniciar_workers_inline(urls, workers, prontos)
+    
+    completo = False
+    progresso.iniciar(total, "🔄 Scraping produtos")
+    try:
+        concluidos = 0
+        while total is None or concluidos < total:
+            idx, url, resultado, erro = prontos.get()
+            if idx is None:
+                # Fim da entrada: agora o total é conhecido
+                total = url
+                progresso.definir_total(total)
+                continue
+            concluidos += 1
+            
+            with contexto(url=url, sku=sku_da_url(url)):
+                if resultado is not None:
+                    produto, info, downloads = resultado
+                    finalizar_imagens(produto, downloads, info, url)
+                    concluir_metricas(url, info, produto=produto)
+                    if guardar_resultados:
+                        resultados[idx] = produto
+                    if ao_concluir:
+                        ao_concluir(url, produto, info)
                 else:
-                    pbar.set_postfix({'Erro': 'Falha na extração'})
+                    falhas[url] = _mensagem_erro(erro)
+                    log.warning("❌ %s: %.120s", url, falhas[url])
+                    concluir_metricas(url, erro=erro)
+                    if ao_falhar:
+                        ao_falhar(url, erro)
+            
+            progresso.avancar(concluidos - len(falhas), len(falhas))
+        completo = True
+    finally:
+        progresso.fechar()
+        encerrar(completo)
+    
+    produtos = [resultados[idx] for idx in sorted(resultados)] if guardar_resultados else []
+    return produtos, falhas
 
-                
-                pbar.update(1)
-                
+# === Reextração Offline ===
+def _reextrair_snapshot(caminho, url, parser):
+    """Executado nos processos da reextração: lê o snapshot e extrai o produto"""
+    html = ler_snapshot(caminho)
+    with contexto(url=url, sku=sku_da_url(url)):
+        produto, info = analisar_html(html, url, parser)
+    info["tier"] = "archive"
+    info["hash_conteudo"] = hashlib.sha256(html.encode("utf-8")).hexdigest()
+    return produto, info
+
+def imagens_salvas(produto, info):
+    """Imagens do produto que já estão na pasta de saída ({sku}_{i}.jpg), sem baixar nada"""
+    nomes = (f"{produto['_IDSKU']}_{i}.jpg" for i in range(1, len(info["imagens"]) + 1))
+    return [nome for nome in nomes if os.path.exists(os.path.join(output_folder, nome))]
+
+def reextrair_do_arquivo(snapshots, workers=None, mostrar_progresso=True, ao_concluir=None, ao_falhar=None,
+                         progresso=None):
+    """
+    Reexecuta a extração sobre os snapshots arquivados, sem acesso à rede.
+    
+    snapshots vem de ArquivoHTML.ultimos(); o parse roda em um pool de
+    processos (workers, padrão: um por núcleo). _ImagensSalvas lista as
+    imagens já presentes na pasta de saída. Retorna (total_ok, falhas).
+    """
+    if progresso is None:
+        progresso = criar_progresso("barra" if mostrar_progresso else "nenhum")
+    workers = max(1, workers or os.cpu_count() or 1)
+    parser = parser_html
+    falhas = {}
+    
+    def tarefas(executar):
+        for url, _, _, caminho in snapshots:
+            try:
+                yield url, executar(caminho, url), None
             except Exception as e:
-                pbar.set_postfix({'Erro': str(e)[:20]})
-                pbar.update(1)
-                continue
+                yield url, None, _mensagem_erro(e)
     
-    # Salvar resultados
-    if produtos:
-        df_final = pd.DataFrame(produtos)
-        df_final.to_csv(output_csv, index=False, encoding="utf-8-sig")
+    pool = criar_pool_parse(workers) if workers > 1 else None
+    if pool is not None:
+        # Até 4 snapshots por processo em andamento: a memória não cresce com o arquivo
+        pendentes = queue.Queue()
+        janela = threading.Semaphore(workers * 4)
+        
+        def submeter():
+            for url, _, _, caminho in snapshots:
+                janela.acquire()
+                pendentes.put((url, pool.submit(_reextrair_snapshot, caminho, url, parser)))
+            pendentes.put(None)
         
-        print(f"\n✅ Planilha salva: {output_csv}")
+        threading.Thread(target=submeter, name="reextracao-submit", daemon=True).start()
+        
+        def resultados():
+            while True:
+                item = pendentes.get()
+                if item is None:
+                    break
+                url, future = item
+                try:
+                    yield url, future.result(), None
+                except Exception as e:
+                    yield url, None, _mensagem_erro(e)
+                finally:
+                    janela.release()
+        iterador = resultados()
+    else:
+        iterador = tarefas(lambda caminho, url: _reextrair_snapshot(caminho, url, parser))
+    
+    total_ok = 0
+    progresso.iniciar(len(snapshots), "🗄️ Reextraindo do arquivo")
+    try:
+        for url, resultado, erro in iterador:
+            if resultado is not None and resultado[0]:
+                produto, info = resultado
+                produto["_ImagensSalvas"] = ";".join(imagens_salvas(produto, info))
+                total_ok += 1
+                if ao_concluir:
+                    ao_concluir(url, produto, info)
+            else:
+                falhas[url] = erro or "Falha na extração"
+                if ao_falhar:
+                    ao_falhar(url, falhas[url])
+            progresso.avancar(total_ok, len(falhas))
+    finally:
+        progresso.fechar()
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+    return total_ok, falhas
+
+def aplicar_limites_host(valores, chave, tipo):
+    """Aplica opções HOST=VALOR repetidas em rate_config"""
+    for valor in valores:
+        host, sep, numero = valor.partition("=")
+        if not sep or not host.strip():
+            raise ValueError(f"Use HOST=VALOR, recebido: {valor!r}")
+        rate_config.setdefault(host.strip(), dict(rate_padrao))[chave] = tipo(numero)
+
+def usar_pasta_worker(pasta):
+    """
+    Modo distribuído: tudo o que este worker grava (planilha, estado, imagens,
+    índices, cache, arquivo de HTML) fica em `pasta`, sem disputar arquivos
+    com os outros workers; scripts/merge_shards.py junta as pastas no fim
+    """
+    global output_csv, output_folder, image_cache_folder, processed_folder, state_db
+    global archive_folder, dead_letter_csv, seen_db, image_index_db
+    output_csv = os.path.join(pasta, "produtos.csv")
+    output_folder = os.path.join(pasta, "imagens")
+    image_cache_folder = os.path.join(pasta, "cache")
+    processed_folder = os.path.join(pasta, "imagens_processadas")
+    state_db = os.path.join(pasta, "crawl_state.sqlite")
+    archive_folder = os.path.join(pasta, "archive")
+    dead_letter_csv = os.path.join(pasta, "dead_letter.csv")
+    seen_db = os.path.join(pasta, "discovery.sqlite")
+    image_index_db = os.path.join(pasta, "image_index.sqlite")
+    os.makedirs(output_folder, exist_ok=True)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scraper de produtos da Leo Madeiras")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("SCRAPER_WORKERS", "4")),
+                        help="Número de páginas processadas ao mesmo tempo (padrão: 4)")
+    parser.add_argument("--parse-workers", type=int, default=parse_config["workers"],
+                        help="Processos dedicados ao parse do HTML (0: parse nas threads de busca)")
+    parser.add_argument("--parse-queue", type=int, default=parse_config["fila"],
+                        help="Páginas aguardando parse antes de a busca esperar (padrão: 2x --parse-workers)")
+    parser.add_argument("--browsers", type=int, default=1,
+                        help="Instâncias do Chromium no pool de renderização")
+    parser.add_argument("--render-pages", type=int, default=None,
+                        help="Páginas abertas por browser (padrão: igual a --workers)")
+    parser.add_argument("--page-max-uses", type=int, default=50,
+                        help="Renders por página antes de reciclar o contexto")
+    parser.add_argument("--ready-timeout", type=int, default=5000,
+                        help="Tempo máximo (ms) esperando preço e imagens aparecerem na página")
+    parser.add_argument("--no-intercept", action="store_true",
+                        help="Não filtrar as requisições dos renders (só bloqueia imagens e fontes)")
+    parser.add_argument("--block-types", default=",".join(intercept_config["tipos_bloqueados"]),
+                        help="Tipos de recurso abortados nos renders (ex.: image,media,font,stylesheet)")
+    parser.add_argument("--allow-domain", action="append", default=[],
+                        help="Domínio extra cujos scripts podem rodar nos renders; pode repetir")
+    parser.add_argument("--deny-domain", action="append", default=[],
+                        help="Domínio extra sempre bloqueado nos renders; pode repetir")
+    parser.add_argument("--allow-third-party", action="store_true",
+                        help="Permitir requisições de terceiros fora da denylist")
+    parser.add_argument("--fetch-mode", choices=FETCH_MODES, default=fetch_mode,
+                        help="tiered: HTTP primeiro e Playwright só quando faltar dado; "
+                             "render: sempre Playwright; http: nunca Playwright; "
+                             "api: API do catálogo em lotes, páginas só para o que faltar")
+    parser.add_argument("--api-url", default=api_config["url"],
+                        help="Endpoint de produtos da API do catálogo, com {skus} no lugar da lista de SKUs "
+                             "(códigos /p/{sku}/ das URLs); obrigatório com --fetch-mode api")
+    parser.add_argument("--api-batch", type=int, default=api_config["lote"],
+                        help="SKUs por chamada à API do catálogo")
+    parser.add_argument("--parser", choices=PARSERS, default=parser_html,
+                        help="Backend de parse do HTML (lxml e selectolax são mais rápidos)")
+    parser.add_argument("--image-workers", type=int, default=download_config["workers"],
+                        help="Downloads de imagem simultâneos")
+    parser.add_argument("--image-per-host", type=int, default=download_config["por_host"],
+                        help="Conexões simultâneas por host de imagens (só com --no-rate-limit)")
+    parser.add_argument("--image-retries", type=int, default=download_config["tentativas"],
+                        help="Tentativas por imagem em falhas temporárias")
+    parser.add_argument("--host-rate", action="append", default=[], metavar="HOST=REQ/S",
+                        help="Teto de requisições por segundo de um host (ex.: cws.digital=30); pode repetir")
+    parser.add_argument("--host-concurrency", action="append", default=[], metavar="HOST=N",
+                        help="Concorrência máxima que o controle adaptativo pode usar em um host")
+    parser.add_argument("--no-adaptive", action="store_true",
+                        help="Concorrência fixa no máximo configurado, sem o controle AIMD")
+    parser.add_argument("--no-rate-limit", action="store_true",
+                        help="Desligar o limitador por host (volta a valer --image-per-host)")
+    parser.add_argument("--process-images", action="store_true",
+                        help=f"Reencodar as imagens baixadas e gerar miniaturas em {os.path.relpath(processed_folder, current_dir)} (requer Pillow)")
+    parser.add_argument("--image-format", choices=sorted(FORMATOS_SAIDA), default=processing_config["formato"],
+                        help="Formato das imagens processadas")
+    parser.add_argument("--image-quality", type=int, default=processing_config["qualidade"],
+                        help="Qualidade do reencode (1-100)")
+    parser.add_argument("--thumbnails", default=",".join(map(str, processing_config["miniaturas"])),
+                        help="Lados máximos das miniaturas, separados por vírgula (vazio: nenhuma)")
+    parser.add_argument("--image-process-workers", type=int, default=processing_config["workers"],
+                        help="Processos do pós-processamento de imagens (0: um por núcleo)")
+    parser.add_argument("--no-image-cache", action="store_true",
+                        help="Não usar o cache de imagens por hash (baixa e sobrescreve tudo)")
+    parser.add_argument("--retry-budget", type=float, default=retry_config["orcamento"],
+                        help="Retentativas permitidas como fração das requisições (ex.: 0.2 = 20%%)")
+    parser.add_argument("--dead-letter", default=dead_letter_csv,
+                        help="CSV com as URLs que falharam de vez (use em --input para reprocessar)")
+    parser.add_argument("--state", default=state_db,
+                        help="Banco SQLite com o estado do crawl")
+    parser.add_argument("--resume", action="store_true",
+                        help="Pular URLs já concluídas com sucesso em execuções anteriores")
+    parser.add_argument("--since", default=None,
+                        help="Reprocessar só URLs buscadas antes deste prazo (ex.: 12h, 7d, 2025-09-01)")
+    parser.add_argument("--archive", default=archive_folder,
+                        help="Pasta do arquivo de snapshots de HTML")
+    parser.add_argument("--no-archive", action="store_true",
+                        help="Não guardar snapshots do HTML buscado")
+    parser.add_argument("--from-archive", action="store_true",
+                        help="Reextrair dos snapshots arquivados, sem rede (usa --parse-workers ou um processo por núcleo)")
+    parser.add_argument("--input", default=input_csv, help="CSV com a coluna 'url'")
+    parser.add_argument("--discover", action="store_true",
+                        help="Descobrir as URLs pelos sitemaps e categorias em vez de ler --input")
+    parser.add_argument("--sitemap", action="append", default=[],
+                        help="Sitemap (ou índice de sitemaps) de partida da descoberta; pode repetir")
+    parser.add_argument("--category", action="append", default=[],
+                        help="Página de categoria de partida da descoberta; pode repetir")
+    parser.add_argument("--follow", default=discovery_config["seguir"],
+                        help="Regex das páginas de listagem seguidas além das categorias de partida")
+    parser.add_argument("--discover-max-pages", type=int, default=discovery_config["max_paginas"],
+                        help="Máximo de páginas de listagem lidas na descoberta")
+    parser.add_argument("--seen-db", default=seen_db,
+                        help="Banco SQLite com as URLs já descobertas")
+    parser.add_argument("--only-new", action="store_true",
+                        help="Com --discover, processar só produtos nunca descobertos antes")
+    parser.add_argument("--shard", default=None, metavar="I/N",
+                        help="Processar só os SKUs do shard I de N (hash do SKU), gravando em data/shards/shard_IdeN")
+    parser.add_argument("--queue", nargs="?", const=os.path.join(shards_folder, "fila.sqlite"), default=None,
+                        help="Reivindicar as URLs de uma fila SQLite compartilhada entre workers, com leases "
+                             f"(padrão: {os.path.relpath(shards_folder, current_dir)}/fila.sqlite)")
+    parser.add_argument("--worker-id", default=None,
+                        help="Nome deste worker no modo distribuído (padrão: host-pid com --queue)")
+    parser.add_argument("--shard-dir", default=None,
+                        help="Pasta onde este worker grava tudo (padrão: data/shards/<worker>)")
+    parser.add_argument("--lease", type=float, default=300.0,
+                        help="Validade (s) da lease de cada URL da fila; renovada enquanto o worker está vivo")
+    parser.add_argument("--metrics", nargs="?", const=True, default=None,
+                        help="Gravar o log JSON-lines com os tempos por etapa de cada URL "
+                             f"(padrão: {os.path.relpath(metrics_folder, current_dir)}/run_<data>.jsonl)")
+    parser.add_argument("--prometheus", default=None,
+                        help="Gravar as métricas da execução neste arquivo no formato texto do Prometheus")
+    parser.add_argument("--log-level", choices=NIVEIS, default="INFO",
+                        help="DEBUG: estratégia de cada campo; INFO: uma linha por produto; WARNING: só problemas")
+    parser.add_argument("--log-format", choices=FORMATOS, default="texto",
+                        help="Formato do log no console (json: um objeto por linha, com url e sku)")
+    parser.add_argument("--log-file", default=None,
+                        help="Gravar também o log neste arquivo, em JSON-lines")
+    parser.add_argument("--quiet", action="store_true",
+                        help="Só avisos e erros, sem barra de progresso (equivale a --log-level WARNING --progress nenhum)")
+    parser.add_argument("--progress", choices=("barra", "log", "nenhum"), default=None,
+                        help="Andamento: barra do tqdm, uma linha de log a cada 30s ou nada "
+                             "(padrão: barra; log com --log-format json)")
+    parser.add_argument("--output", default=output_csv, help="CSV de saída no formato VTEX")
+    parser.add_argument("--delta", nargs="?", const=True, default=None,
+                        help="Gravar também o delta (SKUs novos, alterados e removidos desde a última execução) "
+                             "e as mudanças campo a campo (padrão: mesmo nome do CSV com _delta.csv)")
+    parser.add_argument("--delta-partial", action="store_true",
+                        help="A entrada é só parte do catálogo: SKUs que ficaram de fora não contam como removidos")
+    parser.add_argument("--snapshot", default=snapshot_db,
+                        help="Banco SQLite com a última linha exportada de cada SKU (referência do delta)")
+    parser.add_argument("--no-full-export", action="store_true",
+                        help="Com --delta, não gravar a planilha completa")
+    parser.add_argument("--parquet", nargs="?", const=True, default=None,
+                        help="Gravar também em Parquet (padrão: mesmo nome do CSV com .parquet)")
+    parser.add_argument("--batch-size", type=int, default=100,
+                        help="Linhas por lote gravado no disco")
+    parser.add_argument("--flush-interval", type=float, default=30.0,
+                        help="Intervalo máximo (s) entre gravações no disco")
+    return parser.parse_args(argv)
+
+# === Execução Principal ===
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        shard = parse_shard(args.shard) if args.shard else None
+    except ValueError as e:
+        print(f"❌ {e}")
+        exit(1)
+    if shard and args.queue:
+        print("❌ Use --shard ou --queue, não os dois")
+        exit(1)
+    if args.delta and (shard or args.queue):
+        print("❌ No modo distribuído o delta sai do merge: python scripts/merge_shards.py --delta")
+        exit(1)
+    if args.no_full_export and not args.delta:
+        print("❌ --no-full-export só faz sentido com --delta")
+        exit(1)
+    if args.queue and (args.discover or args.from_archive or args.resume or args.since):
+        print("❌ --queue distribui as URLs de --input e guarda o que já foi concluído; "
+              "não use com --discover, --from-archive, --resume ou --since")
+        exit(1)
+    if args.fetch_mode == "api" and not args.api_url:
+        print("❌ --fetch-mode api precisa de --api-url (ex.: o servidor local: python scripts/catalog_stub_server.py)")
+        exit(1)
+    if args.api_url and "{skus}" not in args.api_url:
+        print("❌ --api-url precisa conter {skus}")
+        exit(1)
+    nome_worker = pasta_worker = None
+    
+    def marcar_worker(terminou, falhas, parcial=False):
+        """Marcador de conclusão na pasta do worker, lido por scripts/merge_shards.py"""
+        if pasta_worker is not None:
+            gravar_marcador(pasta_worker, worker=nome_worker, shard=args.shard, fila=args.queue,
+                            terminou=terminou, falhas=falhas, parcial=parcial)
+    
+    if shard or args.queue:
+        nome_worker = args.worker_id or (f"shard_{shard[0] + 1}de{shard[1]}" if shard else id_worker_padrao())
+        pasta_worker = args.shard_dir or os.path.join(shards_folder, nome_worker)
+        usar_pasta_worker(pasta_worker)
+        # Sem marcador até esta execução terminar: o merge não confunde com a anterior
+        remover_marcador(pasta_worker)
+        # Os padrões de --output, --state etc. agora apontam para a pasta do worker; opções explícitas continuam valendo
+        args = parse_args()
+    if args.log_file:
+        os.makedirs(os.path.dirname(os.path.abspath(args.log_file)), exist_ok=True)
+    structured_log.configurar("WARNING" if args.quiet else args.log_level, args.log_format, args.log_file)
+    modo_progresso = args.progress or ("nenhum" if args.quiet else "log" if args.log_format == "json" else "barra")
+    try:
+        corte_since = parse_since(args.since) if args.since else None
+    except ValueError as e:
+        print(f"❌ {e}")
+        exit(1)
+    fetch_mode = args.fetch_mode
+    api_config.update({"url": args.api_url, "lote": max(1, args.api_batch)})
+    parser_html = resolver_parser(args.parser)
+    parse_config.update({"workers": max(0, args.parse_workers), "fila": max(0, args.parse_queue)})
+    intercept_config.update({
+        "ativo": not args.no_intercept,
+        "tipos_bloqueados": [t.strip() for t in args.block_types.split(",") if t.strip()],
+        "permitidos": intercept_config["permitidos"] + args.allow_domain,
+        "bloqueados": intercept_config["bloqueados"] + args.deny_domain,
+        "bloquear_terceiros": not args.allow_third_party,
+    })
+    render_config.update({
+        "browsers": args.browsers,
+        "paginas_por_browser": args.render_pages or max(1, -(-args.workers // args.browsers)),
+        "max_usos": args.page_max_uses,
+        "prontidao_timeout_ms": args.ready_timeout,
+    })
+    download_config.update({
+        "workers": args.image_workers,
+        "por_host": args.image_per_host,
+        "tentativas": args.image_retries,
+    })
+    usar_cache_imagens = not args.no_image_cache
+    try:
+        processing_config.update({
+            "ativo": args.process_images,
+            "formato": args.image_format,
+            "qualidade": min(100, max(1, args.image_quality)),
+            "miniaturas": [int(t) for t in args.thumbnails.split(",") if t.strip()],
+            "workers": max(0, args.image_process_workers),
+        })
+    except ValueError:
+        print(f"❌ --thumbnails deve ser uma lista de números, recebido: {args.thumbnails!r}")
+        exit(1)
+    usar_limitador = not args.no_rate_limit
+    retry_config["orcamento"] = max(0.0, args.retry_budget)
+    try:
+        aplicar_limites_host(args.host_rate, "taxa", float)
+        aplicar_limites_host(args.host_concurrency, "concorrencia_max", int)
+    except ValueError as e:
+        print(f"❌ {e}")
+        exit(1)
+    if args.no_adaptive:
+        for config in list(rate_config.values()) + [rate_padrao]:
+            config.update({"adaptativo": False, "concorrencia": config.get("concorrencia_max", 16)})
+    archive_folder = args.archive
+    arquivar_html = not args.no_archive
+    
+    def no_shard(url):
+        return shard is None or shard_de(sku_da_url(url), shard[1]) == shard[0]
+    
+    if args.discover:
+        if args.from_archive:
+            print("❌ --from-archive reextrai as URLs de --input, não use com --discover")
+            exit(1)
+        if args.sitemap or args.category:
+            discovery_config.update({"sitemaps": args.sitemap, "categorias": args.category})
+        discovery_config.update({"seguir": args.follow, "max_paginas": args.discover_max_pages})
+        urls_validas = None
+    else:
+        # Ler CSV de entrada: só URLs válidas da Leo Madeiras, sem repetir
+        try:
+            urls_validas = list(ler_urls(args.input))
+        except (OSError, ValueError) as e:
+            print(f"❌ Erro ao ler CSV: {e}")
+            exit(1)
+        
+        if not urls_validas:
+            print("❌ Nenhuma URL válida da Leo Madeiras encontrada")
+            exit(1)
+        if shard:
+            total_entrada = len(urls_validas)
+            urls_validas = [url for url in urls_validas if no_shard(url)]
+            print(f"🧩 Shard {shard[0] + 1}/{shard[1]}: {len(urls_validas)} de {total_entrada} URLs")
+            if not urls_validas:
+                print("✅ Nenhuma URL neste shard")
+                marcar_worker(True, 0)
+                exit(0)
+    
+    caminho_parquet = None
+    if args.parquet:
+        caminho_parquet = args.parquet if isinstance(args.parquet, str) else os.path.splitext(args.output)[0] + ".parquet"
+    caminho_completo = None if args.no_full_export else args.output
+    
+    # Delta contra a última exportação; SKUs não vistos só contam como removidos se a entrada é o catálogo todo
+    delta_parcial = (args.delta_partial or args.only_new or args.from_archive
+                     or os.path.abspath(args.input) == os.path.abspath(args.dead_letter))
+    
+    def criar_delta():
+        if not args.delta:
+            return None
+        caminho_delta = args.delta if isinstance(args.delta, str) else os.path.splitext(args.output)[0] + "_delta.csv"
+        os.makedirs(os.path.dirname(os.path.abspath(caminho_delta)), exist_ok=True)
+        return ExportadorDelta(SnapshotProdutos(args.snapshot), caminho_delta,
+                               os.path.splitext(caminho_delta)[0] + "_mudancas.csv",
+                               tamanho_lote=args.batch_size, intervalo_flush=args.flush_interval)
+    
+    def resumo_delta():
+        if delta is not None:
+            print(f"🔀 Delta salvo: {delta.caminho_delta} ({delta.resumo()})")
+            print(f"🔀 Mudanças campo a campo: {delta.caminho_mudancas}")
+            if delta_parcial:
+                print("⚠️ Delta parcial: a execução não cobriu o catálogo todo, SKUs ausentes não foram removidos")
+    
+    # Reextração offline: só os snapshots arquivados, sem rede e sem mexer no estado
+    if args.from_archive:
+        arquivo = ArquivoHTML(archive_folder)
+        snapshots = arquivo.ultimos(urls_validas)
+        arquivo.close()
+        if not snapshots:
+            print(f"❌ Nenhum snapshot arquivado em {archive_folder} para as URLs de entrada")
+            exit(1)
+        if len(snapshots) < len(urls_validas):
+            print(f"⚠️ {len(urls_validas) - len(snapshots)} URLs sem snapshot serão ignoradas")
+        print(f"🗄️ Reextraindo {len(snapshots)} produtos do arquivo...")
+        
+        inicio = time.time()
+        delta = criar_delta()
+        with ExportadorStream(caminho_completo, caminho_parquet, tamanho_lote=args.batch_size,
+                              intervalo_flush=args.flush_interval) as exportador:
+            def exportar(url, produto, info):
+                if delta is not None:
+                    delta.escrever(produto)
+                exportador.escrever(produto)
+            
+            total_ok, falhas = reextrair_do_arquivo(
+                snapshots, workers=parse_config["workers"] or None,
+                ao_concluir=exportar, progresso=criar_progresso(modo_progresso),
+            )
+        if delta is not None:
+            delta.close(remover=False)
+            delta.snapshot.close()
+        duracao = time.time() - inicio
+        structured_log.drenar()
+        
+        if caminho_completo:
+            print(f"\n✅ Planilha salva: {args.output} ({total_ok} produtos)")
+        resumo_delta()
+        print(f"⏱️ Tempo total: {duracao:.1f}s ({len(snapshots) / max(duracao, 1e-9):.2f} páginas/s)")
+        if falhas:
+            print(f"\n❌ {len(falhas)} snapshots falharam:")
+            for url, erro in falhas.items():
+                print(f"   {url}: {erro[:120]}")
+        exit(0)
+    
+    # Estado persistente: pular URLs concluídas (--resume) ou ainda recentes (--since)
+    os.makedirs(os.path.dirname(os.path.abspath(args.state)), exist_ok=True)
+    estado = CrawlState(args.state)
+    if corte_since is not None:
+        puladas = estado.concluidas(desde=corte_since)
+    elif args.resume:
+        puladas = estado.concluidas()
+    else:
+        puladas = set()
+    workers_msg = (f" com {args.workers} workers"
+                   + (f" de busca e {parse_config['workers']} processos de parse..." if parse_config["workers"] else "..."))
+    
+    delta = criar_delta()
+    # Na fila, a linha vai para o disco antes de o item ser marcado como concluído
+    exportador = ExportadorStream(caminho_completo, caminho_parquet, tamanho_lote=1 if args.queue else args.batch_size,
+                                  intervalo_flush=args.flush_interval)
+    
+    def exportar(produto):
+        # O delta vem antes: ele devolve aos SKUs conhecidos a data de lançamento original
+        if delta is not None:
+            delta.escrever(produto)
+        exportador.escrever(produto)
+    
+    vistos = descobridor = fila = consumidor = None
+    reaproveitadas = []
+    if args.discover:
+        # As URLs chegam aos workers conforme a descoberta as encontra
+        os.makedirs(os.path.dirname(os.path.abspath(args.seen_db)), exist_ok=True)
+        vistos = ConjuntoVistos(args.seen_db)
+        descobridor = criar_descobridor(vistos, args.only_new)
+        inicio_descoberta = datetime.now()
+        
+        def descobertas_pendentes():
+            for url in descobridor.urls():
+                if not no_shard(url):
+                    continue
+                if url in puladas:
+                    reaproveitadas.append(url)
+                else:
+                    yield url
+        
+        urls_pendentes = descobertas_pendentes()
+        print(f"🗺️ Descobrindo produtos em {len(discovery_config['sitemaps'])} sitemaps e "
+              f"{len(discovery_config['categorias'])} categorias" + workers_msg)
+    elif args.queue:
+        # As URLs saem da fila compartilhada conforme este worker tem vagas
+        fila = FilaTrabalho(args.queue, lease=max(1.0, args.lease))
+        novas = fila.carregar(urls_validas, sku=sku_da_url)
+        janela = max(8, args.workers * 4)
+        consumidor = ConsumidorFila(fila, nome_worker, janela=janela)
+        # O alimentador segura as URLs até fechar o lote da API, e o consumidor não reivindica
+        # mais que a janela antes de alguma ser concluída: o lote cabe na janela, e o parcial
+        # sai sempre que o consumidor vai esperar (pausas)
+        if fetch_mode == "api" and api_config["lote"] > janela:
+            api_config["lote"] = janela
+            print(f"📦 Lote da API reduzido para {janela} (janela de leases do worker)")
+        urls_pendentes = consumidor.urls(pausas=fetch_mode == "api")
+        r = fila.resumo()
+        print(f"📬 Fila {args.queue}: {novas} URLs novas, {r['pendente']} pendentes, "
+              f"{r['em_andamento']} em andamento, {r['concluido']} concluídas")
+        print(f"🚀 Worker {nome_worker} reivindicando produtos da fila" + workers_msg)
+    else:
+        urls_pendentes = [url for url in urls_validas if url not in puladas]
+        if puladas:
+            print(f"⏭️ {len(urls_validas) - len(urls_pendentes)} URLs já concluídas serão reaproveitadas do estado")
+        print(f"🚀 Iniciando processamento de {len(urls_pendentes)} produtos" + workers_msg)
+        
+        # Linhas reaproveitadas do estado entram primeiro, sem recarregar a planilha inteira
+        pendentes = set(urls_pendentes)
+        for _, produto in estado.iterar_produtos(url for url in urls_validas if url not in pendentes):
+            exportar(produto)
+        if delta is not None:
+            # Pulada sem linha no estado continua na referência: está na entrada, não foi removida
+            delta.snapshot.manter(sku_da_url(url) for url in urls_validas if url not in pendentes)
+    
+    dead_letter = DeadLetter(args.dead_letter)
+    processados = {"ok": 0, "falhas": 0}
+    if args.metrics or args.prometheus:
+        caminho_metricas = None
+        if args.metrics:
+            caminho_metricas = (args.metrics if isinstance(args.metrics, str) else
+                                os.path.join(metrics_folder, f"run_{datetime.now():%Y%m%d_%H%M%S}.jsonl"))
+        _metricas = MetricasExecucao(caminho_metricas, args.prometheus)
+    
+    def concluir(url, produto, info):
+        processados["ok"] += 1
+        estado.registrar_sucesso(url, produto, info.get("hash_conteudo"))
+        exportar(produto)
+        # Produto salvo, mas com imagens faltando: reprocessar baixa só o que falta
+        for erro in info.get("falhas_imagens", []):
+            dead_letter.registrar(url, erro, etapa="imagem")
+        if consumidor is not None:
+            consumidor.concluir(url)
+    
+    def falhar(url, erro):
+        processados["falhas"] += 1
+        estado.registrar_falha(url, erro)
+        dead_letter.registrar(url, erro)
+        if consumidor is not None:
+            consumidor.falhar(url, erro)
+    
+    inicio = time.time()
+    terminou = False
+    try:
+        _, falhas = processar_urls(
+            urls_pendentes, workers=args.workers,
+            ao_concluir=concluir, ao_falhar=falhar,
+            guardar_resultados=False, progresso=criar_progresso(modo_progresso),
+        )
+        
+        # URLs que falharam agora mantêm a última linha boa, se houver; na
+        # descoberta, as já concluídas (--resume/--since) entram no fim
+        for _, produto in estado.iterar_produtos(list(falhas) + reaproveitadas):
+            exportar(produto)
+        if delta is not None:
+            # Falha sem linha boa no estado não é remoção: o SKU fica na referência como estava
+            delta.snapshot.manter(sku_da_url(url) for url in falhas)
+        terminou = True
+    finally:
+        # O resumo abaixo não se mistura com o log ainda na fila
+        structured_log.drenar()
+        fechar_render_pool()
+        fechar_downloader()
+        fechar_processador()
+        fechar_arquivo_html()
+        fechar_catalogo()
+        resumo_limitador()
+        resumo_retentativas()
+        fechar_metricas()
+        dead_letter.close()
+        exportador.close()
+        estado.close()
+        if consumidor is not None:
+            consumidor.close()
+            r = fila.resumo()
+            print(f"📬 Worker {nome_worker}: {consumidor.reivindicadas} URLs reivindicadas | fila: "
+                  f"{r['concluido']} concluídas, {r['falhou']} falharam, "
+                  f"{r['pendente'] + r['em_andamento']} restantes")
+            fila.close()
+        if descobridor is not None:
+            r = descobridor.resumo()
+            print(f"🗺️ Descoberta: {r['sitemaps']} sitemaps, {r['paginas']} páginas de listagem, "
+                  f"{r['encontradas']} produtos ({r['novas']} novos), {r['erros']} erros"
+                  + (f", {len(reaproveitadas)} reaproveitados do estado" if reaproveitadas else ""))
+            if r["puladas"]:
+                print(f"✂️ Descoberta truncada: {r['puladas']} páginas de listagem não lidas "
+                      f"(limite de {discovery_config['max_paginas']} em --discover-max-pages)")
+            # Só com a descoberta inteira (sem erros nem páginas cortadas pelo limite) um SKU ausente é remoção
+            if r["completa"] and r["erros"] == 0 and r["puladas"] == 0:
+                sumidos = vistos.ausentes_desde(inicio_descoberta)
+                if sumidos:
+                    print(f"👻 {len(sumidos)} produtos descobertos em execuções anteriores não apareceram agora")
+            else:
+                delta_parcial = True
+            vistos.close()
+        if delta is not None:
+            # Execução interrompida: o delta fica gravado, mas a referência não muda
+            delta.close(confirmar=terminou, remover=terminou and not delta_parcial)
+            delta.snapshot.close()
+        marcar_worker(terminou, len(falhas) if terminou else None, delta_parcial)
+    duracao = time.time() - inicio
+    
+    # Resumo
+    if exportador.total:
+        print()
+        if caminho_completo:
+            print(f"✅ Planilha salva: {args.output}")
+            if caminho_parquet and exportador.caminho_parquet:
+                print(f"✅ Parquet salvo: {caminho_parquet}")
+        resumo_delta()
         print(f"🖼️ Imagens em: {output_folder}")
-        print(f"📊 Total processados: {len(produtos)}")
+        if processing_config["ativo"]:
+            print(f"🎨 Imagens processadas em: {processed_folder}")
+        print(f"📊 Total na planilha: {exportador.total} ({processados['ok']} processados agora)")
+        print(f"⏱️ Tempo total: {duracao:.1f}s "
+              f"({(processados['ok'] + processados['falhas']) / max(duracao, 1e-9):.2f} páginas/s)")
+        print(f"🌐 Páginas via HTTP: {estatisticas_tiers['http']} | via Playwright: {estatisticas_tiers['render']}"
+              + (f" | produtos via API: {estatisticas_tiers['api']}" if fetch_mode == "api" else ""))
         
         # Estatísticas
-        marca_counts = df_final['_Marca'].value_counts()
         print(f"\n🏷️ Marcas encontradas:")
-        for marca, count in marca_counts.items():
+        for marca, count in exportador.marcas.most_common():
             print(f"   {marca}: {count} produtos")
     else:
         print("❌ Nenhum produto processado")
     
-    # Limpar recursos do Playwright
-    cleanup_playwright()
\ No newline at end of file
+    if falhas:
+        print(f"\n❌ {len(falhas)} URLs falharam:")
+        for url, erro in falhas.items():
+            print(f"   {url}: {erro[:120]}")
+    if dead_letter.total:
+        print(f"\n📮 {dead_letter.total} falhas em {args.dead_letter} (reprocesse com --input {args.dead_letter})")
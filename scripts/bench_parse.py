@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark do tempo de parse por página de analisar_html
+
+Mede o tempo de extração sobre as páginas salvas em data/fixtures/html (ou,
+com --archive, sobre os snapshots do arquivo de HTML do crawl) e, com --ref, compara com a versão de scraper.py de outro commit (tempo e
+igualdade das linhas extraídas).
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import subprocess
+import sys
+import time
+import types
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+import scraper
+from html_archive import ArquivoHTML, ler_snapshot
+
+PASTA_FIXTURES = RAIZ / "data" / "fixtures" / "html"
+
+def carregar_fixtures(pasta=PASTA_FIXTURES):
+    """Lista de (nome, url, html) das páginas salvas"""
+    indice = json.loads((pasta / "index.json").read_text(encoding="utf-8"))
+    return [(nome, url, (pasta / nome).read_text(encoding="utf-8")) for nome, url in indice.items()]
+
+def carregar_arquivo(pasta, limite=None):
+    """Lista de (nome, url, html) com o último snapshot de cada URL do arquivo"""
+    arquivo = ArquivoHTML(pasta)
+    snapshots = arquivo.ultimos()[:limite]
+    arquivo.close()
+    return [(f"{sku}/{Path(caminho).name}", url, ler_snapshot(caminho)) for url, sku, _, caminho in snapshots]
+
+def carregar_scraper_ref(ref):
+    """Carrega scraper.py de outro commit como módulo separado"""
+    codigo = subprocess.run(["git", "show", f"{ref}:scraper.py"], cwd=RAIZ, check=True,
+                            capture_output=True, text=True).stdout
+    modulo = types.ModuleType(f"scraper_{ref}")
+    modulo.__file__ = str(RAIZ / "scraper.py")
+    exec(compile(codigo, f"scraper.py@{ref}", "exec"), modulo.__dict__)
+    if not hasattr(modulo, "analisar_html"):
+        raise SystemExit(f"❌ scraper.py em {ref} não tem analisar_html")
+    return modulo
+
+def medir(analisar, fixtures, repeticoes):
+    """Tempo mediano (ms) por página e o resultado da última execução"""
+    tempos, resultados = {}, {}
+    for nome, url, html in fixtures:
+        amostras = []
+        for _ in range(repeticoes):
+            with contextlib.redirect_stdout(io.StringIO()):
+                inicio = time.perf_counter()
+                resultados[nome] = analisar(html, url)
+                amostras.append((time.perf_counter() - inicio) * 1000)
+        tempos[nome] = statistics.median(amostras)
+    return tempos, resultados
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de parse das páginas salvas")
+    parser.add_argument("--ref", help="Commit para comparar (ex.: HEAD~1)")
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--json", help="Gravar os resultados neste arquivo")
+    parser.add_argument("--archive", help="Usar os snapshots desta pasta de arquivo (ex.: data/archive/html)")
+    parser.add_argument("--limite", type=int, default=None, help="Máximo de páginas do arquivo")
+    args = parser.parse_args()
+
+    fixtures = carregar_arquivo(args.archive, args.limite) if args.archive else carregar_fixtures()
+    atual, res_atual = medir(scraper.analisar_html, fixtures, args.repeticoes)
+
+    ref, res_ref = {}, {}
+    if args.ref:
+        ref, res_ref = medir(carregar_scraper_ref(args.ref).analisar_html, fixtures, args.repeticoes)
+
+    largura = max([28] + [len(nome) for nome, _, _ in fixtures])
+    print(f"{'página':<{largura}} {'atual (ms)':>11}" + (f" {args.ref + ' (ms)':>14} {'ganho':>7} {'igual':>6}" if ref else ""))
+    divergencias = 0
+    for nome, _, _ in fixtures:
+        linha = f"{nome:<{largura}} {atual[nome]:>11.2f}"
+        if ref:
+            igual = res_atual[nome] == res_ref[nome]
+            divergencias += not igual
+            linha += f" {ref[nome]:>14.2f} {ref[nome] / atual[nome]:>6.1f}x {'sim' if igual else 'NÃO':>6}"
+        print(linha)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"atual_ms": atual, "ref": args.ref, "ref_ms": ref},
+                                              indent=2), encoding="utf-8")
+    if divergencias:
+        print(f"❌ {divergencias} páginas com resultado diferente da referência")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark do render com e sem a política de interceptação
+
+Renderiza as mesmas URLs duas vezes: primeiro bloqueando só imagens e fontes
+(o comportamento antigo) e depois com a política padrão (CSS, analytics e
+scripts de terceiros abortados). Mostra o tempo médio por página, as
+requisições e os bytes baixados em cada modo e a memória dos processos do
+Chromium (com psutil instalado).
+"""
+
+import argparse
+import itertools
+import statistics
+import sys
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from discovery import ler_urls
+from intercept_policy import PoliticaInterceptacao
+from render_pool import RenderPoolSync
+
+try:
+    import psutil
+except Exception:
+    psutil = None
+
+def memoria_chromium_mb():
+    """Memória residente somada dos processos do Chromium, se psutil estiver instalado"""
+    if psutil is None:
+        return None
+    total = 0
+    for proc in psutil.process_iter(["name", "memory_info"]):
+        nome = (proc.info["name"] or "").lower()
+        if "chrom" in nome and proc.info["memory_info"]:
+            total += proc.info["memory_info"].rss
+    return total / 1e6
+
+def medir(urls, politica, paginas):
+    pool = RenderPoolSync(paginas_por_browser=paginas, politica=politica)
+    tempos, falhas, memoria = [], 0, []
+    try:
+        for url in urls:
+            inicio = time.perf_counter()
+            try:
+                pool.render(url)
+                tempos.append(time.perf_counter() - inicio)
+            except Exception as e:
+                falhas += 1
+                print(f"⚠️ {url}: {e}")
+            mem = memoria_chromium_mb()
+            if mem is not None:
+                memoria.append(mem)
+    finally:
+        pool.close()
+    return tempos, falhas, memoria, politica.resumo()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da interceptação de requisições nos renders")
+    parser.add_argument("--input", default=str(RAIZ / "data" / "csv" / "produtos_link.csv"))
+    parser.add_argument("--limite", type=int, default=10, help="Número de URLs renderizadas em cada modo")
+    parser.add_argument("--paginas", type=int, default=1)
+    args = parser.parse_args()
+
+    urls = list(itertools.islice(ler_urls(args.input, filtro=""), args.limite))
+    modos = {
+        "só imagens/fontes": PoliticaInterceptacao(tipos_bloqueados={"image", "font"}, bloqueados=[],
+                                                  bloquear_terceiros=False),
+        "política padrão": PoliticaInterceptacao(),
+    }
+
+    print(f"🚀 Renderizando {len(urls)} URLs em cada modo")
+    print(f"{'modo':<20} {'média (s)':>10} {'p95 (s)':>8} {'req':>6} {'bloq':>6} {'MB':>7} {'RAM (MB)':>9} {'falhas':>7}")
+    for nome, politica in modos.items():
+        tempos, falhas, memoria, r = medir(urls, politica, args.paginas)
+        media = statistics.fmean(tempos) if tempos else 0.0
+        p95 = sorted(tempos)[min(len(tempos) - 1, int(len(tempos) * 0.95))] if tempos else 0.0
+        ram = f"{max(memoria):>9.0f}" if memoria else f"{'-':>9}"
+        print(f"{nome:<20} {media:>10.2f} {p95:>8.2f} {r['permitidas']:>6} {r['bloqueadas']:>6} "
+              f"{r['bytes_permitidos'] / 1e6:>7.1f} {ram} {falhas:>7}")
+        if r["dominios"]:
+            print("   Mais bloqueados: " + ", ".join(f"{d} ({n})" for d, n in r["dominios"]))
+
+if __name__ == "__main__":
+    main()
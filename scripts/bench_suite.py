@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Suíte de benchmarks offline do scraper
+
+Mede, sem acessar leomadeiras.com.br:
+- parse: tempo por página de analisar_html (o parse de extrair_produto) nas
+  páginas gravadas em data/fixtures/html;
+- ponta_a_ponta: processar_urls (busca HTTP, parse, imagens) contra o servidor
+  de fixtures servindo o corpus gravado, em páginas/s;
+- imagens: o downloader de imagens sozinho, em imagens/s e MB/s.
+
+Cada benchmark roda em um processo próprio, do qual sai o pico de memória
+(RSS do processo e do maior processo filho, ex.: o pool de parse). O servidor
+roda em outro processo, para não disputar o GIL com o scraper, com latência,
+jitter e injeção de erros configuráveis e sorteios reproduzíveis (--semente).
+
+O resultado vai para data/bench/bench_<commit>_<data>.json com o commit, a
+máquina, os parâmetros e as métricas. Com --comparar, as métricas são
+comparadas com as de um resultado anterior e a saída é 1 se alguma piorou
+além da tolerância.
+
+    python scripts/bench_suite.py
+    python scripts/bench_suite.py --latencia 0.05 --jitter 0.02 --taxa-erro 0.02 --rodadas 3
+    python scripts/bench_suite.py --comparar data/bench/bench_3c9e927_20261017_101500.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows: sem pico de RSS
+    resource = None
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(RAIZ / "scripts"))
+
+from fixture_server import iniciar_servidor, urls_fixture
+
+PASTA_RESULTADOS = RAIZ / "data" / "bench"
+BENCHMARKS = ("parse", "ponta_a_ponta", "imagens")
+MARCADOR = "RESULTADO_BENCH "
+
+# (benchmark, métrica) comparadas entre execuções -> True se maior é melhor
+METRICAS = {
+    ("parse", "ms_mediana"): False,
+    ("parse", "ms_p95"): False,
+    ("ponta_a_ponta", "paginas_s"): True,
+    ("imagens", "imagens_s"): True,
+    ("imagens", "mb_s"): True,
+    **{(nome, "rss_pico_mb"): False for nome in BENCHMARKS},
+}
+
+def pico_rss():
+    """Pico de RSS (MB) deste processo e do maior processo filho já encerrado"""
+    if resource is None:
+        return {}
+    # ru_maxrss vem em bytes no macOS e em KB no Linux
+    fator = 1 if sys.platform == "darwin" else 1024
+    return {
+        "rss_pico_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * fator / 1e6, 1),
+        "rss_pico_filhos_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * fator / 1e6, 1),
+    }
+
+# === Benchmarks (executados no processo isolado) ===
+
+def _preparar_scraper(tmp, parametros):
+    """scraper com saídas em tmp, só HTTP (sem Playwright) e o limitador como pedido"""
+    import scraper
+
+    scraper.output_folder = os.path.join(tmp, "imagens")
+    scraper.image_cache_folder = os.path.join(tmp, "cache")
+    scraper.image_index_db = os.path.join(tmp, "image_index.sqlite")
+    os.makedirs(scraper.output_folder, exist_ok=True)
+    scraper.fetch_mode = "http"
+    scraper.usar_limitador = parametros["limitador"]
+    return scraper
+
+def bench_parse(parametros, base_url=None):
+    import scraper
+    from bench_parse import carregar_fixtures
+    from metrics import percentil
+
+    fixtures = carregar_fixtures()
+    por_pagina, amostras = {}, []
+    for nome, url, html in fixtures:
+        tempos = []
+        for _ in range(parametros["repeticoes"]):
+            inicio = time.perf_counter()
+            scraper.analisar_html(html, url)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        por_pagina[nome] = round(statistics.median(tempos), 3)
+        amostras += tempos
+    amostras.sort()
+    return {
+        "paginas": len(fixtures),
+        "ms_mediana": round(statistics.median(amostras), 3),
+        "ms_p95": round(percentil(amostras, 0.95), 3),
+        "paginas_s": round(1000 / statistics.mean(amostras), 1),
+        "por_pagina_ms": por_pagina,
+    }
+
+def bench_ponta_a_ponta(parametros, base_url):
+    with tempfile.TemporaryDirectory() as tmp:
+        scraper = _preparar_scraper(tmp, parametros)
+        urls = urls_fixture(base_url, parametros["produtos"])
+        inicio = time.perf_counter()
+        _, falhas = scraper.processar_urls(urls, workers=parametros["workers"], mostrar_progresso=False,
+                                           guardar_resultados=False, parse_workers=parametros["parse_workers"])
+        duracao = time.perf_counter() - inicio
+        downloader = scraper.get_downloader()
+        imagens, bytes_imagens = downloader.baixadas, downloader.bytes
+        scraper.fechar_downloader()
+        retentativas = scraper.get_retentativas().resumo()["retentativas"]
+    return {
+        "produtos": len(urls),
+        "falhas": len(falhas),
+        "duracao_s": round(duracao, 3),
+        "paginas_s": round(len(urls) / duracao, 2),
+        "imagens": imagens,
+        "mb_imagens": round(bytes_imagens / 1e6, 2),
+        "retentativas": sum(retentativas.values()),
+    }
+
+def bench_imagens(parametros, base_url):
+    with tempfile.TemporaryDirectory() as tmp:
+        scraper = _preparar_scraper(tmp, parametros)
+        downloader = scraper.get_downloader()
+        por_produto = parametros["imagens_por_produto"]
+        inicio = time.perf_counter()
+        futures = []
+        for sku in (str(10000000 + i) for i in range(parametros["produtos"])):
+            futures += downloader.enfileirar(sku, [f"{base_url}/cws.digital/produtos/{sku}_{n}.jpg"
+                                                   for n in range(1, por_produto + 1)])
+        salvas = downloader.aguardar(futures)
+        duracao = time.perf_counter() - inicio
+        bytes_imagens, retentativas = downloader.bytes, downloader.retentativas
+        scraper.fechar_downloader()
+    return {
+        "imagens": len(futures),
+        "falhas": len(futures) - len(salvas),
+        "duracao_s": round(duracao, 3),
+        "imagens_s": round(len(salvas) / duracao, 1),
+        "mb_s": round(bytes_imagens / 1e6 / duracao, 2),
+        "retentativas": retentativas,
+    }
+
+def executar_interno(nome, parametros, base_url):
+    """Ponto de entrada do processo isolado: roda o benchmark e imprime o resultado"""
+    import structured_log
+    structured_log.configurar("WARNING")
+    resultado = globals()[f"bench_{nome}"](parametros, base_url)
+    resultado.update(pico_rss())
+    structured_log.drenar()
+    print(MARCADOR + json.dumps(resultado), flush=True)
+
+# === Orquestração ===
+
+def _servir(opcoes, conexao):
+    servidor, base_url = iniciar_servidor(**opcoes)
+    conexao.send(base_url)
+    conexao.recv()
+    conexao.send({chave: valor for chave, valor in servidor.estado.items() if chave != "lock"})
+    servidor.shutdown()
+
+@contextmanager
+def servidor_em_processo(**opcoes):
+    """Servidor de fixtures em um processo separado; o dicionário recebe as contagens ao parar"""
+    contexto = multiprocessing.get_context("spawn")
+    pai, filho = contexto.Pipe()
+    processo = contexto.Process(target=_servir, args=(opcoes, filho), daemon=True)
+    processo.start()
+    contagens = {}
+    try:
+        yield pai.recv(), contagens
+    finally:
+        pai.send("parar")
+        contagens.update(pai.recv())
+        processo.join(timeout=5)
+
+def executar_isolado(nome, parametros, base_url):
+    """Roda um benchmark em um processo novo e retorna o resultado"""
+    comando = [sys.executable, __file__, "--interno", nome, "--parametros", json.dumps(parametros),
+               "--base-url", base_url or ""]
+    saida = subprocess.run(comando, cwd=RAIZ, capture_output=True, text=True)
+    for linha in reversed(saida.stdout.splitlines()):
+        if linha.startswith(MARCADOR):
+            return json.loads(linha[len(MARCADOR):])
+    raise RuntimeError(f"Benchmark {nome} falhou (código {saida.returncode}):\n{saida.stderr[-2000:]}")
+
+def mediana_rodadas(rodadas):
+    """Uma rodada com a mediana de cada número de primeiro nível (o resto vem da primeira)"""
+    combinado = dict(rodadas[0])
+    for chave, valor in rodadas[0].items():
+        if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            valores = [r[chave] for r in rodadas]
+            mediana = statistics.median(valores)
+            inteiro = all(isinstance(v, int) for v in valores) and mediana == int(mediana)
+            combinado[chave] = int(mediana) if inteiro else round(mediana, 3)
+    if len(rodadas) > 1:
+        combinado["rodadas"] = len(rodadas)
+    return combinado
+
+def identificar_commit():
+    """(hash curto, há alterações não commitadas)"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, check=True,
+                                capture_output=True, text=True).stdout.strip()
+        sujo = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=RAIZ,
+                                   check=True, capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecido", False
+    return commit, sujo
+
+def maquina():
+    return {
+        "plataforma": platform.platform(),
+        "python": platform.python_version(),
+        "processador": platform.processor() or platform.machine(),
+        "nucleos": os.cpu_count(),
+    }
+
+def comparar(anterior, atual, tolerancia):
+    """Mostra a variação de cada métrica e retorna as que pioraram além da tolerância"""
+    print(f"\n📊 Comparação com {anterior['commit']} ({anterior['quando']}):")
+    if anterior["maquina"] != atual["maquina"]:
+        print("⚠️ Máquinas diferentes: a comparação pode não ser válida")
+    if anterior["parametros"] != atual["parametros"]:
+        print("⚠️ Parâmetros diferentes: a comparação pode não ser válida")
+    print(f"   {'métrica':<28} {'antes':>10} {'agora':>10} {'variação':>9}")
+    pioras = []
+    for (nome, metrica), maior_melhor in METRICAS.items():
+        antes = anterior["resultados"].get(nome, {}).get(metrica)
+        agora = atual["resultados"].get(nome, {}).get(metrica)
+        if not antes or agora is None:
+            continue
+        variacao = agora / antes - 1
+        piora = -variacao if maior_melhor else variacao
+        marca = "❌" if piora > tolerancia else "✅" if piora < -tolerancia else "  "
+        if piora > tolerancia:
+            pioras.append(f"{nome}.{metrica}")
+        print(f"{marca} {nome + '.' + metrica:<28} {antes:>10.2f} {agora:>10.2f} {variacao:>+8.1%}")
+    return pioras
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks offline do scraper")
+    parser.add_argument("--benchmarks", default=",".join(BENCHMARKS),
+                        help=f"Benchmarks a rodar, separados por vírgula ({', '.join(BENCHMARKS)})")
+    parser.add_argument("--rodadas", type=int, default=1, help="Rodadas de cada benchmark (fica a mediana)")
+    parser.add_argument("--repeticoes", type=int, default=20, help="Repetições por página no parse")
+    parser.add_argument("--produtos", type=int, default=60, help="Produtos buscados em ponta_a_ponta e imagens")
+    parser.add_argument("--imagens-por-produto", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--parse-workers", type=int, default=0,
+                        help="Processos de parse em ponta_a_ponta (0: parse nas threads de busca)")
+    parser.add_argument("--limitador", action="store_true",
+                        help="Manter o limite de taxa por host (padrão: desligado, para medir o scraper)")
+    parser.add_argument("--sintetico", action="store_true",
+                        help="Páginas geradas pelo servidor em vez das gravadas em data/fixtures/html")
+    parser.add_argument("--tamanho-imagem", type=int, default=50_000,
+                        help="Bytes de cada imagem servida quando não há imagens gravadas")
+    parser.add_argument("--latencia", type=float, default=0.02, help="Latência do servidor (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variação da latência (±s)")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="Fração de respostas 500")
+    parser.add_argument("--taxa-reset", type=float, default=0.0, help="Fração de conexões fechadas sem resposta")
+    parser.add_argument("--semente", type=int, default=42, help="Semente dos sorteios do servidor")
+    parser.add_argument("--saida", default=None, help="Arquivo JSON do resultado (padrão: data/bench/...)")
+    parser.add_argument("--comparar", default=None, help="Resultado anterior (JSON) para comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.10,
+                        help="Piora relativa aceita antes de acusar regressão (padrão: 0.10)")
+    parser.add_argument("--interno", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--parametros", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.interno:
+        executar_interno(args.interno, json.loads(args.parametros), args.base_url or None)
+        return
+
+    escolhidos = [b.strip() for b in args.benchmarks.split(",") if b.strip()]
+    desconhecidos = set(escolhidos) - set(BENCHMARKS)
+    if desconhecidos:
+        parser.error(f"Benchmarks desconhecidos: {', '.join(sorted(desconhecidos))}")
+
+    parametros = {
+        "repeticoes": args.repeticoes, "produtos": args.produtos, "imagens_por_produto": args.imagens_por_produto,
+        "workers": args.workers, "parse_workers": args.parse_workers, "limitador": args.limitador,
+    }
+    servidor = {
+        "latencia": args.latencia, "jitter": args.jitter, "taxa_erro": args.taxa_erro,
+        "taxa_reset": args.taxa_reset, "corpus": not args.sintetico, "tamanho_imagem": args.tamanho_imagem,
+        "n_imagens": args.imagens_por_produto, "semente": args.semente,
+    }
+    commit, sujo = identificar_commit()
+    print(f"🚀 Benchmarks em {commit}{' (com alterações locais)' if sujo else ''}: {', '.join(escolhidos)}")
+
+    resultados = {}
+    for nome in escolhidos:
+        rodadas = []
+        for _ in range(max(1, args.rodadas)):
+            if nome == "parse":
+                rodadas.append(executar_isolado(nome, parametros, None))
+                continue
+            with servidor_em_processo(**servidor) as (base_url, contagens):
+                rodada = executar_isolado(nome, parametros, base_url)
+            rodada["servidor"] = {chave: contagens[chave] for chave in ("erros", "resets", "limitadas")}
+            rodadas.append(rodada)
+        resultados[nome] = r = mediana_rodadas(rodadas)
+        destaque = {"parse": f"{r.get('ms_mediana')} ms/página (p95 {r.get('ms_p95')} ms)",
+                    "ponta_a_ponta": f"{r.get('paginas_s')} páginas/s, {r.get('falhas')} falhas",
+                    "imagens": f"{r.get('imagens_s')} imagens/s, {r.get('mb_s')} MB/s"}[nome]
+        print(f"   {nome:<14} {destaque} | RSS {r.get('rss_pico_mb', '?')} MB "
+              f"(filhos {r.get('rss_pico_filhos_mb', '?')} MB)")
+
+    documento = {
+        "versao": 1,
+        "commit": commit,
+        "alteracoes_locais": sujo,
+        "quando": datetime.now().isoformat(timespec="seconds"),
+        "maquina": maquina(),
+        "parametros": {**parametros, "servidor": servidor},
+        "resultados": resultados,
+    }
+    saida = Path(args.saida) if args.saida else PASTA_RESULTADOS / f"bench_{commit}_{datetime.now():%Y%m%d_%H%M%S}.json"
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_text(json.dumps(documento, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    print(f"💾 Resultado em {saida}")
+
+    if args.comparar:
+        anterior = json.loads(Path(args.comparar).read_text(encoding="utf-8"))
+        pioras = comparar(anterior, documento, args.tolerancia)
+        if pioras:
+            print(f"❌ Regressão acima de {args.tolerancia:.0%}: {', '.join(pioras)}")
+            sys.exit(1)
+        print("✅ Nenhuma regressão acima da tolerância")
+
+if __name__ == "__main__":
+    main()
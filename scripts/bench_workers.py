@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark de throughput do scraper em função do número de workers
+
+Roda processar_urls contra o servidor local de fixtures, sem acessar a internet.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import scraper
+from fixture_server import iniciar_servidor, urls_fixture
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de workers do scraper")
+    parser.add_argument("--produtos", type=int, default=40)
+    parser.add_argument("--workers", default="1,2,4,8", help="Lista de contagens de workers")
+    parser.add_argument("--latencia", type=float, default=0.2, help="Latência simulada do servidor (s)")
+    parser.add_argument("--parse-workers", default="0",
+                        help="Lista de processos de parse (0: parse nas threads de busca)")
+    args = parser.parse_args()
+
+    servidor, base_url = iniciar_servidor(latencia=args.latencia)
+    urls = urls_fixture(base_url, args.produtos)
+
+    print(f"🚀 Benchmark: {len(urls)} produtos, latência {args.latencia}s, servidor {base_url}")
+    print(f"{'workers':>8} {'parse':>6} {'tempo (s)':>10} {'páginas/s':>10} {'falhas':>7}")
+
+    contagens = [int(w) for w in args.workers.split(",")]
+    # Um único pool com páginas suficientes para a maior contagem de workers
+    scraper.render_config["paginas_por_browser"] = max(contagens)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Imagens, cache e índice de imagens no diretório temporário, longe de data/
+        scraper.output_folder = os.path.join(tmp, "imagens")
+        scraper.image_cache_folder = os.path.join(tmp, "cache")
+        scraper.image_index_db = os.path.join(tmp, "image_index.sqlite")
+        os.makedirs(scraper.output_folder, exist_ok=True)
+        for parse_workers in [int(p) for p in args.parse_workers.split(",")]:
+            for workers in contagens:
+                inicio = time.perf_counter()
+                produtos, falhas = scraper.processar_urls(urls, workers=workers, mostrar_progresso=False,
+                                                          parse_workers=parse_workers)
+                duracao = time.perf_counter() - inicio
+                print(f"{workers:>8} {parse_workers:>6} {duracao:>10.2f} {len(urls) / duracao:>10.2f} {len(falhas):>7}")
+        # Downloads em andamento terminam antes de o diretório temporário sumir
+        scraper.fechar_downloader()
+
+    scraper.fechar_render_pool()
+    servidor.shutdown()
+
+if __name__ == "__main__":
+    main()
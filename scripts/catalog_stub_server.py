@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Servidor local da API do catálogo com respostas gravadas
+
+Responde /api/catalogo/produtos?skus=1,2,3 com os produtos gravados em
+data/fixtures/api/produtos.json (os SKUs que não estão na gravação ficam de
+fora da resposta, como a API faz com SKUs desconhecidos). As demais rotas são
+as do servidor de fixtures (páginas /p/{sku}/{slug} e imagens), para testar o
+fallback para o HTML sem rede. URLs relativas de imagem na gravação são
+resolvidas contra o próprio servidor.
+
+A gravação versionada é sintética: saiu de --gerar, a partir das páginas do
+servidor de fixtures ("Produto Teste N Bosch"), no formato plano do
+data-sku-obj ({"sku", "name", "description", "price", "best": {"price"},
+"images": [caminhos relativos]}). Não é uma captura do endpoint real, cujo
+formato não é documentado; ela testa o lote, a conversão para a linha VTEX
+e o fallback, não a compatibilidade com a API da loja. Para isso, regrave com
+--gravar contra a API real.
+
+    # Servir a gravação
+    python scripts/catalog_stub_server.py
+    # Regravar a partir da API real, para os SKUs do CSV de entrada
+    python scripts/catalog_stub_server.py --gravar --api-url "https://.../produtos?skus={skus}"
+    # Gerar a gravação dos produtos do servidor de fixtures
+    python scripts/catalog_stub_server.py --gerar 20
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urljoin, urlparse
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(RAIZ / "scripts"))
+
+from fixture_server import FixtureHandler, urls_fixture
+
+GRAVACAO = RAIZ / "data" / "fixtures" / "api" / "produtos.json"
+ROTA_API = "/api/catalogo/produtos"
+
+def carregar_gravacao(caminho=GRAVACAO):
+    """Produtos gravados indexados por SKU"""
+    with open(caminho, encoding="utf-8") as f:
+        itens = json.load(f)
+    return {str(item.get("sku") or item.get("id")): item for item in itens}
+
+def item_fixture(url):
+    """Produto no formato da API com o mesmo conteúdo da página do servidor de fixtures"""
+    sku, slug = url.rstrip("/").split("/")[-2:]
+    nome = slug.replace("-", " ").title()
+    preco = 100 + (int(sku) % 900) + 0.90
+    return {
+        "sku": sku,
+        "name": nome,
+        "description": f"<p>{nome} com acabamento profissional. Características: alta durabilidade, garantia de fábrica\n"
+                       "  e especificações técnicas completas para uso em marcenaria e construção civil.</p>",
+        "price": preco,
+        "best": {"price": preco},
+        "images": [f"/cws.digital/produtos/{sku}_{i}.jpg" for i in range(1, 4)],
+    }
+
+class CatalogoHandler(FixtureHandler):
+    produtos = {}
+
+    def _atender(self):
+        rota = urlparse(self.path)
+        if rota.path.rstrip("/") != ROTA_API:
+            return super()._atender()
+        if self.latencia:
+            time.sleep(self.latencia)
+
+        base_url = f"http://{self.headers.get('Host')}"
+        skus = [s for s in ",".join(parse_qs(rota.query).get("skus", [])).split(",") if s]
+        resposta = []
+        for sku in skus:
+            item = self.produtos.get(sku)
+            if item:
+                item = dict(item, images=[urljoin(base_url, img) for img in item.get("images", [])])
+                resposta.append(item)
+        self._responder(200, json.dumps(resposta, ensure_ascii=False).encode("utf-8"),
+                        "application/json; charset=utf-8")
+
+def iniciar_servidor(host="127.0.0.1", porta=0, produtos=None, latencia=0.0, taxa_erro=0.0):
+    """Inicia o servidor em uma thread e retorna (servidor, base_url)"""
+    estado = {"lock": threading.Lock(), "em_andamento": 0, "limitadas": 0, "erros": 0}
+    handler = type("Handler", (CatalogoHandler,), {
+        "produtos": carregar_gravacao() if produtos is None else produtos,
+        "latencia": latencia, "taxa_erro": taxa_erro, "estado": estado,
+    })
+    servidor = ThreadingHTTPServer((host, porta), handler)
+    servidor.estado = estado
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://{host}:{servidor.server_address[1]}"
+
+def gravar(api_url, entrada, tamanho_lote, caminho=GRAVACAO):
+    """Grava as respostas da API real para os SKUs das URLs do CSV"""
+    import scraper
+    from discovery import ler_urls
+
+    urls = list(ler_urls(entrada))
+    skus = list(dict.fromkeys(scraper.sku_da_url(url) for url in urls))
+    itens = []
+    for i in range(0, len(skus), tamanho_lote):
+        dados = scraper.buscar_json(api_url.format(skus=",".join(skus[i:i + tamanho_lote])))
+        if isinstance(dados, dict):
+            dados = dados.get("produtos") or dados.get("products") or dados.get("items") or []
+        itens.extend(dados)
+        print(f"📥 Lote {i // tamanho_lote + 1}: {len(dados)} produtos")
+    salvar(itens, caminho)
+
+def salvar(itens, caminho=GRAVACAO):
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(itens, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    print(f"💾 {len(itens)} produtos gravados em {caminho}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local da API do catálogo")
+    parser.add_argument("--porta", type=int, default=8766)
+    parser.add_argument("--latencia", type=float, default=0.0, help="Atraso por requisição em segundos")
+    parser.add_argument("--gravar", action="store_true", help="Regravar as respostas a partir da API real")
+    parser.add_argument("--api-url", default=None, help="Endpoint real, com {skus} (obrigatório com --gravar)")
+    parser.add_argument("--input", default=str(RAIZ / "data" / "csv" / "produtos_link.csv"),
+                        help="CSV com as URLs cujos SKUs serão gravados")
+    parser.add_argument("--lote", type=int, default=50, help="SKUs por chamada ao gravar")
+    parser.add_argument("--gerar", type=int, default=0,
+                        help="Gravar N produtos com o conteúdo das páginas do servidor de fixtures")
+    args = parser.parse_args()
+
+    if args.gravar:
+        if not args.api_url or "{skus}" not in args.api_url:
+            print("❌ --gravar precisa de --api-url com {skus}")
+            sys.exit(1)
+        gravar(args.api_url, args.input, args.lote)
+        sys.exit(0)
+    if args.gerar:
+        salvar([item_fixture(url) for url in urls_fixture("http://fixture", args.gerar)])
+        sys.exit(0)
+
+    servidor, base_url = iniciar_servidor(porta=args.porta, latencia=args.latencia)
+    print(f"🚀 API do catálogo em {base_url}{ROTA_API}?skus={{skus}} (Ctrl+C para parar)")
+    print(f"📋 Exemplo: python scraper.py --fetch-mode api --api-url \"{base_url}{ROTA_API}?skus={{skus}}\"")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        servidor.shutdown()
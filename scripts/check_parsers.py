@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Confere se os backends de parse extraem exatamente o mesmo resultado
+
+Roda analisar_html com cada parser disponível (html.parser, lxml, selectolax)
+sobre as páginas salvas em data/fixtures/html e compara (produto, info) com o
+html.parser, que é a referência. Mostra também o tempo mediano por página.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(RAIZ / "scripts"))
+
+import scraper
+from extractor import PARSER_PADRAO, parsers_disponiveis
+from bench_parse import carregar_fixtures, medir
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara os backends de parse nas páginas salvas")
+    parser.add_argument("--repeticoes", type=int, default=10)
+    args = parser.parse_args()
+
+    fixtures = carregar_fixtures()
+    parsers = parsers_disponiveis()
+    tempos, resultados = {}, {}
+    for nome_parser in parsers:
+        analisar = lambda html, url, p=nome_parser: scraper.analisar_html(html, url, parser=p)
+        tempos[nome_parser], resultados[nome_parser] = medir(analisar, fixtures, args.repeticoes)
+
+    print(f"{'página':<28}" + "".join(f" {p + ' (ms)':>18}" for p in parsers))
+    divergencias = 0
+    for nome, _, _ in fixtures:
+        linha = f"{nome:<28}"
+        for p in parsers:
+            igual = resultados[p][nome] == resultados[PARSER_PADRAO][nome]
+            divergencias += not igual
+            linha += f" {tempos[p][nome]:>17.2f}{' ' if igual else '!'}"
+        print(linha)
+
+    if divergencias:
+        print(f"❌ {divergencias} resultados diferentes do {PARSER_PADRAO} (marcados com !)")
+        sys.exit(1)
+    print(f"✅ Mesmo resultado em {len(parsers)} parsers: {', '.join(parsers)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Confere o crawl distribuído de ponta a ponta, sem rede
+
+Sobe o servidor local da API do catálogo (que também serve as páginas e as
+imagens do servidor de fixtures), roda N workers do scraper.py em cada modo
+(--shard I/N, --queue com HTML e --queue com --fetch-mode api) e junta as
+pastas com o merge. Cada cenário precisa terminar dentro do prazo e sair com
+todos os SKUs da entrada; um worker travado (ex.: o lote da API maior que a
+janela de leases da fila) conta como falha. Tudo fica em um diretório
+temporário.
+
+    python scripts/check_shards.py
+    python scripts/check_shards.py --workers 3 --produtos 120
+"""
+
+import argparse
+import csv
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(RAIZ / "scripts"))
+
+from catalog_stub_server import iniciar_servidor, item_fixture, ROTA_API
+from fixture_server import urls_fixture
+from merge_shards import mesclar
+from run_shards import iniciar_workers
+
+def final_do_log(pasta_worker, linhas=5):
+    """Últimas linhas do worker.log (o diretório temporário some no fim)"""
+    with open(pasta_worker / "worker.log", encoding="utf-8", errors="replace") as f:
+        return "".join(f"      {linha}" for linha in f.readlines()[-linhas:])
+
+def rodar_cenario(nome, modo, extras, urls, pasta, workers, prazo):
+    """Roda os workers e o merge de um cenário; retorna a mensagem de erro ou None"""
+    pasta_shards = pasta / nome
+    fila = pasta_shards / "fila.sqlite"
+    inicio = time.time()
+    processos = iniciar_workers(workers, modo, fila, 60.0, extras, pasta=pasta_shards)
+    erro = None
+    for nome_worker, pasta_worker, processo in processos:
+        try:
+            codigo = processo.wait(timeout=max(1.0, prazo - (time.time() - inicio)))
+        except subprocess.TimeoutExpired:
+            processo.kill()
+            processo.wait()
+            erro = erro or f"{nome_worker} não terminou em {prazo:.0f}s:\n{final_do_log(pasta_worker)}"
+            continue
+        if codigo != 0:
+            erro = erro or f"{nome_worker} saiu com código {codigo}:\n{final_do_log(pasta_worker)}"
+    if erro:
+        return erro
+
+    saida = pasta_shards / "produtos.csv"
+    if mesclar([p for _, p, _ in processos], saida, fila if modo == "fila" else None, imagens=False) is None:
+        return "o merge não gerou a planilha"
+    with open(saida, encoding="utf-8-sig", newline="") as f:
+        skus = {linha["_IDSKU"] for linha in csv.DictReader(f)}
+    esperados = {item_fixture(url)["sku"] for url in urls}
+    if skus != esperados:
+        return f"{len(esperados - skus)} SKUs faltando e {len(skus - esperados)} a mais no merge"
+    print(f"   {nome}: {len(skus)} SKUs em {time.time() - inicio:.1f}s")
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Confere o crawl distribuído com o servidor local")
+    parser.add_argument("--workers", type=int, default=2, help="Processos do scraper por cenário")
+    parser.add_argument("--produtos", type=int, default=60,
+                        help="URLs na entrada (acima do lote padrão da API, 50, para exercitar o lote)")
+    parser.add_argument("--prazo", type=float, default=120.0, help="Tempo máximo (s) de cada cenário")
+    args = parser.parse_args()
+
+    urls = urls_fixture("http://fixture", args.produtos)
+    servidor, base_url = iniciar_servidor(produtos={item_fixture(url)["sku"]: item_fixture(url) for url in urls})
+    falhas = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        pasta = Path(tmp)
+        entrada = pasta / "entrada.csv"
+        with open(entrada, "w", encoding="utf-8", newline="") as f:
+            # ler_urls só aceita URLs da loja
+            f.writelines(["url\n"] + [f"{url.replace('http://fixture', base_url)}?leomadeiras.com.br\n" for url in urls])
+        comuns = ["--input", str(entrada), "--quiet"]
+        cenarios = [
+            ("hash", "hash", ["--fetch-mode", "http"]),
+            ("fila", "fila", ["--fetch-mode", "http"]),
+            # Padrões de --workers e --api-batch: o lote da API é maior que a janela de leases
+            ("fila_api", "fila", ["--fetch-mode", "api", "--api-url", f"{base_url}{ROTA_API}?skus={{skus}}"]),
+        ]
+        print(f"🧪 {len(cenarios)} cenários com {args.workers} workers e {len(urls)} URLs")
+        for nome, modo, extras in cenarios:
+            erro = rodar_cenario(nome, modo, comuns + extras, urls, pasta, args.workers, args.prazo)
+            if erro:
+                print(f"❌ {nome}: {erro}")
+                falhas += 1
+    servidor.shutdown()
+
+    if falhas:
+        print(f"❌ {falhas} cenários falharam")
+        sys.exit(1)
+    print("✅ Todos os cenários terminaram com todos os SKUs")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Servidor HTTP local que imita as páginas de produto da Leo Madeiras
+
+Usado nos benchmarks para medir o scraper sem acessar leomadeiras.com.br.
+Serve páginas em /p/{sku}/{slug} e imagens em /cws.digital/produtos/{sku}_{n}.jpg
+e, para a descoberta, um catálogo de `catalogo` produtos: /sitemap.xml (índice
+com um urlset comum e outro .xml.gz) e categorias paginadas em /c/{categoria}.
+Um em cada quatro produtos fica fora dos sitemaps e só aparece nas categorias.
+Com max_simultaneas, responde 429 + Retry-After quando há requisições demais
+em andamento, como o site faz sob carga; com taxa_erro, uma fração aleatória
+das requisições recebe 500 e, com taxa_reset, tem a conexão fechada sem
+resposta. jitter sorteia a latência de cada resposta em latencia ± jitter.
+
+Com corpus, as páginas de produto são as gravadas em data/fixtures/html (o
+SKU gravado trocado pelo pedido, as imagens apontando para este servidor) e
+as imagens, as gravadas em data/fixtures/imagens; sem imagens gravadas, cada
+uma é um JPEG de tamanho_imagem bytes com conteúdo próprio. --gravar monta o
+corpus a partir das páginas reais ou dos snapshots do arquivo de HTML.
+"""
+
+import argparse
+import gzip
+import html
+import json
+import mimetypes
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+RAIZ = Path(__file__).resolve().parent.parent
+PASTA_HTML = RAIZ / "data" / "fixtures" / "html"
+PASTA_IMAGENS = RAIZ / "data" / "fixtures" / "imagens"
+
+# JPEG mínimo (1x1) usado como corpo das imagens
+JPEG_1X1 = bytes.fromhex(
+    "ffd8ffe000104a46494600010100000100010000ffdb004300080606070605080707070909080a0c"
+    "140d0c0b0b0c1912130f141d1a1f1e1d1a1c1c20242e2720222c231c1c2837292c30313434341f27"
+    "393d38323c2e333432ffc0000b080001000101011100ffc4001f000001050101010101010000000000"
+    "0000000102030405060708090a0bffc400b5100002010303020403050504040000017d010203000411"
+    "05122131410613516107227114328191a1082342b1c11552d1f02433627282090a161718191a252627"
+    "28292a3435363738393a434445464748494a535455565758595a636465666768696a737475767778797a"
+    "838485868788898a92939495969798999aa2a3a4a5a6a7a8a9aab2b3b4b5b6b7b8b9bac2c3c4c5c6c7c8"
+    "c9cad2d3d4d5d6d7d8d9dae1e2e3e4e5e6e7e8e9eaf1f2f3f4f5f6f7f8f9faffda0008010100003f00fb"
+    "d3ffd9"
+)
+
+def gerar_pagina_produto(sku, slug, base_url, n_imagens=3):
+    """Gera HTML de produto com os mesmos atributos usados por extrair_produto"""
+    nome = slug.replace("-", " ").title()
+    preco = 100 + (int(sku) % 900) + 0.90 if sku.isdigit() else 199.90
+    sku_obj = html.escape(json.dumps({"sku": sku, "price": preco, "best": {"price": preco}}))
+    imagens = "\n".join(
+        f'<div class="zoom" data-zoom-image="{base_url}/cws.digital/produtos/{sku}_{i}.jpg">'
+        f'<img class="zoomImg" src="{base_url}/cws.digital/produtos/{sku}_{i}.jpg"></div>'
+        for i in range(1, n_imagens + 1)
+    )
+    # Conteúdo de preenchimento para aproximar o tamanho de uma página real
+    vitrine = "\n".join(
+        f'<li class="shelf-item"><a href="/p/{i}/item-{i}"><img src="/static/thumb-{i}.png">'
+        f'<span class="name">Produto relacionado {i}</span><span class="price">R$ {i},90</span></a></li>'
+        for i in range(1, 120)
+    )
+    return f"""<!DOCTYPE html>
+<html lang="pt-BR"><head><meta charset="utf-8"><title>{nome} | Leo Madeiras</title></head>
+<body>
+<nav><span>Onde você está?</span><a href="/">Home</a></nav>
+<div class="product-name"><h1>{nome}</h1></div>
+<div class="product-images">{imagens}</div>
+<div class="product-price" data-price="{preco:.2f}">R$ {preco:.2f}</div>
+<div data-sku-obj="{sku_obj}"></div>
+<div class="product-description">
+  <p>{nome} com acabamento profissional. Características: alta durabilidade, garantia de fábrica
+  e especificações técnicas completas para uso em marcenaria e construção civil.</p>
+</div>
+<ul class="shelf">{vitrine}</ul>
+</body></html>"""
+
+def imagem_sintetica(caminho, tamanho=0):
+    """JPEG_1X1 seguido do caminho e de preenchimento até tamanho bytes (conteúdo único por caminho)"""
+    corpo = JPEG_1X1 + caminho.encode("utf-8")
+    return corpo + bytes(max(0, tamanho - len(corpo)))
+
+# Host das imagens nas páginas gravadas (com ou sem esquema)
+RE_HOST_IMAGENS = re.compile(r"(?:https?:)?//images\.cws\.digital/")
+
+class Corpus:
+    """Páginas e imagens gravadas servidas no lugar das geradas"""
+
+    def __init__(self, pasta_html=PASTA_HTML, pasta_imagens=PASTA_IMAGENS):
+        indice = json.loads((pasta_html / "index.json").read_text(encoding="utf-8"))
+        # (sku gravado, html) de cada página, em ordem estável
+        self.paginas = []
+        for nome, url in sorted(indice.items()):
+            sku = urlparse(url).path.rstrip("/").split("/")[-2]
+            self.paginas.append((sku, (pasta_html / nome).read_text(encoding="utf-8")))
+        if not self.paginas:
+            raise ValueError(f"Nenhuma página gravada em {pasta_html}")
+        self.imagens = sorted(c for c in pasta_imagens.glob("*") if c.is_file()) if pasta_imagens.is_dir() else []
+        self._bytes = {}
+
+    def pagina(self, sku, base_url):
+        """Página gravada para o SKU (escolhida pelo SKU, sempre a mesma)"""
+        sku_gravado, pagina = self.paginas[zlib.crc32(sku.encode()) % len(self.paginas)]
+        return RE_HOST_IMAGENS.sub(f"{base_url}/cws.digital/", pagina.replace(sku_gravado, sku))
+
+    def imagem(self, caminho):
+        """(bytes, content type) de uma imagem gravada escolhida pelo caminho, ou None"""
+        if not self.imagens:
+            return None
+        arquivo = self.imagens[zlib.crc32(caminho.encode()) % len(self.imagens)]
+        if arquivo not in self._bytes:
+            self._bytes[arquivo] = arquivo.read_bytes()
+        return self._bytes[arquivo], mimetypes.guess_type(arquivo.name)[0] or "application/octet-stream"
+
+CATEGORIAS = ("ferramentas", "madeiras", "ferragens")
+POR_PAGINA = 12
+
+def gerar_sitemap(locs, indice=False):
+    """XML de um sitemap (urlset) ou de um índice de sitemaps"""
+    raiz, item = ("sitemapindex", "sitemap") if indice else ("urlset", "url")
+    itens = "\n".join(f"  <{item}><loc>{html.escape(loc)}</loc></{item}>" for loc in locs)
+    return (f'<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<{raiz} xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n{itens}\n</{raiz}>\n')
+
+def gerar_pagina_categoria(categoria, pagina, produtos, base_url):
+    """Listagem paginada com os produtos da categoria (cada produto linkado duas vezes)"""
+    inicio = (pagina - 1) * POR_PAGINA
+    itens = "\n".join(
+        f'<li><a href="{url[len(base_url):]}#wrapper"><img src="/static/{i}.png"></a>'
+        f'<a href="{url}">Produto {i}</a></li>'
+        for i, url in produtos[inicio:inicio + POR_PAGINA]
+    )
+    proxima = (f'<a class="next" href="/c/{categoria}?page={pagina + 1}">Próxima</a>'
+               if inicio + POR_PAGINA < len(produtos) else "")
+    menu = " ".join(f'<a href="/c/{c}">{c.title()}</a>' for c in CATEGORIAS)
+    return f"""<!DOCTYPE html>
+<html lang="pt-BR"><head><meta charset="utf-8"><title>{categoria.title()} | Leo Madeiras</title></head>
+<body>
+<nav>{menu} <a href="/institucional/sobre">Sobre</a></nav>
+<ul class="vitrine">{itens}</ul>
+<div class="paginacao">{proxima}</div>
+</body></html>"""
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    latencia = 0.0
+    jitter = 0.0
+    n_imagens = 3
+    catalogo = 100
+    max_simultaneas = 0
+    taxa_erro = 0.0
+    taxa_reset = 0.0
+    retry_after = 1
+    corpus = None
+    tamanho_imagem = 0
+    aleatorio = random
+    estado = None  # {"lock", "em_andamento", "limitadas", "erros", ...} compartilhado pelas requisições
+
+    def log_message(self, format, *args):
+        pass
+
+    def _responder(self, status, corpo, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(corpo)))
+        for nome, valor in (headers or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self):
+        estado = self.estado
+        with estado["lock"]:
+            estado["em_andamento"] += 1
+            sobrecarga = self.max_simultaneas and estado["em_andamento"] > self.max_simultaneas
+            if sobrecarga:
+                estado["limitadas"] += 1
+        try:
+            if sobrecarga:
+                self._responder(429, b"too many requests", "text/plain",
+                                {"Retry-After": str(self.retry_after)})
+            elif self.taxa_erro and self.aleatorio.random() < self.taxa_erro:
+                with estado["lock"]:
+                    estado["erros"] += 1
+                self._responder(500, b"internal error", "text/plain")
+            elif self.taxa_reset and self.aleatorio.random() < self.taxa_reset:
+                # Fecha sem responder: o cliente vê a conexão cair
+                with estado["lock"]:
+                    estado["resets"] = estado.get("resets", 0) + 1
+                self.close_connection = True
+            else:
+                self._atender()
+        finally:
+            with estado["lock"]:
+                estado["em_andamento"] -= 1
+
+    def _atender(self):
+        if self.latencia or self.jitter:
+            time.sleep(max(0.0, self.latencia + self.aleatorio.uniform(-self.jitter, self.jitter)))
+
+        partes = self.path.split("#")[0].split("?")[0].strip("/").split("/")
+        if len(partes) >= 3 and partes[0] == "p":
+            base_url = f"http://{self.headers.get('Host')}"
+            if self.corpus is not None:
+                pagina = self.corpus.pagina(partes[1], base_url)
+            else:
+                pagina = gerar_pagina_produto(partes[1], partes[2], base_url, self.n_imagens)
+            self._responder(200, pagina.encode("utf-8"), "text/html; charset=utf-8")
+        elif partes and partes[0].startswith("sitemap"):
+            self._sitemap(partes[0])
+        elif len(partes) >= 2 and partes[0] == "c" and partes[1] in CATEGORIAS:
+            base_url = f"http://{self.headers.get('Host')}"
+            k = CATEGORIAS.index(partes[1])
+            produtos = [(i, url) for i, url in enumerate(urls_fixture(base_url, self.catalogo)) if i % 3 == k]
+            pagina = int(parse_qs(urlparse(self.path).query).get("page", ["1"])[0])
+            corpo = gerar_pagina_categoria(partes[1], pagina, produtos, base_url)
+            self._responder(200, corpo.encode("utf-8"), "text/html; charset=utf-8")
+        elif partes and partes[0] == "cws.digital":
+            caminho = "/".join(partes[1:])
+            gravada = self.corpus.imagem(caminho) if self.corpus is not None else None
+            if gravada:
+                corpo, tipo = gravada
+            elif self.tamanho_imagem:
+                corpo, tipo = imagem_sintetica(caminho, self.tamanho_imagem), "image/jpeg"
+            else:
+                corpo, tipo = JPEG_1X1, "image/jpeg"
+            etag = f'"{zlib.crc32(corpo):08x}"'
+            if self.headers.get("If-None-Match") == etag:
+                self._responder(304, b"", tipo, {"ETag": etag})
+            else:
+                self._responder(200, corpo, tipo, {"ETag": etag})
+        else:
+            self._responder(404, b"not found", "text/plain")
+
+    def _sitemap(self, nome):
+        base_url = f"http://{self.headers.get('Host')}"
+        urls = urls_fixture(base_url, self.catalogo)
+        metade = len(urls) // 2
+        if nome == "sitemap.xml":
+            corpo = gerar_sitemap([f"{base_url}/sitemap-produtos-1.xml", f"{base_url}/sitemap-produtos-2.xml.gz"],
+                                  indice=True)
+        elif nome in ("sitemap-produtos-1.xml", "sitemap-produtos-2.xml.gz"):
+            parte = urls[:metade] if nome.endswith("1.xml") else urls[metade:]
+            inicio = 0 if nome.endswith("1.xml") else metade
+            corpo = gerar_sitemap([url for i, url in enumerate(parte, inicio) if i % 4 != 3])
+        else:
+            self._responder(404, b"not found", "text/plain")
+            return
+        if nome.endswith(".gz"):
+            self._responder(200, gzip.compress(corpo.encode("utf-8")), "application/x-gzip")
+        else:
+            self._responder(200, corpo.encode("utf-8"), "application/xml")
+
+def iniciar_servidor(host="127.0.0.1", porta=0, latencia=0.0, n_imagens=3, max_simultaneas=0,
+                     taxa_erro=0.0, catalogo=100, jitter=0.0, taxa_reset=0.0, corpus=None,
+                     tamanho_imagem=0, semente=None):
+    """
+    Inicia o servidor em uma thread e retorna (servidor, base_url)
+
+    servidor.estado conta as respostas 429 ("limitadas"), 500 ("erros") e as
+    conexões fechadas sem resposta ("resets"). corpus é um Corpus (ou True
+    para o das pastas padrão); semente torna os sorteios reproduzíveis.
+    """
+    if corpus is True:
+        corpus = Corpus()
+    elif not corpus:
+        corpus = None
+    estado = {"lock": threading.Lock(), "em_andamento": 0, "limitadas": 0, "erros": 0, "resets": 0}
+    handler = type("Handler", (FixtureHandler,), {"latencia": latencia, "jitter": jitter, "n_imagens": n_imagens,
+                                                   "catalogo": catalogo,
+                                                   "max_simultaneas": max_simultaneas,
+                                                   "taxa_erro": taxa_erro, "taxa_reset": taxa_reset,
+                                                   "corpus": corpus, "tamanho_imagem": tamanho_imagem,
+                                                   "aleatorio": random.Random(semente) if semente is not None else random,
+                                                   "estado": estado})
+    servidor = ThreadingHTTPServer((host, porta), handler)
+    servidor.estado = estado
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://{host}:{servidor.server_address[1]}"
+
+def urls_fixture(base_url, quantidade):
+    """Lista de URLs de produto servidas pelo servidor local"""
+    return [f"{base_url}/p/{10000000 + i}/produto-teste-{i}-bosch" for i in range(quantidade)]
+
+def gravar(paginas, n_imagens=2, pasta_html=PASTA_HTML, pasta_imagens=PASTA_IMAGENS):
+    """
+    Acrescenta ao corpus as páginas (url, html) e até n_imagens imagens de cada uma
+
+    As páginas entram no index.json como produto_{sku}.html; as imagens
+    (encontradas pela própria extração do scraper) são baixadas do site.
+    """
+    sys.path.insert(0, str(RAIZ))
+    import scraper
+
+    indice_caminho = pasta_html / "index.json"
+    indice = json.loads(indice_caminho.read_text(encoding="utf-8")) if indice_caminho.exists() else {}
+    pasta_html.mkdir(parents=True, exist_ok=True)
+    pasta_imagens.mkdir(parents=True, exist_ok=True)
+    gravadas = imagens = 0
+    for url, pagina in paginas:
+        produto, info = scraper.analisar_html(pagina, url)
+        sku = produto["_IDSKU"]
+        nome = f"produto_{sku}.html"
+        (pasta_html / nome).write_text(pagina, encoding="utf-8")
+        indice[nome] = url
+        gravadas += 1
+        for i, url_imagem in enumerate(info["imagens"][:n_imagens], 1):
+            extensao = Path(urlparse(url_imagem).path).suffix.lower() or ".jpg"
+            try:
+                r = scraper.http_get(url_imagem, timeout=30)
+                r.raise_for_status()
+            except Exception as e:
+                print(f"⚠️ Imagem não gravada {url_imagem}: {e}")
+                continue
+            (pasta_imagens / f"{sku}_{i}{extensao}").write_bytes(r.content)
+            imagens += 1
+    indice_caminho.write_text(json.dumps(indice, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    print(f"💾 {gravadas} páginas e {imagens} imagens gravadas em {pasta_html.parent} "
+          f"({len(indice)} páginas no corpus)")
+
+def paginas_do_site(entrada, limite=None):
+    """(url, html) buscados no site para as URLs do CSV"""
+    sys.path.insert(0, str(RAIZ))
+    import scraper
+    from discovery import ler_urls
+
+    for i, url in enumerate(ler_urls(entrada)):
+        if limite is not None and i >= limite:
+            break
+        yield url, scraper.buscar_html_estatico(url)
+
+def paginas_do_arquivo(pasta, limite=None):
+    """(url, html) dos snapshots mais recentes do arquivo de HTML do crawl (sem rede)"""
+    sys.path.insert(0, str(RAIZ))
+    from html_archive import ArquivoHTML, ler_snapshot
+
+    arquivo = ArquivoHTML(pasta)
+    snapshots = arquivo.ultimos()[:limite]
+    arquivo.close()
+    for url, _, _, caminho in snapshots:
+        yield url, ler_snapshot(caminho)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local de páginas de produto")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--latencia", type=float, default=0.0, help="Atraso por requisição em segundos")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variação sorteada da latência (±s)")
+    parser.add_argument("--max-simultaneas", type=int, default=0,
+                        help="Responder 429 acima deste número de requisições simultâneas (0: sem limite)")
+    parser.add_argument("--taxa-erro", type=float, default=0.0,
+                        help="Fração das requisições respondidas com 500")
+    parser.add_argument("--taxa-reset", type=float, default=0.0,
+                        help="Fração das requisições com a conexão fechada sem resposta")
+    parser.add_argument("--catalogo", type=int, default=100,
+                        help="Produtos listados nos sitemaps e categorias")
+    parser.add_argument("--corpus", action="store_true",
+                        help="Servir as páginas e imagens gravadas em data/fixtures no lugar das geradas")
+    parser.add_argument("--tamanho-imagem", type=int, default=0,
+                        help="Bytes de cada imagem gerada (sem imagens gravadas)")
+    parser.add_argument("--semente", type=int, default=None, help="Semente dos sorteios de latência e erros")
+    parser.add_argument("--gravar", action="store_true",
+                        help="Acrescentar ao corpus as páginas de --input (do site) ou de --archive")
+    parser.add_argument("--input", default=str(RAIZ / "data" / "csv" / "produtos_link.csv"),
+                        help="CSV com as URLs gravadas com --gravar")
+    parser.add_argument("--archive", default=None,
+                        help="Com --gravar, usar os snapshots desta pasta (ex.: data/archive/html) em vez do site")
+    parser.add_argument("--limite", type=int, default=None, help="Máximo de páginas gravadas")
+    parser.add_argument("--imagens", type=int, default=2, help="Imagens gravadas por página")
+    args = parser.parse_args()
+
+    if args.gravar:
+        paginas = (paginas_do_arquivo(args.archive, args.limite) if args.archive
+                   else paginas_do_site(args.input, args.limite))
+        gravar(paginas, args.imagens)
+        sys.exit(0)
+
+    servidor, base_url = iniciar_servidor(porta=args.porta, latencia=args.latencia, jitter=args.jitter,
+                                          max_simultaneas=args.max_simultaneas, taxa_erro=args.taxa_erro,
+                                          taxa_reset=args.taxa_reset, catalogo=args.catalogo,
+                                          corpus=args.corpus, tamanho_imagem=args.tamanho_imagem,
+                                          semente=args.semente)
+    print(f"🚀 Servidor de fixtures em {base_url} (Ctrl+C para parar)")
+    print(f"📋 Exemplo: {urls_fixture(base_url, 1)[0]}")
+    print(f"🗺️ Descoberta: {base_url}/sitemap.xml e {base_url}/c/{CATEGORIAS[0]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        servidor.shutdown()
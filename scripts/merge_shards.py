@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Junta as pastas dos workers do modo distribuído na exportação final
+
+Cada worker (scraper.py --shard I/N ou --queue) grava em data/shards/<worker>
+a própria planilha, as imagens e o índice de imagens. Este script:
+
+- junta as planilhas em data/exports/produtos_leo_madeiras.csv, uma linha por
+  _IDSKU. Se o mesmo SKU saiu de mais de um worker (lease vencida e
+  reprocessada, ou execuções repetidas), fica a linha do worker que concluiu
+  o item na fila; sem fila, a da planilha mais recente;
+- liga (hard link, ou cópia entre discos) as imagens do worker escolhido para
+  cada SKU em data/exports/imagens_produtos e as registra no índice de
+  imagens principal;
+- regenera o CSV de imagens (imagens_leo_madeiras.csv) a partir do índice,
+  como scripts/upload_images_git.py --so-csv;
+- com --delta, compara as linhas juntadas com a última exportação
+  (data/state/snapshot.sqlite) e grava o delta, como scraper.py --delta.
+  SKUs ausentes só contam como removidos se todos os workers deixaram o
+  marcador de conclusão limpo (terminou, sem falhas), todos os shards I/N
+  de 1 a N estão presentes e a fila não tem itens restantes nem com falha;
+  senão o delta sai parcial.
+
+    python scripts/merge_shards.py
+    python scripts/merge_shards.py data/shards/shard_1de2 data/shards/shard_2de2
+    python scripts/merge_shards.py --fila data/shards/fila.sqlite --parquet
+    python scripts/merge_shards.py --delta --sem-completa
+"""
+
+import argparse
+import csv
+import os
+import shutil
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from change_detection import SnapshotProdutos, ExportadorDelta
+from image_index import IndiceImagens, RE_ARQUIVO, hash_arquivo
+from stream_writer import ExportadorStream
+from work_queue import FilaTrabalho, ler_marcador, parse_shard, MARCADOR
+from upload_images_git import criar_csv_imagens, INDICE_IMAGENS, PASTA_IMAGENS, PASTA_PROCESSADAS
+
+PASTA_SHARDS = RAIZ / "data" / "shards"
+SAIDA = RAIZ / "data" / "exports" / "produtos_leo_madeiras.csv"
+SNAPSHOT = RAIZ / "data" / "state" / "snapshot.sqlite"
+
+def pastas_shard(raiz=PASTA_SHARDS):
+    """Pastas de worker (com produtos.csv ou o marcador de conclusão) dentro de raiz"""
+    raiz = Path(raiz)
+    if not raiz.is_dir():
+        return []
+    return sorted(p for p in raiz.iterdir() if (p / "produtos.csv").is_file() or (p / MARCADOR).is_file())
+
+def problemas_cobertura(pastas):
+    """
+    Motivos para o conjunto de pastas não cobrir o catálogo todo ([] se cobre)
+
+    Cada worker precisa ter deixado o marcador limpo (terminou, sem falhas,
+    sem entrada parcial). No modo --shard, todos os shards de 1 a N do mesmo
+    N precisam estar entre as pastas.
+    """
+    problemas, shards = [], {}
+    for pasta in pastas:
+        marcador = ler_marcador(pasta)
+        if marcador is None:
+            problemas.append(f"{pasta.name}: sem marcador de conclusão (worker não terminou)")
+            continue
+        if not marcador.get("terminou"):
+            problemas.append(f"{pasta.name}: execução interrompida")
+        elif marcador.get("falhas"):
+            problemas.append(f"{pasta.name}: {marcador['falhas']} URLs falharam")
+        elif marcador.get("parcial"):
+            problemas.append(f"{pasta.name}: entrada parcial (descoberta incompleta, --only-new etc.)")
+        if marcador.get("shard"):
+            try:
+                indice, total = parse_shard(marcador["shard"])
+            except ValueError:
+                problemas.append(f"{pasta.name}: shard inválido no marcador ({marcador['shard']!r})")
+                continue
+            shards.setdefault(total, set()).add(indice)
+    if len(shards) > 1:
+        problemas.append(f"shards de divisões diferentes: N = {', '.join(map(str, sorted(shards)))}")
+    for total, indices in shards.items():
+        faltando = [str(i + 1) for i in range(total) if i not in indices]
+        if faltando:
+            problemas.append(f"faltam os shards {', '.join(faltando)} de {total}")
+    return problemas
+
+def ligar(origem, destino):
+    """Hard link de origem em destino (cópia se estiverem em discos diferentes); substitui o que houver"""
+    if destino.exists() and os.path.samefile(origem, destino):
+        return
+    temporario = destino.with_name(destino.name + ".part")
+    if temporario.exists():
+        temporario.unlink()
+    try:
+        os.link(origem, temporario)
+    except OSError:
+        shutil.copy2(origem, temporario)
+    os.replace(temporario, destino)
+
+def escolher_linhas(pastas, donos):
+    """
+    {sku: (pasta, linha)} com uma linha por SKU, mais as colunas e o número de duplicatas
+
+    Vale a linha do dono do SKU na fila; entre as demais, a da planilha mais
+    recente (e, na mesma planilha, a última).
+    """
+    escolhidas, colunas, duplicadas = {}, [], 0
+    # Worker sem URLs no shard termina sem planilha, só com o marcador
+    pastas = [p for p in pastas if (p / "produtos.csv").is_file()]
+    for pasta in sorted(pastas, key=lambda p: (p / "produtos.csv").stat().st_mtime):
+        with open(pasta / "produtos.csv", encoding="utf-8-sig", newline="") as f:
+            leitor = csv.DictReader(f)
+            colunas += [c for c in leitor.fieldnames or [] if c not in colunas]
+            for linha in leitor:
+                sku = linha.get("_IDSKU")
+                if not sku:
+                    continue
+                atual = escolhidas.get(sku)
+                if atual is not None:
+                    duplicadas += 1
+                    dono = donos.get(sku)
+                    if dono and atual[0].name == dono and pasta.name != dono:
+                        continue
+                escolhidas[sku] = (pasta, linha)
+    return escolhidas, colunas, duplicadas
+
+def mesclar_imagens(escolhidas, pastas, indice, destino=PASTA_IMAGENS, destino_processadas=PASTA_PROCESSADAS):
+    """Liga as imagens do worker escolhido para cada SKU e as registra no índice; retorna (imagens, processadas)"""
+    destino, destino_processadas = Path(destino), Path(destino_processadas)
+    destino.mkdir(parents=True, exist_ok=True)
+    imagens = processadas = 0
+    for pasta in pastas:
+        caminho_indice = pasta / "image_index.sqlite"
+        if not caminho_indice.is_file():
+            continue
+        indice_shard = IndiceImagens(caminho_indice)
+        try:
+            registros, totais = indice_shard.registros(), indice_shard.totais()
+        finally:
+            indice_shard.close()
+        for sku, total in totais.items():
+            if sku in escolhidas and escolhidas[sku][0] == pasta:
+                indice.definir_total(sku, total)
+        # Worker derrubado antes do commit do índice: as imagens do SKU vêm de _ImagensSalvas
+        indexados = {registro[0] for registro in registros}
+        for sku, (pasta_sku, linha) in escolhidas.items():
+            if pasta_sku != pasta or sku in indexados:
+                continue
+            for nome in filter(None, linha.get("_ImagensSalvas", "").split(";")):
+                match = RE_ARQUIVO.match(nome)
+                origem = pasta / "imagens" / (os.path.splitext(nome)[0] + ".jpg")
+                if match and origem.is_file():
+                    registros.append((sku, int(match.group(2)), origem.name, hash_arquivo(origem),
+                                      origem.stat().st_size, None, None))
+        for sku, posicao, arquivo, hash_conteudo, tamanho, url, processada in registros:
+            if sku not in escolhidas or escolhidas[sku][0] != pasta:
+                continue
+            origem = pasta / "imagens" / arquivo
+            if not origem.is_file():
+                continue
+            ligar(origem, destino / arquivo)
+            indice.registrar(sku, posicao, arquivo, hash_conteudo, tamanho, url)
+            imagens += 1
+            origem_processadas = pasta / "imagens_processadas"
+            if processada and (origem_processadas / processada).is_file():
+                destino_processadas.mkdir(parents=True, exist_ok=True)
+                ligar(origem_processadas / processada, destino_processadas / processada)
+                # Miniaturas em miniaturas/{lado}/{nome}, como o ProcessadorImagens grava
+                for miniatura in origem_processadas.glob(f"miniaturas/*/{processada}"):
+                    lado = miniatura.parent.name
+                    (destino_processadas / "miniaturas" / lado).mkdir(parents=True, exist_ok=True)
+                    ligar(miniatura, destino_processadas / "miniaturas" / lado / processada)
+                indice.marcar_processada(arquivo, processada)
+                processadas += 1
+    indice.sincronizar()
+    return imagens, processadas
+
+def mesclar(pastas, saida=SAIDA, fila=None, parquet=None, imagens=True, manifesto=True,
+            delta=None, delta_parcial=False, completa=True, snapshot=SNAPSHOT):
+    """
+    Junta as pastas dos workers; retorna o caminho da planilha (ou do delta) ou None
+
+    delta é o caminho do delta (None: sem delta). Com delta_parcial, com a
+    fila incompleta ou com falhas, ou sem a cobertura completa dos workers
+    (problemas_cobertura), SKUs que não apareceram não contam como removidos.
+    """
+    pastas = [Path(p) for p in pastas]
+    donos = {}
+    if fila and Path(fila).is_file():
+        fila_trabalho = FilaTrabalho(str(fila))
+        donos = fila_trabalho.donos()
+        r = fila_trabalho.resumo()
+        fila_trabalho.close()
+        print(f"📬 Fila: {r['concluido']} concluídas, {r['falhou']} falharam, "
+              f"{r['pendente'] + r['em_andamento']} restantes")
+        if r["pendente"] + r["em_andamento"]:
+            print("⚠️ A fila ainda tem itens sem concluir: a exportação sai parcial")
+            delta_parcial = True
+        if r["falhou"]:
+            print(f"⚠️ {r['falhou']} itens da fila falharam: a exportação sai parcial")
+            delta_parcial = True
+    if delta:
+        problemas = problemas_cobertura(pastas)
+        for problema in problemas:
+            print(f"⚠️ {problema}")
+        if problemas and not delta_parcial:
+            print("⚠️ Os workers não cobriram o catálogo todo: SKUs ausentes não contam como removidos")
+            delta_parcial = True
+
+    escolhidas, colunas, duplicadas = escolher_linhas(pastas, donos)
+    if not escolhidas:
+        print("❌ Nenhum produto nas pastas dos workers")
+        return None
+    for pasta in pastas:
+        print(f"   {pasta.name}: {sum(1 for p, _ in escolhidas.values() if p == pasta)} SKUs")
+
+    os.makedirs(Path(saida).parent, exist_ok=True)
+    exportador_delta = None
+    if delta:
+        exportador_delta = ExportadorDelta(SnapshotProdutos(str(snapshot)), str(delta),
+                                           os.path.splitext(delta)[0] + "_mudancas.csv", tamanho_lote=1000)
+    terminou = False
+    try:
+        with ExportadorStream(str(saida) if completa else None, parquet, tamanho_lote=1000) as exportador:
+            for _, linha in escolhidas.values():
+                produto = {coluna: linha.get(coluna, "") for coluna in colunas}
+                if exportador_delta is not None:
+                    exportador_delta.escrever(produto)
+                exportador.escrever(produto)
+        terminou = True
+    finally:
+        if exportador_delta is not None:
+            exportador_delta.close(confirmar=terminou, remover=terminou and not delta_parcial)
+            exportador_delta.snapshot.close()
+    if completa:
+        print(f"✅ Planilha salva: {saida} ({exportador.total} produtos"
+              + (f", {duplicadas} linhas duplicadas descartadas)" if duplicadas else ")"))
+        if parquet and exportador.caminho_parquet:
+            print(f"✅ Parquet salvo: {parquet}")
+    if exportador_delta is not None:
+        print(f"🔀 Delta salvo: {delta} ({exportador_delta.resumo()})")
+
+    if imagens:
+        indice = IndiceImagens(INDICE_IMAGENS)
+        try:
+            total_imagens, total_processadas = mesclar_imagens(escolhidas, pastas, indice)
+        finally:
+            indice.close()
+        print(f"🖼️ {total_imagens} imagens em {PASTA_IMAGENS}"
+              + (f" ({total_processadas} processadas em {PASTA_PROCESSADAS})" if total_processadas else ""))
+        if manifesto:
+            criar_csv_imagens(PASTA_IMAGENS)
+    return saida if completa else delta
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Junta as pastas dos workers na exportação final")
+    parser.add_argument("pastas", nargs="*", help=f"Pastas dos workers (padrão: todas em {PASTA_SHARDS})")
+    parser.add_argument("--fila", default=None,
+                        help="Fila do modo --queue, ex.: data/shards/fila.sqlite (decide qual linha fica quando um SKU se repete)")
+    parser.add_argument("--output", default=str(SAIDA), help="CSV final no formato VTEX")
+    parser.add_argument("--parquet", nargs="?", const=True, default=None,
+                        help="Gravar também em Parquet (padrão: mesmo nome do CSV com .parquet)")
+    parser.add_argument("--delta", nargs="?", const=True, default=None,
+                        help="Gravar também o delta contra a última exportação (padrão: mesmo nome do CSV com _delta.csv)")
+    parser.add_argument("--delta-parcial", action="store_true",
+                        help="Os workers cobriram só parte do catálogo: SKUs ausentes não contam como removidos")
+    parser.add_argument("--snapshot", default=str(SNAPSHOT), help="Referência do delta (a mesma do scraper.py)")
+    parser.add_argument("--sem-completa", action="store_true", help="Com --delta, não gravar a planilha completa")
+    parser.add_argument("--sem-imagens", action="store_true", help="Só a planilha, sem juntar as imagens")
+    parser.add_argument("--sem-csv-imagens", action="store_true", help="Não regenerar o CSV de imagens")
+    args = parser.parse_args()
+
+    pastas = args.pastas or pastas_shard()
+    if not pastas:
+        print(f"❌ Nenhuma pasta de worker em {PASTA_SHARDS}")
+        sys.exit(1)
+    if args.sem_completa and not args.delta:
+        print("❌ --sem-completa só faz sentido com --delta")
+        sys.exit(1)
+    parquet = args.parquet
+    if parquet is True:
+        parquet = os.path.splitext(args.output)[0] + ".parquet"
+    delta = args.delta
+    if delta is True:
+        delta = os.path.splitext(args.output)[0] + "_delta.csv"
+    print(f"🧩 Juntando {len(pastas)} pastas de workers...")
+    if mesclar(pastas, args.output, args.fila, parquet, not args.sem_imagens, not args.sem_csv_imagens,
+               delta, args.delta_parcial, not args.sem_completa, args.snapshot) is None:
+        sys.exit(1)
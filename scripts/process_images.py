@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Pós-processamento das imagens já baixadas
+
+Aplica às imagens de data/exports/imagens_produtos o mesmo estágio do
+scraper com --process-images (formato real, reencode, miniaturas, sem
+metadados) sem buscar nada, e mostra o tamanho antes e depois. Os originais
+não são alterados.
+
+    python scripts/process_images.py
+    python scripts/process_images.py --formato jpeg --qualidade 85 --miniaturas 600,300,120
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from image_processing import FORMATOS_SAIDA, ProcessadorImagens, Image
+from image_index import IndiceImagens
+
+EXTENSOES_ORIGEM = (".jpg", ".jpeg", ".png", ".webp", ".gif")
+INDICE_IMAGENS = RAIZ / "data" / "state" / "image_index.sqlite"
+
+def main():
+    parser = argparse.ArgumentParser(description="Pós-processamento das imagens baixadas")
+    parser.add_argument("--origem", default=str(RAIZ / "data" / "exports" / "imagens_produtos"))
+    parser.add_argument("--destino", default=str(RAIZ / "data" / "exports" / "imagens_processadas"))
+    parser.add_argument("--formato", choices=sorted(FORMATOS_SAIDA), default="webp")
+    parser.add_argument("--qualidade", type=int, default=82)
+    parser.add_argument("--miniaturas", default="300", help="Lados máximos separados por vírgula (vazio: nenhuma)")
+    parser.add_argument("--workers", type=int, default=0, help="Processos (0: um por núcleo)")
+    parser.add_argument("--forcar", action="store_true", help="Reprocessar mesmo as saídas atualizadas")
+    args = parser.parse_args()
+
+    if Image is None:
+        print("❌ Pillow não está instalado (pip install Pillow)")
+        sys.exit(1)
+    if not os.path.isdir(args.origem):
+        print(f"❌ Pasta de imagens não encontrada: {args.origem}")
+        sys.exit(1)
+    arquivos = sorted(os.path.join(args.origem, nome) for nome in os.listdir(args.origem)
+                      if nome.lower().endswith(EXTENSOES_ORIGEM))
+    if not arquivos:
+        print("❌ Nenhuma imagem para processar")
+        sys.exit(1)
+
+    miniaturas = [int(t) for t in args.miniaturas.split(",") if t.strip()]
+    print(f"🎨 Processando {len(arquivos)} imagens -> {args.destino} ({args.formato}, qualidade {args.qualidade}, "
+          f"miniaturas {miniaturas or 'nenhuma'})")
+    inicio = time.time()
+    with ProcessadorImagens(args.destino, args.formato, args.qualidade, miniaturas,
+                            args.workers or None, args.forcar) as processador:
+        saidas = processador.processar(arquivos)
+    duracao = time.time() - inicio
+
+    # Mantém o índice de imagens do scraper em dia para o manifesto das processadas
+    if INDICE_IMAGENS.exists():
+        indice = IndiceImagens(INDICE_IMAGENS)
+        for origem, saida in zip(arquivos, saidas):
+            if saida:
+                indice.marcar_processada(os.path.basename(origem), saida)
+        indice.close()
+
+    r = processador.resumo()
+    print(f"✅ {r['processadas']} processadas, {r['reaproveitadas']} reaproveitadas, "
+          f"{r['duplicadas']} duplicadas, {r['falhas']} falhas em {duracao:.1f}s")
+    if r["formatos"]:
+        print(f"🔎 Formato real dos originais: {', '.join(f'{f} {n}' for f, n in r['formatos'].items())} "
+              f"({r['extensao_errada']} com a extensão errada)")
+    if r["bytes_origem"]:
+        print(f"📦 {r['bytes_origem'] / 1e6:.2f} MB -> {r['bytes_saida'] / 1e6:.2f} MB "
+              f"({1 - r['bytes_saida'] / r['bytes_origem']:.0%} menor) + "
+              f"{r['bytes_miniaturas'] / 1e6:.2f} MB de miniaturas")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Roda o crawl distribuído com vários workers nesta máquina
+
+Inicia N processos do scraper.py, com shards fixos (--modo hash: --shard I/N)
+ou com a fila compartilhada (--modo fila: --queue, leases), espera todos
+terminarem e junta as pastas com scripts/merge_shards.py. A saída de cada
+worker vai para data/shards/<worker>/worker.log. Opções depois de -- são
+repassadas a todos os workers.
+
+    python scripts/run_shards.py --workers 4
+    python scripts/run_shards.py --workers 3 --modo fila --lease 60 -- --fetch-mode http --workers 2
+    # Derrubar um worker no meio (kill -9) e ver os outros assumirem as leases dele
+    python scripts/run_shards.py --workers 3 --modo fila --lease 20 --derrubar-apos 10
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from merge_shards import mesclar, PASTA_SHARDS, SAIDA
+from work_queue import MARCADOR
+
+def iniciar_workers(n, modo, fila, lease, extras, pasta=PASTA_SHARDS):
+    """[(nome, pasta, processo)] dos N workers, com a saída de cada um no worker.log da pasta"""
+    workers = []
+    for i in range(1, n + 1):
+        nome = f"shard_{i}de{n}" if modo == "hash" else f"worker_{i}"
+        pasta_worker = Path(pasta) / nome
+        pasta_worker.mkdir(parents=True, exist_ok=True)
+        # Planilha e marcador da execução anterior não entram no merge se este worker não gravar nada
+        (pasta_worker / "produtos.csv").unlink(missing_ok=True)
+        (pasta_worker / MARCADOR).unlink(missing_ok=True)
+        comando = [sys.executable, str(RAIZ / "scraper.py"), "--worker-id", nome,
+                   "--shard-dir", str(pasta_worker), "--progress", "log"]
+        comando += ["--shard", f"{i}/{n}"] if modo == "hash" else ["--queue", str(fila), "--lease", str(lease)]
+        with open(pasta_worker / "worker.log", "w", encoding="utf-8") as saida:
+            processo = subprocess.Popen(comando + extras, cwd=RAIZ, stdout=saida, stderr=subprocess.STDOUT)
+        workers.append((nome, pasta_worker, processo))
+    return workers
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl distribuído com vários workers locais")
+    parser.add_argument("--workers", type=int, default=4, help="Processos do scraper")
+    parser.add_argument("--modo", choices=("hash", "fila"), default="hash",
+                        help="hash: cada worker com um shard fixo de SKUs; fila: fila compartilhada com leases")
+    parser.add_argument("--fila", default=str(PASTA_SHARDS / "fila.sqlite"), help="Fila do modo fila")
+    parser.add_argument("--continuar", action="store_true",
+                        help="Modo fila: continuar a fila existente em vez de começar uma nova")
+    parser.add_argument("--lease", type=float, default=300.0, help="Validade (s) das leases no modo fila")
+    parser.add_argument("--derrubar-apos", type=float, default=None, metavar="SEGUNDOS",
+                        help="Matar o primeiro worker (SIGKILL) depois desse tempo, para testar a recuperação")
+    parser.add_argument("--output", default=str(SAIDA), help="CSV final no formato VTEX")
+    parser.add_argument("--delta", action="store_true",
+                        help="No merge, gravar também o delta contra a última exportação (merge_shards.py --delta)")
+    parser.add_argument("--sem-merge", action="store_true", help="Só rodar os workers")
+    args, extras = parser.parse_known_args()
+    extras = [e for e in extras if e != "--"]
+
+    fila = Path(args.fila)
+    if args.modo == "fila" and not args.continuar:
+        for sufixo in ("", "-wal", "-shm"):
+            Path(str(fila) + sufixo).unlink(missing_ok=True)
+
+    print(f"🚀 Iniciando {args.workers} workers (modo {args.modo})...")
+    inicio = time.time()
+    workers = iniciar_workers(args.workers, args.modo, fila, args.lease, extras)
+    if args.derrubar_apos is not None:
+        time.sleep(args.derrubar_apos)
+        nome, _, processo = workers[0]
+        if processo.poll() is None:
+            os.kill(processo.pid, signal.SIGKILL)
+            print(f"💥 {nome} derrubado depois de {args.derrubar_apos:.0f}s")
+    falhas = 0
+    for nome, pasta_worker, processo in workers:
+        codigo = processo.wait()
+        falhas += codigo != 0
+        print(f"   {nome}: {'ok' if codigo == 0 else f'saiu com código {codigo}'} (log em {pasta_worker / 'worker.log'})")
+    print(f"⏱️ Workers: {time.time() - inicio:.1f}s")
+
+    if args.sem_merge:
+        return
+    delta = os.path.splitext(args.output)[0] + "_delta.csv" if args.delta else None
+    mesclar([pasta for _, pasta, _ in workers], args.output, fila if args.modo == "fila" else None,
+            delta=delta, delta_parcial=falhas > 0)
+    if falhas and args.modo == "hash":
+        print(f"⚠️ {falhas} workers falharam: rode de novo os shards deles antes de publicar")
+
+if __name__ == "__main__":
+    main()
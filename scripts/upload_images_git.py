@@ -1,183 +1,327 @@
 #!/usr/bin/env python3
 """
 Script para criar CSV de imagens e fazer upload para o repositório da Leo Madeiras
+
+O upload é incremental: um clone parcial (bare, sem o conteúdo das imagens)
+fica em data/state/images_repo.git entre execuções, e só as imagens cujo
+hash de conteúdo difere do que já está no repositório são enviadas, em
+commits limitados por tamanho. Um cache (caminho, tamanho, mtime) -> hash
+evita reler as imagens que não mudaram, então o tempo de publicação acompanha
+o que mudou, não o tamanho do catálogo.
+
+    python scripts/upload_images_git.py
+    python scripts/upload_images_git.py --dry-run
+    # Testar contra um repositório bare local no lugar do GitHub
+    python scripts/upload_images_git.py --init-remote /tmp/images.git --repo file:///tmp/images.git
 """
 
+import argparse
+import hashlib
 import os
+import sqlite3
 import subprocess
-import shutil
-import pandas as pd
+import sys
 from pathlib import Path
 
-def criar_csv_imagens():
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from image_index import IndiceImagens
+
+REPO_URL = "https://github.com/thomas-ramirez/images-leomadeiras.git"
+BRANCH = "main"
+PASTA_IMAGENS = RAIZ / 'data' / 'exports' / 'imagens_produtos'
+PASTA_PROCESSADAS = RAIZ / 'data' / 'exports' / 'imagens_processadas'
+CLONE = RAIZ / 'data' / 'state' / 'images_repo.git'
+INDICE = RAIZ / 'data' / 'state' / 'upload_index.sqlite'
+INDICE_IMAGENS = RAIZ / 'data' / 'state' / 'image_index.sqlite'
+EXTENSOES = ('.jpg', '.jpeg', '.png', '.webp')
+
+def criar_csv_imagens(pasta=PASTA_IMAGENS, branch=BRANCH, verificar=False):
     """
-    Cria CSV com as imagens encontradas no formato especificado
+    Gera ou atualiza o CSV de imagens a partir do índice mantido pelo scraper
+
+    A pasta não é listada: as linhas vêm do índice (SKU, posição, arquivo), e o
+    CSV só é reescrito quando algo mudou. Imagens órfãs (posições que o produto
+    não tem mais) ficam de fora e são apontadas junto com as lacunas. Na
+    primeira execução, sem índice, as imagens já baixadas são importadas da pasta.
+    Com verificar=True, confere se cada arquivo do índice ainda existe.
     """
-    images_folder = Path.cwd() / 'data' / 'exports' / 'imagens_produtos'
-    
-    if not images_folder.exists():
+    pasta = Path(pasta)
+    if not pasta.exists():
         print("❌ Pasta de imagens não encontrada. Execute o scraper primeiro!")
         return None
     
-    # Buscar todas as imagens
-    image_files = [f for f in os.listdir(images_folder) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-    
-    if not image_files:
-        print("❌ Nenhuma imagem encontrada para processar. Execute o scraper primeiro!")
-        return None
-    
-    print(f"📸 Processando {len(image_files)} imagens encontradas...")
-    
-    # Agrupar imagens por SKU
-    imagens_por_sku = {}
-    for filename in image_files:
-        # Extrair SKU do nome do arquivo (formato: SKU_NUMERO.extensao)
-        if '_' in filename:
-            sku = filename.split('_')[0]
-            if sku not in imagens_por_sku:
-                imagens_por_sku[sku] = []
-            imagens_por_sku[sku].append(filename)
-    
-    # Criar dados para o CSV
-    dados_csv = []
-    
-    for sku, arquivos in imagens_por_sku.items():
-        # Ordenar arquivos por número
-        arquivos_ordenados = sorted(arquivos, key=lambda x: int(x.split('_')[1].split('.')[0]))
+    processadas = pasta.resolve() == PASTA_PROCESSADAS.resolve()
+    indice = IndiceImagens(INDICE_IMAGENS)
+    try:
+        if indice.total_imagens() == 0:
+            print("📂 Índice de imagens vazio: importando as imagens já baixadas (uma única vez)...")
+            importadas, ignoradas = indice.importar_pasta(PASTA_IMAGENS)
+            print(f"📥 {importadas} imagens importadas para {INDICE_IMAGENS}")
+            if ignoradas:
+                print(f"⚠️ {len(ignoradas)} arquivos fora do padrão {{sku}}_{{i}}.ext ignorados: {', '.join(ignoradas[:5])}")
+            if processadas:
+                indice.importar_processadas(pasta)
+        if indice.total_imagens() == 0:
+            print("❌ Nenhuma imagem encontrada para processar. Execute o scraper primeiro!")
+            return None
         
-        for i, arquivo in enumerate(arquivos_ordenados):
-            # Determinar se é a imagem principal (primeira)
-            is_main = (i == 0)
-            
-            # Gerar label e name baseado na posição
-            posicoes = ['primeira', 'segunda', 'terceira', 'quarta', 'quinta', 'sexta', 'sétima', 'oitava', 'nona', 'décima']
-            if i < len(posicoes):
-                label = posicoes[i]
-                name = posicoes[i]
-            else:
-                label = f"posição_{i+1}"
-                name = f"posição_{i+1}"
-            
-            # URL base do repositório da Leo Madeiras
-            url = f"https://raw.githubusercontent.com/thomas-ramirez/images-leomadeiras/main/{arquivo}"
-            
-            dados_csv.append({
-                'IDSKU': sku,
-                'IsMain': is_main,
-                'Label': label,
-                'Name': name,
-                'url': url
-            })
-    
-    # Criar DataFrame e salvar CSV
-    df_imagens = pd.DataFrame(dados_csv)
-    csv_path = Path.cwd() / 'data' / 'exports' / 'imagens_leo_madeiras.csv'
-    df_imagens.to_csv(csv_path, index=False, sep=',')
-    
-    print(f"✅ CSV criado com sucesso: {csv_path}")
-    print(f"📊 Total de registros: {len(dados_csv)}")
-    print(f"🏷️ SKUs processados: {len(imagens_por_sku)}")
-    
-    # Mostrar preview do CSV
-    print(f"\n📋 Preview do CSV criado:")
-    print(df_imagens.head(10).to_string(index=False))
+        csv_path = RAIZ / 'data' / 'exports' / 'imagens_leo_madeiras.csv'
+        url_base = f"https://raw.githubusercontent.com/thomas-ramirez/images-leomadeiras/{branch}/"
+        r = indice.gerar_manifesto(csv_path, url_base, processadas)
+        if r["modo"] == "inalterado":
+            print(f"✅ CSV já atualizado: {csv_path}")
+        elif r["modo"] == "acrescimo":
+            print(f"✅ CSV atualizado: {r['linhas']} linhas de {r['skus']} SKUs novos acrescentadas em {csv_path}")
+        else:
+            print(f"✅ CSV criado com sucesso: {csv_path} ({r['linhas']} registros)")
+        
+        orfas = indice.orfas()
+        if orfas:
+            print(f"👻 {len(orfas)} imagens órfãs (o produto tem menos imagens agora), fora do CSV: "
+                  f"{', '.join(arquivo for _, _, arquivo in orfas[:5])}{' ...' if len(orfas) > 5 else ''}")
+        lacunas = indice.lacunas(processadas)
+        if lacunas:
+            exemplos = ", ".join(f"{sku} ({', '.join(map(str, posicoes))})" for sku, posicoes in lacunas[:5])
+            print(f"🕳️ {len(lacunas)} SKUs com imagens faltando: {exemplos}{' ...' if len(lacunas) > 5 else ''}")
+        if verificar:
+            ausentes = indice.arquivos_ausentes(pasta, processadas)
+            print(f"🔎 {len(ausentes)} arquivos do índice não existem em {pasta}"
+                  + (f": {', '.join(ausentes[:5])}" if ausentes else ""))
+    finally:
+        indice.close()
     
     return csv_path
 
-def upload_images_git():
+def git(*args, repo=None, entrada=None, env=None):
+    """Executa git (no repositório bare `repo`, se informado) e retorna a saída"""
+    comando = ['git'] + (['--git-dir', str(repo)] if repo else []) + list(args)
+    resultado = subprocess.run(comando, input=entrada, capture_output=True, text=True, check=True,
+                               env={**os.environ, **(env or {})})
+    return resultado.stdout.strip()
+
+def hash_blob(caminho):
+    """Hash do objeto blob do git para o arquivo (o mesmo de git hash-object)"""
+    h = hashlib.sha1(f"blob {os.path.getsize(caminho)}\0".encode())
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+class CacheHashes:
+    """Hash de cada arquivo local, recalculado só quando tamanho, mtime ou inode mudam"""
+
+    def __init__(self, caminho):
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(caminho)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS arquivos (
+                caminho TEXT PRIMARY KEY,
+                tamanho INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                blob TEXT NOT NULL
+            )
+        """)
+        self.calculados = 0
+
+    def hash(self, caminho):
+        info = os.stat(caminho)
+        chave = (info.st_size, info.st_mtime_ns, info.st_ino)
+        linha = self._db.execute("SELECT tamanho, mtime_ns, inode, blob FROM arquivos WHERE caminho = ?",
+                                 (str(caminho),)).fetchone()
+        if linha and tuple(linha[:3]) == chave:
+            return linha[3]
+        blob = hash_blob(caminho)
+        self.calculados += 1
+        self._db.execute("INSERT OR REPLACE INTO arquivos VALUES (?, ?, ?, ?, ?)", (str(caminho), *chave, blob))
+        return blob
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+def criar_remoto_local(caminho, branch=BRANCH):
+    """Repositório bare com um commit inicial vazio, para testar o upload sem o GitHub"""
+    caminho = Path(caminho)
+    git('init', '--bare', '-q', '-b', branch, str(caminho))
+    # Permite clones parciais via file://, como o GitHub
+    git('config', 'uploadpack.allowFilter', 'true', repo=caminho)
+    arvore = git('mktree', repo=caminho, entrada='')
+    commit = git('commit-tree', arvore, '-m', 'Repositório de imagens', repo=caminho, env=_identidade(caminho))
+    git('update-ref', f'refs/heads/{branch}', commit, repo=caminho)
+    print(f"📦 Repositório bare local criado em {caminho}")
+
+def _identidade(repo):
+    """Autor padrão dos commits quando o git não tem user.name/user.email configurados"""
+    env = {}
+    for chave, variaveis, padrao in (('user.name', ('GIT_AUTHOR_NAME', 'GIT_COMMITTER_NAME'), 'Scraper Leo Madeiras'),
+                                     ('user.email', ('GIT_AUTHOR_EMAIL', 'GIT_COMMITTER_EMAIL'), 'scraper@localhost')):
+        try:
+            git('config', chave, repo=repo)
+        except subprocess.CalledProcessError:
+            env.update({v: padrao for v in variaveis})
+    return env
+
+def preparar_clone(repo_url, clone=CLONE, branch=BRANCH):
     """
-    Faz upload das imagens da Leo Madeiras usando Git
+    Clone parcial persistente (só commits e árvores) sincronizado com o remoto
+
+    Retorna o commit atual do branch remoto, ou None se o branch não existir.
     """
-    # Primeiro criar o CSV
-    csv_path = criar_csv_imagens()
-    if not csv_path:
+    if not (clone / 'HEAD').exists():
+        print(f"🔗 Criando clone parcial em {clone} (sem baixar as imagens)...")
+        clone.parent.mkdir(parents=True, exist_ok=True)
+        git('clone', '--bare', '--filter=blob:none', '-q', repo_url, str(clone))
+    else:
+        git('remote', 'set-url', 'origin', repo_url, repo=clone)
+        git('fetch', '-q', '--filter=blob:none', 'origin', f'+refs/heads/{branch}:refs/heads/{branch}', repo=clone)
+    try:
+        return git('rev-parse', '--verify', '-q', f'refs/heads/{branch}', repo=clone)
+    except subprocess.CalledProcessError:
+        return None
+
+def arvore_remota(clone, commit):
+    """{caminho: hash do blob} dos arquivos do commit (lido das árvores, sem baixar blobs)"""
+    if not commit:
+        return {}
+    arvore = {}
+    for linha in git('ls-tree', '-r', '-z', commit, repo=clone).split('\0'):
+        if linha:
+            meta, caminho = linha.split('\t', 1)
+            arvore[caminho] = meta.split()[2]
+    return arvore
+
+def arquivos_locais(pasta, extensoes=EXTENSOES):
+    """(caminho no repositório, caminho local) das imagens da pasta, incluindo subpastas como miniaturas/"""
+    for raiz, _, nomes in os.walk(pasta):
+        for nome in sorted(nomes):
+            if nome.lower().endswith(extensoes):
+                caminho = Path(raiz) / nome
+                yield caminho.relative_to(pasta).as_posix(), caminho
+
+def alteracoes(arquivos, remota, cache):
+    """Arquivos cujo conteúdo difere do que está no repositório: [(caminho no repo, local, blob, tamanho)]"""
+    mudancas = []
+    for relativo, caminho in arquivos:
+        blob = cache.hash(caminho)
+        if remota.get(relativo) != blob:
+            mudancas.append((relativo, caminho, blob, os.path.getsize(caminho)))
+    return mudancas
+
+def lotes(mudancas, max_bytes, max_arquivos):
+    """Divide as mudanças em lotes de no máximo max_bytes / max_arquivos (um arquivo maior vira um lote)"""
+    lote, tamanho = [], 0
+    for mudanca in mudancas:
+        if lote and (tamanho + mudanca[3] > max_bytes or len(lote) >= max_arquivos):
+            yield lote
+            lote, tamanho = [], 0
+        lote.append(mudanca)
+        tamanho += mudanca[3]
+    if lote:
+        yield lote
+
+def commitar_lote(clone, base, lote, mensagem):
+    """Cria um commit sobre base com os arquivos do lote, usando um índice temporário (sem working tree)"""
+    env = {'GIT_INDEX_FILE': str(clone / 'index-upload')}
+    if base:
+        git('read-tree', base, repo=clone, env=env)
+    else:
+        git('read-tree', '--empty', repo=clone, env=env)
+    blobs = git('hash-object', '-w', '--no-filters', '--stdin-paths', repo=clone,
+                entrada='\n'.join(str(caminho) for _, caminho, _, _ in lote) + '\n').split()
+    for (relativo, _, esperado, _), blob in zip(lote, blobs):
+        if blob != esperado:
+            raise RuntimeError(f"Hash divergente para {relativo}: {blob} != {esperado}")
+    git('update-index', '--add', '--index-info', repo=clone, env=env,
+        entrada=''.join(f"100644 {blob}\t{relativo}\n" for (relativo, _, _, _), blob in zip(lote, blobs)))
+    # --missing-ok: as imagens que já estão no remoto não existem no clone parcial (sem isso o git baixaria todas)
+    arvore = git('write-tree', '--missing-ok', repo=clone, env=env)
+    pais = ['-p', base] if base else []
+    return git('commit-tree', arvore, *pais, '-m', mensagem, repo=clone, env=_identidade(clone))
+
+def publicar(clone, base, mudancas, branch=BRANCH, max_bytes=50 << 20, max_arquivos=2000):
+    """Um commit + push por lote; retorna o último commit publicado"""
+    lista = list(lotes(mudancas, max_bytes, max_arquivos))
+    for i, lote in enumerate(lista, 1):
+        tamanho = sum(m[3] for m in lote)
+        commit = commitar_lote(clone, base, lote,
+                               f"🖼️ Update {len(lote)} product images ({i}/{len(lista)}) from Leo Madeiras scraper")
+        print(f"🚀 Lote {i}/{len(lista)}: {len(lote)} arquivos, {tamanho / 1e6:.1f} MB...")
+        git('push', '-q', 'origin', f'{commit}:refs/heads/{branch}', repo=clone)
+        git('update-ref', f'refs/heads/{branch}', commit, repo=clone)
+        base = commit
+    return base
+
+def upload_images_git(pasta=PASTA_IMAGENS, repo_url=REPO_URL, branch=BRANCH, clone=CLONE, max_mb=50,
+                      max_arquivos=2000, com_csv=True, dry_run=False):
+    """
+    Publica no repositório de imagens só o que mudou desde a última publicação
+    """
+    pasta = Path(pasta)
+    if not pasta.exists():
+        print("❌ Pasta de imagens não encontrada. Execute o scraper primeiro!")
         return
-    
-    # Configurações
-    repo_url = "https://github.com/thomas-ramirez/images-leomadeiras.git"
-    images_folder = Path.cwd() / 'data' / 'exports' / 'imagens_produtos'
-    temp_repo = Path.cwd() / 'temp_images_repo'
+    csv_path = criar_csv_imagens(pasta, branch) if com_csv else None
     
     try:
-        # Verificar se existem imagens para upload
-        image_files = [f for f in os.listdir(images_folder) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-        if not image_files:
-            print("❌ Nenhuma imagem encontrada para upload!")
-            return
-        
-        print(f"📸 Encontradas {len(image_files)} imagens para upload")
+        base = preparar_clone(repo_url, Path(clone), branch)
+        remota = arvore_remota(Path(clone), base)
+        print(f"📚 Repositório: {len(remota)} arquivos em {branch} ({base[:10] if base else 'vazio'})")
         
-        # Criar diretório temporário
-        if temp_repo.exists():
-            shutil.rmtree(temp_repo)
-        temp_repo.mkdir()
+        cache = CacheHashes(INDICE)
+        try:
+            arquivos = list(arquivos_locais(pasta))
+            if csv_path:
+                arquivos.append((Path(csv_path).name, Path(csv_path)))
+            mudancas = alteracoes(arquivos, remota, cache)
+        finally:
+            cache.close()
         
-        print(f"📁 Diretório temporário criado: {temp_repo}")
-        
-        # Clonar o repositório
-        print("🔗 Clonando repositório da Leo Madeiras...")
-        subprocess.run([
-            'git', 'clone', repo_url, str(temp_repo)
-        ], check=True)
-        
-        # Copiar imagens para o repositório
-        print("📁 Copiando imagens para o repositório...")
-        copied_count = 0
-        for filename in image_files:
-            src = images_folder / filename
-            dst = temp_repo / filename
-            shutil.copy2(src, dst)
-            copied_count += 1
-            print(f"  ✅ {filename} copiado")
-        
-        # Copiar o CSV também
-        csv_filename = csv_path.name
-        src_csv = csv_path
-        dst_csv = temp_repo / csv_filename
-        shutil.copy2(src_csv, dst_csv)
-        print(f"  ✅ {csv_filename} copiado")
-        
-        print(f"📊 {copied_count} imagens e 1 CSV copiados com sucesso")
-        
-        # Adicionar, commit e push
-        os.chdir(temp_repo)
-        
-        print("📝 Adicionando arquivos ao Git...")
-        subprocess.run(['git', 'add', '.'], check=True)
-        
-        print("💾 Fazendo commit...")
-        commit_message = f"🖼️ Add {copied_count} product images + CSV from Leo Madeiras scraper"
-        subprocess.run([
-            'git', 'commit', '-m', commit_message
-        ], check=True)
-        
-        print("🚀 Fazendo push para o GitHub...")
-        subprocess.run(['git', 'push', 'origin', 'main'], check=True)
-        
-        print(f"\n🎉 Upload concluído com sucesso!")
-        print(f"📊 Total de imagens enviadas: {copied_count}")
-        print(f"📋 CSV enviado: {csv_filename}")
-        print(f"🔗 Repositório: {repo_url}")
-        print(f"🔗 URLs base: https://raw.githubusercontent.com/thomas-ramirez/images-leomadeiras/main/")
-        print(f"📋 Exemplo de URL: https://raw.githubusercontent.com/thomas-ramirez/images-leomadeiras/main/10525549_1.jpg")
-        
-        # Mostrar lista das imagens enviadas
-        print(f"\n📸 Imagens enviadas:")
-        for filename in sorted(image_files):
-            print(f"  • {filename}")
+        print(f"🔎 {len(arquivos)} arquivos locais, {cache.calculados} hashes recalculados, "
+              f"{len(mudancas)} novos ou alterados ({sum(m[3] for m in mudancas) / 1e6:.1f} MB)")
+        if not mudancas:
+            print("✅ Nada a publicar: o repositório já está atualizado")
+            return
+        if dry_run:
+            for relativo, _, _, tamanho in mudancas[:20]:
+                print(f"  • {relativo} ({tamanho / 1e3:.0f} KB)")
+            if len(mudancas) > 20:
+                print(f"  ... e mais {len(mudancas) - 20}")
+            return
         
+        commit = publicar(Path(clone), base, mudancas, branch, max_mb << 20, max_arquivos)
+        print(f"\n🎉 Upload concluído: {len(mudancas)} arquivos publicados em {branch} ({commit[:10]})")
+        print(f"🔗 URLs base: https://raw.githubusercontent.com/thomas-ramirez/images-leomadeiras/{branch}/")
     except subprocess.CalledProcessError as e:
-        print(f"❌ Erro no Git: {e}")
+        print(f"❌ Erro no Git: {' '.join(e.cmd[:4])}...: {(e.stderr or '').strip()[:300]}")
         print("💡 Verifique se você tem acesso ao repositório e se o Git está configurado")
-    except Exception as e:
-        print(f"❌ Erro inesperado: {e}")
-    finally:
-        # Limpar diretório temporário
-        if temp_repo.exists():
-            shutil.rmtree(temp_repo)
-            print("🧹 Diretório temporário removido")
 
 if __name__ == "__main__":
-    print("🚀 Iniciando processamento de imagens da Leo Madeiras...")
-    print("=" * 70)
-    upload_images_git()
+    parser = argparse.ArgumentParser(description="Upload incremental das imagens para o repositório Git")
+    parser.add_argument("--pasta", default=str(PASTA_IMAGENS),
+                        help="Pasta publicada (ex.: data/exports/imagens_processadas)")
+    parser.add_argument("--repo", default=REPO_URL, help="URL do repositório de imagens")
+    parser.add_argument("--branch", default=BRANCH)
+    parser.add_argument("--clone", default=str(CLONE), help="Clone parcial persistente (bare)")
+    parser.add_argument("--lote-mb", type=int, default=50, help="Tamanho máximo de cada commit (MB)")
+    parser.add_argument("--lote-arquivos", type=int, default=2000, help="Arquivos por commit")
+    parser.add_argument("--sem-csv", action="store_true", help="Não gerar nem publicar o CSV de imagens")
+    parser.add_argument("--dry-run", action="store_true", help="Só mostrar o que seria publicado")
+    parser.add_argument("--so-csv", action="store_true", help="Só gerar o CSV de imagens, sem publicar")
+    parser.add_argument("--verificar", action="store_true",
+                        help="Conferir se os arquivos do índice de imagens ainda existem na pasta")
+    parser.add_argument("--init-remote", metavar="CAMINHO",
+                        help="Criar um repositório bare local para testes e sair")
+    args = parser.parse_args()
+    
+    if args.init_remote:
+        criar_remoto_local(args.init_remote, args.branch)
+    elif args.so_csv:
+        criar_csv_imagens(args.pasta, args.branch, args.verificar)
+    else:
+        print("🚀 Iniciando processamento de imagens da Leo Madeiras...")
+        print("=" * 70)
+        upload_images_git(args.pasta, args.repo, args.branch, args.clone, args.lote_mb, args.lote_arquivos,
+                          not args.sem_csv, args.dry_run)
@@ -0,0 +1,103 @@
+"""
+Exportação em streaming das linhas VTEX
+
+As linhas são gravadas em lotes à medida que os produtos ficam prontos, em vez
+de acumular tudo em memória para um único DataFrame no fim da execução. O CSV
+fica utilizável (parcialmente) durante o crawl; o Parquet, opcional, é
+fechado no final.
+"""
+
+import csv
+import logging
+import time
+from collections import Counter
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:
+    pa = None
+    pq = None
+
+log = logging.getLogger(__name__)
+
+class ExportadorStream:
+    """
+    Grava produtos em CSV (utf-8-sig) e opcionalmente Parquet, em lotes
+
+    Sem caminho_csv, só conta as linhas e as marcas (exportação completa desligada).
+    """
+
+    def __init__(self, caminho_csv, caminho_parquet=None, tamanho_lote=100, intervalo_flush=30.0):
+        self.caminho_csv = caminho_csv
+        self.caminho_parquet = caminho_parquet
+        self.tamanho_lote = max(1, int(tamanho_lote))
+        self.intervalo_flush = intervalo_flush
+
+        if caminho_parquet and pa is None:
+            log.warning("⚠️ pyarrow não disponível, Parquet não será gerado (pip install pyarrow)")
+            self.caminho_parquet = None
+
+        self.colunas = None
+        self._buffer = []
+        self._ultimo_flush = time.monotonic()
+        self._arquivo = None
+        self._csv = None
+        self._parquet = None
+        self._schema = None
+
+        # Estatísticas
+        self.total = 0
+        self.marcas = Counter()
+
+    def _abrir(self, primeira_linha):
+        self.colunas = list(primeira_linha.keys())
+        self._arquivo = open(self.caminho_csv, "w", encoding="utf-8-sig", newline="")
+        self._csv = csv.DictWriter(self._arquivo, fieldnames=self.colunas, lineterminator="\n",
+                                   extrasaction="ignore")
+        self._csv.writeheader()
+        if self.caminho_parquet:
+            self._schema = pa.schema([(coluna, pa.string()) for coluna in self.colunas])
+            self._parquet = pq.ParquetWriter(self.caminho_parquet, self._schema)
+
+    def escrever(self, produto):
+        self.total += 1
+        self.marcas[produto.get("_Marca", "")] += 1
+        if self.caminho_csv is None:
+            return
+        if self._arquivo is None:
+            self._abrir(produto)
+        self._buffer.append(produto)
+
+        if (len(self._buffer) >= self.tamanho_lote or
+                time.monotonic() - self._ultimo_flush >= self.intervalo_flush):
+            self.flush()
+
+    def flush(self):
+        """Grava o lote pendente no disco"""
+        self._ultimo_flush = time.monotonic()
+        if not self._buffer:
+            return
+
+        self._csv.writerows(self._buffer)
+        self._arquivo.flush()
+        if self._parquet is not None:
+            linhas = [{c: (None if p.get(c) is None else str(p.get(c))) for c in self.colunas}
+                      for p in self._buffer]
+            self._parquet.write_table(pa.Table.from_pylist(linhas, schema=self._schema))
+        self._buffer = []
+
+    def close(self):
+        if self._arquivo is None:
+            return
+        self.flush()
+        self._arquivo.close()
+        if self._parquet is not None:
+            self._parquet.close()
+        self._arquivo = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
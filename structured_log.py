@@ -0,0 +1,255 @@
+"""
+Logging estruturado do scraper
+
+As mensagens por produto (URL processada, estratégia que encontrou cada campo,
+imagens, retentativas) passam pelo logging com níveis, em vez de print: em
+DEBUG aparece o detalhe de cada extração, em INFO uma linha por produto e em
+WARNING (--quiet) só o que precisa de atenção. As chamadas abaixo do nível
+configurado custam só a checagem do nível.
+
+Quem registra só coloca o registro em uma fila sem limite (QueueHandler): a
+formatação e a escrita no terminal ou no arquivo acontecem na thread do
+QueueListener, então os workers nunca esperam pelo console. Os campos de
+contexto (url, sku) definidos com contexto() entram em cada registro da
+thread; no formato json cada linha é um objeto com eles. Os processos de
+parse enviam os registros por uma fila entre processos para os mesmos
+destinos.
+
+O andamento do processamento é um destino à parte (Progresso): barra do tqdm,
+linhas periódicas no log ou nada.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import queue
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    from tqdm import tqdm
+except ImportError:  # sem tqdm o console escreve direto e não há barra
+    tqdm = None
+
+NIVEIS = ("DEBUG", "INFO", "WARNING", "ERROR")
+FORMATOS = ("texto", "json")
+
+_contexto = contextvars.ContextVar("contexto_log", default={})
+_listeners = []
+_fila = None
+_fila_processos = None
+_config = {"nivel": "WARNING"}
+
+@contextmanager
+def contexto(**campos):
+    """Campos (ex.: url, sku) anexados a todo registro feito dentro do bloco, nesta thread"""
+    token = _contexto.set({**_contexto.get(), **campos})
+    try:
+        yield
+    finally:
+        _contexto.reset(token)
+
+class FiltroContexto(logging.Filter):
+    """Copia o contexto da thread e os campos de extra={"campos": {...}} para o registro"""
+
+    def filter(self, record):
+        record.contexto = {**_contexto.get(), **getattr(record, "campos", {})}
+        return True
+
+class FormatoTexto(logging.Formatter):
+    """A mensagem como nos prints; fora do nível INFO, com o SKU do contexto para separar as threads"""
+
+    def format(self, record):
+        mensagem = record.getMessage()
+        sku = getattr(record, "contexto", {}).get("sku")
+        if sku and record.levelno != logging.INFO:
+            mensagem = f"{mensagem} [{sku}]"
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        return f"{mensagem}\n{record.exc_text}" if record.exc_text else mensagem
+
+class FormatoJSON(logging.Formatter):
+    """Um objeto JSON por linha: quando, nível, logger, mensagem, thread e os campos de contexto"""
+
+    def format(self, record):
+        dados = {
+            "quando": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensagem": record.getMessage(),
+            "thread": record.threadName,
+            **getattr(record, "contexto", {}),
+        }
+        if record.exc_info:
+            dados["excecao"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            dados["excecao"] = record.exc_text
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+class HandlerConsole(logging.StreamHandler):
+    """Escreve pelo tqdm.write quando disponível, para não quebrar a barra de progresso"""
+
+    def emit(self, record):
+        if tqdm is None:
+            return super().emit(record)
+        try:
+            tqdm.write(self.format(record), file=self.stream)
+        except Exception:
+            self.handleError(record)
+
+def configurar(nivel="INFO", formato="texto", arquivo=None, saida=None):
+    """
+    Liga o logging da execução
+
+    O console usa o formato escolhido; arquivo recebe sempre JSON-lines.
+    Chamadas seguintes reconfiguram (o listener anterior é encerrado).
+    """
+    global _fila, _fila_processos
+    encerrar()
+    _config["nivel"] = nivel
+
+    console = HandlerConsole(saida or sys.stdout)
+    console.setFormatter(FormatoJSON() if formato == "json" else FormatoTexto())
+    destinos = [console]
+    if arquivo:
+        arquivo_log = logging.FileHandler(arquivo, encoding="utf-8")
+        arquivo_log.setFormatter(FormatoJSON())
+        destinos.append(arquivo_log)
+
+    # Fila sem limite: put_nowait nunca bloqueia a thread que registra
+    _fila = queue.Queue()
+    handler = logging.handlers.QueueHandler(_fila)
+    handler.addFilter(FiltroContexto())
+    raiz = logging.getLogger()
+    raiz.handlers = [handler]
+    raiz.setLevel(nivel)
+    # Bibliotecas só quando há algo errado; as retentativas do urllib3 já aparecem como 🔁
+    for nome in ("asyncio", "PIL"):
+        logging.getLogger(nome).setLevel(max(logging.WARNING, logging.getLevelName(nivel)))
+    logging.getLogger("urllib3").setLevel(logging.ERROR)
+
+    # Registros dos processos filhos (spawn, como os pools de parse e de imagens)
+    _fila_processos = multiprocessing.get_context("spawn").Queue()
+    for fila in (_fila, _fila_processos):
+        _listeners.append(logging.handlers.QueueListener(fila, *destinos))
+        _listeners[-1].start()
+
+def configurar_processo(nivel="WARNING", fila=None):
+    """
+    Logging dos processos filhos (initializer do ProcessPoolExecutor)
+
+    Com fila (a de parametros_processo), os registros voltam ao processo
+    principal; sem ela, vão direto para o stdout do filho.
+    """
+    if fila is not None:
+        handler = logging.handlers.QueueHandler(fila)
+    else:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(FormatoTexto())
+    handler.addFilter(FiltroContexto())
+    raiz = logging.getLogger()
+    raiz.handlers = [handler]
+    raiz.setLevel(nivel)
+
+def parametros_processo():
+    """initargs de configurar_processo: o nível atual e a fila entre processos"""
+    return _config["nivel"], _fila_processos
+
+def drenar():
+    """Espera a fila das threads esvaziar (antes de imprimir o resumo, para não intercalar)"""
+    if _fila is not None:
+        _fila.join()
+
+def encerrar():
+    """Escreve o que falta nas filas e fecha os destinos"""
+    global _fila, _fila_processos
+    destinos = []
+    for listener in _listeners:
+        listener.stop()
+        destinos = listener.handlers
+    for destino in destinos:
+        destino.close()
+    _listeners.clear()
+    if _fila_processos is not None:
+        _fila_processos.close()
+    _fila = _fila_processos = None
+
+# Na saída (inclusive por exit()), o que estiver na fila ainda é escrito
+atexit.register(encerrar)
+
+class Progresso:
+    """Destino do andamento do processamento; a base não mostra nada"""
+
+    def iniciar(self, total, descricao):
+        pass
+
+    def definir_total(self, total):
+        pass
+
+    def avancar(self, ok, falhas):
+        pass
+
+    def fechar(self):
+        pass
+
+class ProgressoBarra(Progresso):
+    """Barra do tqdm"""
+
+    def iniciar(self, total, descricao):
+        self.barra = tqdm(total=total, desc=descricao,
+                          bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]')
+
+    def definir_total(self, total):
+        self.barra.total = total
+        self.barra.refresh()
+
+    def avancar(self, ok, falhas):
+        self.barra.update(1)
+        self.barra.set_postfix({'OK': ok, 'Falhas': falhas})
+
+    def fechar(self):
+        self.barra.close()
+
+class ProgressoLog(Progresso):
+    """Uma linha INFO a cada `intervalo` segundos (para logs em arquivo ou JSON, sem barra)"""
+
+    def __init__(self, intervalo=30.0):
+        self.intervalo = intervalo
+        self.log = logging.getLogger("progresso")
+
+    def iniciar(self, total, descricao):
+        self.total, self.descricao = total, descricao
+        self.inicio = self.ultimo = time.monotonic()
+        self.ok = self.falhas = 0
+
+    def definir_total(self, total):
+        self.total = total
+
+    def avancar(self, ok, falhas):
+        self.ok, self.falhas = ok, falhas
+        if time.monotonic() - self.ultimo >= self.intervalo:
+            self._registrar()
+
+    def _registrar(self):
+        self.ultimo = time.monotonic()
+        feitos = self.ok + self.falhas
+        self.log.info("%s: %d/%s (%d ok, %d falhas, %.2f/s)", self.descricao, feitos,
+                      self.total if self.total is not None else "?", self.ok, self.falhas,
+                      feitos / max(self.ultimo - self.inicio, 1e-9),
+                      extra={"campos": {"feitos": feitos, "total": self.total, "ok": self.ok, "falhas": self.falhas}})
+
+    def fechar(self):
+        self._registrar()
+
+def criar_progresso(modo):
+    """Progresso para "barra", "log" ou "nenhum" (barra sem tqdm vira nenhum)"""
+    if modo == "barra" and tqdm is not None:
+        return ProgressoBarra()
+    if modo == "log":
+        return ProgressoLog()
+    return Progresso()
@@ -0,0 +1,282 @@
+"""
+Divisão do crawl entre vários workers
+
+Dois modos, para rodar vários processos (na mesma máquina ou em máquinas
+com a pasta do projeto compartilhada):
+
+- shards fixos (--shard I/N): cada worker fica com as URLs cujo SKU cai no
+  seu shard pelo hash (sha1, estável entre máquinas e versões do Python).
+  Não há coordenação; se um worker morre, o shard dele precisa ser rodado de
+  novo.
+- fila compartilhada (--queue): as URLs são carregadas em uma fila SQLite e
+  cada worker reivindica alguns itens por vez com uma lease. O worker renova
+  as leases do que ainda está processando; se ele morre, as leases vencem e
+  os itens voltam para os outros. Um item cuja lease venceu max_tentativas
+  vezes (ex.: uma página que derruba o worker) é marcado como falha.
+
+Em ambos os modos cada worker grava em uma pasta própria (data/shards/<nome>)
+e scripts/merge_shards.py junta as planilhas e os índices de imagens. No fim,
+o worker grava na pasta um marcador (concluido.json) com o shard, as falhas e
+se terminou; o merge só aceita remoções no delta com todos os shards limpos.
+"""
+
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+PENDENTE = "pendente"
+EM_ANDAMENTO = "em_andamento"
+CONCLUIDO = "concluido"
+FALHOU = "falhou"
+
+MARCADOR = "concluido.json"
+
+def shard_de(sku, total):
+    """Índice (0 a total-1) do shard de um SKU"""
+    return int(hashlib.sha1(str(sku).encode("utf-8")).hexdigest()[:8], 16) % total
+
+def parse_shard(valor):
+    """Converte --shard "2/4" (1-based) em (índice 0-based, total)"""
+    try:
+        indice, total = (int(parte) for parte in valor.split("/"))
+    except ValueError:
+        raise ValueError(f"Valor inválido para --shard: {valor!r} (use I/N, ex.: 1/4)")
+    if total < 1 or not 1 <= indice <= total:
+        raise ValueError(f"Valor inválido para --shard: {valor!r} (I deve estar entre 1 e N)")
+    return indice - 1, total
+
+def id_worker_padrao():
+    """host-pid: único entre os processos de uma máquina e entre máquinas"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+def gravar_marcador(pasta, **campos):
+    """Grava o marcador de conclusão do worker em `pasta` (troca atômica, nunca fica pela metade)"""
+    campos["gravado_em"] = datetime.now().isoformat(timespec="seconds")
+    caminho = os.path.join(pasta, MARCADOR)
+    with open(caminho + ".part", "w", encoding="utf-8") as f:
+        json.dump(campos, f, ensure_ascii=False, indent=2)
+    os.replace(caminho + ".part", caminho)
+
+def ler_marcador(pasta):
+    """Marcador de conclusão do worker em `pasta`, ou None se não houver (ou estiver ilegível)"""
+    try:
+        with open(os.path.join(pasta, MARCADOR), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def remover_marcador(pasta):
+    """Apaga o marcador da execução anterior (no início de cada execução do worker)"""
+    try:
+        os.remove(os.path.join(pasta, MARCADOR))
+    except FileNotFoundError:
+        pass
+
+class FilaTrabalho:
+    """URLs a processar, com o estado, o dono e a validade da lease de cada uma"""
+
+    def __init__(self, caminho, lease=300.0, max_tentativas=3):
+        self.caminho = caminho
+        self.lease = lease
+        self.max_tentativas = max_tentativas
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        # Vários processos escrevem no mesmo arquivo: espera o lock do SQLite em vez de falhar
+        self._db = sqlite3.connect(caminho, timeout=60, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS itens (
+                url TEXT PRIMARY KEY,
+                sku TEXT,
+                estado TEXT NOT NULL,
+                dono TEXT,
+                lease_ate REAL,
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                erro TEXT,
+                atualizado_em TEXT NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS itens_estado ON itens (estado, lease_ate)")
+
+    def carregar(self, urls, sku=None):
+        """
+        Acrescenta URLs à fila (as que já estão lá ficam como estão)
+
+        Idempotente: todos os workers podem carregar a mesma entrada ao
+        iniciar. Retorna quantas URLs entraram agora.
+        """
+        agora = datetime.now().isoformat(timespec="seconds")
+        linhas = [(url, sku(url) if sku else None, PENDENTE, agora) for url in urls]
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            antes = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO itens (url, sku, estado, atualizado_em) VALUES (?, ?, ?, ?)", linhas)
+            self._db.execute("COMMIT")
+            return self._db.total_changes - antes
+
+    def reivindicar(self, dono, n=1):
+        """
+        Até n URLs pendentes ou com a lease vencida, agora com lease de `dono`
+
+        Itens cuja lease venceu max_tentativas vezes viram falha aqui, em vez
+        de voltar para a fila.
+        """
+        agora = time.time()
+        atualizado = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    """UPDATE itens SET estado = ?, erro = 'lease expirada ' || tentativas || ' vezes',
+                              atualizado_em = ?
+                       WHERE estado = ? AND lease_ate < ? AND tentativas >= ?""",
+                    (FALHOU, atualizado, EM_ANDAMENTO, agora, self.max_tentativas))
+                urls = [url for (url,) in self._db.execute(
+                    """SELECT url FROM itens
+                       WHERE estado = ? OR (estado = ? AND lease_ate < ?)
+                       ORDER BY rowid LIMIT ?""",
+                    (PENDENTE, EM_ANDAMENTO, agora, int(n)))]
+                self._db.executemany(
+                    """UPDATE itens SET estado = ?, dono = ?, lease_ate = ?, tentativas = tentativas + 1,
+                              atualizado_em = ?
+                       WHERE url = ?""",
+                    [(EM_ANDAMENTO, dono, agora + self.lease, atualizado, url) for url in urls])
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return urls
+
+    def renovar(self, dono, urls):
+        """Estende as leases de `dono` nessas URLs; retorna quantas ainda eram dele"""
+        with self._lock:
+            cursor = self._db.executemany(
+                "UPDATE itens SET lease_ate = ? WHERE url = ? AND dono = ? AND estado = ?",
+                [(time.time() + self.lease, url, dono, EM_ANDAMENTO) for url in urls])
+            return cursor.rowcount
+
+    def concluir(self, dono, url):
+        """Item concluído (vale mesmo se a lease já tinha passado para outro worker)"""
+        with self._lock:
+            self._db.execute(
+                "UPDATE itens SET estado = ?, dono = ?, lease_ate = NULL, erro = NULL, atualizado_em = ? WHERE url = ?",
+                (CONCLUIDO, dono, datetime.now().isoformat(timespec="seconds"), url))
+
+    def falhar(self, dono, url, erro):
+        """Falha definitiva do item (depois das retentativas do próprio worker)"""
+        with self._lock:
+            self._db.execute(
+                """UPDATE itens SET estado = ?, dono = ?, lease_ate = NULL, erro = ?, atualizado_em = ?
+                   WHERE url = ? AND estado != ?""",
+                (FALHOU, dono, str(erro)[:500], datetime.now().isoformat(timespec="seconds"), url, CONCLUIDO))
+
+    def restantes(self):
+        """Itens ainda pendentes ou em andamento (de qualquer worker)"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM itens WHERE estado IN (?, ?)", (PENDENTE, EM_ANDAMENTO)).fetchone()[0]
+
+    def resumo(self):
+        """Contagem por estado"""
+        with self._lock:
+            contagem = dict(self._db.execute("SELECT estado, COUNT(*) FROM itens GROUP BY estado"))
+        return {estado: contagem.get(estado, 0) for estado in (PENDENTE, EM_ANDAMENTO, CONCLUIDO, FALHOU)}
+
+    def donos(self):
+        """{sku: worker} dos itens concluídos (o merge prefere a linha desse worker)"""
+        with self._lock:
+            return dict(self._db.execute(
+                "SELECT sku, dono FROM itens WHERE estado = ? AND sku IS NOT NULL", (CONCLUIDO,)))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+class ConsumidorFila:
+    """
+    As URLs de um worker, reivindicadas aos poucos
+
+    No máximo `janela` URLs ficam com lease deste worker ao mesmo tempo: o
+    gerador urls() só reivindica mais quando concluir()/falhar() liberam vagas,
+    então as leases não vencem enquanto as URLs esperam na fila interna do
+    scraper. Uma thread renova as leases em andamento a cada terço da lease.
+    """
+
+    def __init__(self, fila, dono, janela=32, lote=8, espera=2.0):
+        self.fila = fila
+        self.dono = dono
+        self.lote = max(1, min(lote, janela))
+        self.espera = espera
+        self.reivindicadas = 0
+        self._vagas = threading.Semaphore(janela)
+        self._em_andamento = set()
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._renovador = threading.Thread(target=self._renovar, name="renovador-leases", daemon=True)
+        self._renovador.start()
+
+    def urls(self, pausas=False):
+        """
+        Gera URLs até a fila não ter mais nada pendente nem em andamento
+
+        Com pausas, gera None quando vai esperar (nenhuma vaga na janela
+        voltou em `espera` segundos, ou nada livre na fila): quem agrupa as
+        URLs em lotes entrega o lote parcial, senão as URLs retidas nunca são
+        concluídas e as vagas não voltam.
+        """
+        while not self._parar.is_set():
+            if not pausas:
+                self._vagas.acquire()
+            elif not self._vagas.acquire(timeout=self.espera):
+                yield None
+                self._vagas.acquire()
+            n = 1
+            while n < self.lote and self._vagas.acquire(blocking=False):
+                n += 1
+            urls = self.fila.reivindicar(self.dono, n)
+            for _ in range(n - len(urls)):
+                self._vagas.release()
+            if not urls:
+                # Nada livre agora: outros workers (ou este) ainda têm leases, que podem vencer
+                if self.fila.restantes() == 0:
+                    return
+                if pausas:
+                    yield None
+                self._parar.wait(self.espera)
+                continue
+            with self._lock:
+                self._em_andamento.update(urls)
+            self.reivindicadas += len(urls)
+            yield from urls
+
+    def _liberar(self, url):
+        with self._lock:
+            if url not in self._em_andamento:
+                return
+            self._em_andamento.discard(url)
+        self._vagas.release()
+
+    def concluir(self, url):
+        self.fila.concluir(self.dono, url)
+        self._liberar(url)
+
+    def falhar(self, url, erro):
+        self.fila.falhar(self.dono, url, erro)
+        self._liberar(url)
+
+    def _renovar(self):
+        while not self._parar.wait(self.fila.lease / 3):
+            with self._lock:
+                urls = list(self._em_andamento)
+            if urls:
+                self.fila.renovar(self.dono, urls)
+
+    def close(self):
+        self._parar.set()
+        self._renovador.join(timeout=5)